@@ -19,6 +19,7 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from core.config import settings as core_settings
+from core.redis_pool import close_redis
 from ..models import (
     QuizResult,
     TelegramUser,
@@ -336,7 +337,8 @@ class TelegramUserAdmin(admin.ModelAdmin):
     def send_morning_touch_test(self, request, queryset):
         """Отправить утреннее касание выбранным пользователям (для теста, без проверки времени)"""
         try:
-            from services.morning_touch import _get_content_for_user, _send_touch_content, _mark_users_sent
+            from services.morning_touch import _send_touch_content, _mark_users_sent
+            from services.touch_dispatcher import _get_content_for_user
 
             async def run_touch():
                 import limited_aiogram
@@ -358,7 +360,7 @@ class TelegramUserAdmin(admin.ModelAdmin):
                     sent_user_ids = []
                     for user_id, telegram_id in users:
                         try:
-                            content = await asyncio.to_thread(_get_content_for_user, user_id, target_date)
+                            content = await asyncio.to_thread(_get_content_for_user, user_id, "morning", target_date)
                             if content:
                                 await _send_touch_content(bot, telegram_id, content, bot_id=bot_id)
                             sent_user_ids.append(user_id)
@@ -371,6 +373,7 @@ class TelegramUserAdmin(admin.ModelAdmin):
                     return sent_count
                 finally:
                     await bot.session.close()
+                    await close_redis()
 
             sent_count = asyncio.run(run_touch())
             self.message_user(request, f"Утреннее касание отправлено {sent_count} пользователям", messages.SUCCESS)
@@ -388,7 +391,8 @@ class TelegramUserAdmin(admin.ModelAdmin):
     def send_day_touch_test(self, request, queryset):
         """Отправить дневное касание всем активным пользователям (для теста, без проверки времени)"""
         try:
-            from services.day_touch import _get_content_for_user, _build_day_keyboard
+            from services.day_touch import _build_day_keyboard
+            from services.touch_dispatcher import _get_content_for_user
             from core.texts import TEXTS
 
             async def run_touch():
@@ -407,7 +411,7 @@ class TelegramUserAdmin(admin.ModelAdmin):
                     sent_count = 0
                     for user_id, telegram_id in users:
                         try:
-                            content = await asyncio.to_thread(_get_content_for_user, user_id, target_date)
+                            content = await asyncio.to_thread(_get_content_for_user, user_id, "day", target_date)
                             if not content:
                                 continue
                             keyboard = _build_day_keyboard()
@@ -423,6 +427,7 @@ class TelegramUserAdmin(admin.ModelAdmin):
                     return sent_count
                 finally:
                     await bot.session.close()
+                    await close_redis()
 
             sent_count = asyncio.run(run_touch())
             self.message_user(request, f"Дневное касание отправлено {sent_count} активным пользователям", messages.SUCCESS)
@@ -440,7 +445,8 @@ class TelegramUserAdmin(admin.ModelAdmin):
     def send_evening_touch_test(self, request, queryset):
         """Отправить вечернее касание всем активным пользователям (для теста, без проверки времени)"""
         try:
-            from services.evening_touch import _get_content_for_user, _send_evening_content, _send_first_rating_question
+            from services.evening_touch import _send_evening_content, _send_first_rating_question
+            from services.touch_dispatcher import _get_content_for_user
 
             async def run_touch():
                 import limited_aiogram
@@ -461,7 +467,7 @@ class TelegramUserAdmin(admin.ModelAdmin):
                     sent_count = 0
                     for user_id, telegram_id in users:
                         try:
-                            content = await asyncio.to_thread(_get_content_for_user, user_id, target_date)
+                            content = await asyncio.to_thread(_get_content_for_user, user_id, "evening", target_date)
                             if not content:
                                 continue
                             await _send_evening_content(bot, telegram_id, content)
@@ -476,6 +482,7 @@ class TelegramUserAdmin(admin.ModelAdmin):
                     return sent_count
                 finally:
                     await bot.session.close()
+                    await close_redis()
 
             sent_count = asyncio.run(run_touch())
             self.message_user(request, f"Вечернее касание отправлено {sent_count} активным пользователям", messages.SUCCESS)
@@ -531,6 +538,7 @@ class TelegramUserAdmin(admin.ModelAdmin):
                     return sent_count
                 finally:
                     await bot.session.close()
+                    await close_redis()
 
             sent_count = asyncio.run(run_touch())
             self.message_user(request, f"Сообщение о стратсубботе отправлено {sent_count} пользователям", messages.SUCCESS)
@@ -1,14 +1,11 @@
 """TouchContent admin configuration and broadcast action."""
 
 import asyncio
-import json
 import logging
 from pathlib import Path
 
-import redis
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.types import FSInputFile
 from django.contrib import admin, messages
 
 import os
@@ -73,6 +70,39 @@ class TouchContentAdmin(admin.ModelAdmin):
         ),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Новый видео-файл — закэшированный file_id старого видео больше не нужен
+        if change and "video_file" in form.changed_data:
+            try:
+                from core.redis_pool import close_redis
+                from services.video_cache import invalidate_touch_video
+
+                async def purge_video_cache():
+                    try:
+                        await invalidate_touch_video(obj.pk)
+                    finally:
+                        await close_redis()
+
+                asyncio.run(purge_video_cache())
+            except Exception as exc:  # pylint: disable=broad-except
+                logging.getLogger(__name__).warning("Не удалось сбросить кэш видео касания %s: %s", obj.pk, exc)
+        # Рубрики проверки ответов считаются заранее, чтобы первые ответы не проверялись по полному промпту
+        if obj.questions and (not change or {"questions", "summary"} & set(form.changed_data)):
+            try:
+                from core.redis_pool import close_redis
+                from services.touch_rubrics import schedule_rubric_precompute
+
+                async def queue_rubrics():
+                    try:
+                        await schedule_rubric_precompute(obj.pk, overwrite=change)
+                    finally:
+                        await close_redis()
+
+                asyncio.run(queue_rubrics())
+            except Exception as exc:  # pylint: disable=broad-except
+                logging.getLogger(__name__).warning("Не удалось поставить расчёт рубрик касания %s: %s", obj.pk, exc)
+
     def send_touch_to_all_users(self, request, queryset):
         """Отправить выбранное касание всем активным пользователям"""
         if queryset.count() != 1:
@@ -82,6 +112,7 @@ class TouchContentAdmin(admin.ModelAdmin):
         touch_content = queryset.first()
 
         try:
+            from core.redis_pool import close_redis
             from database.session import SessionLocal
             from models.user import User
 
@@ -96,41 +127,37 @@ class TouchContentAdmin(admin.ModelAdmin):
                 logger = logging.getLogger(__name__)
                 logger.info(f"[ADMIN] Bot ID: {bot_id}")
 
-                redis_client = redis.Redis(
-                    host=core_settings.redis_host,
-                    port=core_settings.redis_port,
-                    password=core_settings.redis_password,
-                    db=core_settings.redis_db,
-                    decode_responses=True,
-                )
                 try:
-                    def fetch_all_users():
+                    from services.broadcast import run_broadcast
+
+                    def fetch_users_chunk_sync(after_id, limit):
                         from sqlalchemy import select
 
                         with SessionLocal() as session:
                             stmt = (
                                 select(User.id, User.telegram_id)
-                                .where(User.telegram_id.is_not(None))
+                                .where(User.telegram_id.is_not(None), User.id > after_id)
+                                .order_by(User.id)
+                                .limit(limit)
                             )
                             result = session.execute(stmt)
                             return list(result.all())
 
-                    users = await asyncio.to_thread(fetch_all_users)
-                    if not users:
-                        logger.warning("[ADMIN] Нет пользователей с telegram_id для рассылки")
-                        return 0
+                    async def fetch_users_chunk(after_id, limit):
+                        return await asyncio.to_thread(fetch_users_chunk_sync, after_id, limit)
 
-                    sent_count = 0
-                    for user_id, telegram_id in users:
-                        try:
-                            await self._send_touch(bot, bot_id, telegram_id, touch_content, redis_client, logger)
-                            sent_count += 1
-                        except Exception as exc:  # pylint: disable=broad-except
-                            logger.warning("Не удалось отправить касание пользователю %s: %s", telegram_id, exc)
+                    async def send_to_user(user):
+                        _, telegram_id = user
+                        await self._send_touch(bot, bot_id, telegram_id, touch_content, logger)
+                        return True
 
-                    return sent_count
+                    stats = await run_broadcast(f"[ADMIN] Касание {touch_content.pk}", fetch_users_chunk, send_to_user)
+                    if not stats.processed:
+                        logger.warning("[ADMIN] Нет пользователей с telegram_id для рассылки")
+                    return stats.sent
                 finally:
                     await bot.session.close()
+                    await close_redis()
 
             sent_count = asyncio.run(run_send())
             self.message_user(
@@ -150,7 +177,7 @@ class TouchContentAdmin(admin.ModelAdmin):
     send_touch_to_all_users.short_description = "📤 Отправить касание всем пользователям"
 
     # ------------------------------------------------------------------ utils
-    async def _send_touch(self, bot, bot_id, telegram_id, touch_content, redis_client, logger):
+    async def _send_touch(self, bot, bot_id, telegram_id, touch_content, logger):
         from services.evening_touch import _send_first_rating_question
 
         touch_type = touch_content.touch_type
@@ -164,7 +191,7 @@ class TouchContentAdmin(admin.ModelAdmin):
             await self._send_evening_touch(bot, telegram_id, touch_content, bot_id, logger)
             return
 
-        await self._send_morning_touch(bot, telegram_id, touch_content, bot_id, redis_client, logger)
+        await self._send_morning_touch(bot, telegram_id, touch_content, bot_id, logger)
 
     async def _send_day_touch(self, bot, telegram_id, touch_content, logger):
         if touch_content.summary:
@@ -206,7 +233,7 @@ class TouchContentAdmin(admin.ModelAdmin):
         await _send_first_rating_question(bot, telegram_id, bot_id=bot_id, touch_content_id=touch_content.id)
         logger.info("[ADMIN] Первый вопрос оценки отправлен")
 
-    async def _send_morning_touch(self, bot, telegram_id, touch_content, bot_id, redis_client, logger):
+    async def _send_morning_touch(self, bot, telegram_id, touch_content, bot_id, logger):
         caption = touch_content.summary.strip() if touch_content.summary else None
         video_sent = False
 
@@ -214,7 +241,9 @@ class TouchContentAdmin(admin.ModelAdmin):
             try:
                 video_file_path = touch_content.video_file.path
                 if Path(video_file_path).exists():
-                    await bot.send_video(telegram_id, FSInputFile(video_file_path), caption=caption)
+                    from services.video_cache import send_touch_video
+
+                    await send_touch_video(bot, telegram_id, touch_content.id, Path(video_file_path), caption=caption)
                     video_sent = True
                     logger.info("[ADMIN] Видео файл успешно отправлен")
             except Exception as file_exc:  # pylint: disable=broad-except
@@ -237,9 +266,9 @@ class TouchContentAdmin(admin.ModelAdmin):
 
         if touch_content.questions:
             await asyncio.sleep(5)
-            await self._handle_questions(bot, telegram_id, touch_content, bot_id, redis_client, logger)
+            await self._handle_questions(bot, telegram_id, touch_content, bot_id, logger)
 
-    async def _handle_questions(self, bot, telegram_id, touch_content, bot_id, redis_client, logger):
+    async def _handle_questions(self, bot, telegram_id, touch_content, bot_id, logger):
         questions_text_raw = touch_content.questions or ""
         questions_text = questions_text_raw.strip()
         split_lines = questions_text.split("\n")
@@ -256,16 +285,17 @@ class TouchContentAdmin(admin.ModelAdmin):
         await bot.send_message(telegram_id, first_question)
         logger.info("[ADMIN] Первый вопрос успешно отправлен")
 
-        state_key = f"fsm:{bot_id}:{telegram_id}:state"
-        data_key = f"fsm:{bot_id}:{telegram_id}:data"
-        redis_data = {
-            "touch_content_id": touch_content.id,
-            "questions_list": questions_list,
-            "current_question_index": 0,
-            "answers": [],
-        }
-        json_data = json.dumps(redis_data, ensure_ascii=False)
-
-        redis_client.set(state_key, "TouchQuestionStates:waiting_for_answer", ex=3600)
-        redis_client.set(data_key, json_data, ex=3600)
-        logger.info("[ADMIN] Данные сохранены в Redis")
+        from core.fsm_storage import get_user_state
+        from core.states import TouchQuestionStates
+
+        user_state = get_user_state(bot_id, telegram_id)
+        await user_state.set_state(TouchQuestionStates.waiting_for_answer)
+        await user_state.set_data(
+            {
+                "touch_content_id": touch_content.id,
+                "questions_list": questions_list,
+                "current_question_index": 0,
+                "answers": [],
+            }
+        )
+        logger.info("[ADMIN] Состояние ожидания ответа сохранено в FSM")
@@ -0,0 +1,66 @@
+"""
+Бенчмарк кодировок аудио для загрузки в Whisper.
+
+Для каждого файла-образца и каждой кодировки (opus, flac, wav) печатает размер
+загружаемых данных и время подготовки. С флагом --transcribe дополнительно
+замеряет полное время транскрипции (нужны настройки Cloud.ru в .env).
+
+Запуск из корня проекта:
+    python -m benchmarks.audio_encoding voice1.ogg voice2.ogg [--transcribe]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+from typing import List
+
+import whisper_client
+from whisper_client import AUDIO_ENCODINGS, close_whisper_client, optimize_audio, transcribe_via_direct_http
+
+
+async def _transcription_latency(audio_data: bytes, input_format: str, encoding: str) -> float:
+    # Кодировку задаём явно, в обход запомненной после отказа endpoint'а
+    whisper_client._upload_encoding = encoding
+    started = time.perf_counter()
+    await transcribe_via_direct_http(audio_data, audio_format=input_format, trim_silence=False)
+    return time.perf_counter() - started
+
+
+async def run(files: List[Path], transcribe: bool) -> None:
+    header = f"{'файл':>24} | {'кодировка':>9} | {'байт':>10} | {'× исходного':>11} | {'подготовка, мс':>14}"
+    if transcribe:
+        header += f" | {'транскрипция, с':>15}"
+    print(header)
+    try:
+        for path in files:
+            audio_data = path.read_bytes()
+            input_format = path.suffix.lstrip(".").lower() or "ogg"
+            for encoding in AUDIO_ENCODINGS:
+                started = time.perf_counter()
+                chunks, _, _ = optimize_audio(audio_data, input_format, encoding)
+                payload_size = sum(len(chunk) for chunk in chunks)
+                prepare_ms = (time.perf_counter() - started) * 1000
+                row = (
+                    f"{path.name[-24:]:>24} | {encoding:>9} | {payload_size:>10} | "
+                    f"{payload_size / len(audio_data):>11.2f} | {prepare_ms:>14.1f}"
+                )
+                if transcribe:
+                    latency = await _transcription_latency(audio_data, input_format, encoding)
+                    row += f" | {latency:>15.2f}"
+                print(row)
+    finally:
+        await close_whisper_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", type=Path, help="образцы аудио (например, голосовые из Telegram .ogg)")
+    parser.add_argument("--transcribe", action="store_true", help="замерить и полное время транскрипции")
+    args = parser.parse_args()
+    asyncio.run(run(args.files, args.transcribe))
+
+
+if __name__ == "__main__":
+    main()
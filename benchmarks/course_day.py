@@ -0,0 +1,69 @@
+"""
+Бенчмарк расчёта дня курса.
+
+Сравнивает старый подсчёт будней циклом по дням, O(1)-формулу course_day_from_start
+и пакетный calculate_course_days (numpy.busday_count) при разной длине курса.
+Стоимость на пользователя у двух последних не должна расти вместе с длиной курса.
+
+Запуск из корня проекта:
+    python -m benchmarks.course_day
+"""
+from __future__ import annotations
+
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional
+
+from services.touch_utils import calculate_course_days, course_day_from_start
+
+USERS = 5000
+COURSE_LENGTHS_DAYS = (7, 30, 90, 365, 3 * 365)
+
+
+def _loop_course_day(start_dt: Optional[datetime], for_date: date) -> Optional[int]:
+    """Прежняя реализация: перебор дней от начала подписки."""
+    if not start_dt:
+        return None
+    start_date = start_dt.date()
+    if for_date < start_date:
+        return None
+    day_counter = 0
+    current = start_date
+    while current <= for_date:
+        if current.weekday() < 5:
+            day_counter += 1
+        current += timedelta(days=1)
+    return day_counter
+
+
+def _measure(func: Callable[[], List[Optional[int]]]) -> tuple[float, List[Optional[int]]]:
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def main() -> None:
+    rng = random.Random(42)
+    for_date = date.today()
+
+    print(f"{'дней курса':>11} | {'цикл, мкс/польз':>16} | {'формула, мкс/польз':>19} | {'numpy, мкс/польз':>17}")
+    for length in COURSE_LENGTHS_DAYS:
+        start_dates = [
+            datetime.combine(for_date - timedelta(days=rng.randint(0, length)), datetime.min.time())
+            for _ in range(USERS)
+        ]
+
+        loop_time, expected = _measure(lambda: [_loop_course_day(dt, for_date) for dt in start_dates])
+        formula_time, formula = _measure(lambda: [course_day_from_start(dt, for_date) for dt in start_dates])
+        bulk_time, bulk = _measure(lambda: calculate_course_days(start_dates, for_date))
+
+        assert formula == expected and bulk == expected, "Результаты реализаций расходятся"
+        print(
+            f"{length:>11} | {loop_time / USERS * 1e6:>16.2f} | "
+            f"{formula_time / USERS * 1e6:>19.2f} | {bulk_time / USERS * 1e6:>17.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
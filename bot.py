@@ -4,10 +4,15 @@ import limited_aiogram
 from aiogram import Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
+from cloudru_auth import close_token_provider
 from core.config import settings
+from core.fsm_storage import get_fsm_storage
+from core.redis_pool import close_redis
+from qwen_client import close_qwen_client
+from whisper_client import close_whisper_client
 from handlers.start import router as start_router
 from handlers.callbacks import router as callbacks_router
+from services.answer_queue import start_answer_workers, stop_answer_workers
 from services.scheduler import setup_scheduler
 
 logging.basicConfig(
@@ -42,13 +47,14 @@ async def main():
     except Exception as e:
         logger.warning(f"Ошибка при проверке/удалении webhook: {e}. Продолжаем запуск...")
 
-    # Инициализация FSM storage
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    # FSM в Redis: общие ключи с планировщиком и админкой, состояние переживает перезапуск
+    dp = Dispatcher(storage=get_fsm_storage())
     dp.include_router(start_router)
     dp.include_router(callbacks_router)
 
     scheduler = setup_scheduler(bot)
+    # Воркеры обработки ответов (голос → Whisper → Qwen); обработчики задач регистрируются в handlers
+    await start_answer_workers(bot)
 
     logger.info("Бот запущен. Нажми Ctrl+C для остановки.")
     try:
@@ -61,7 +67,12 @@ async def main():
     finally:
         scheduler.shutdown(wait=False)
         logger.info("Планировщик остановлен")
+        await stop_answer_workers()
         await bot.session.close()
+        await close_qwen_client()
+        await close_whisper_client()
+        await close_token_provider()
+        await close_redis()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+"""
+Общий IAM-токен Cloud.ru для клиентов Qwen и Whisper.
+
+Токен кэшируется до expires_in и заранее обновляется в фоне, так что запросы
+к моделям не ждут лишнего обращения к IAM. Одновременные вызовы, заставшие
+токен просроченным, ждут один общий запрос обновления.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SAFETY_MARGIN = 30  # токен считается просроченным за 30 секунд до expires_in
+TOKEN_REFRESH_AHEAD = 120  # фоновое обновление за 2 минуты до истечения
+TOKEN_MIN_LIFETIME = 60
+IAM_REQUEST_TIMEOUT = 30
+
+
+class IamTokenProvider:
+    """Кэш Bearer токена (OAuth2 client_credentials) с фоновым обновлением."""
+
+    def __init__(self, token_url: str, key_id: str, key_secret: str):
+        self.token_url = token_url
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self._token: Optional[str] = None
+        self._expire_at: float = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _is_fresh(self) -> bool:
+        return bool(self._token) and time.time() < self._expire_at - TOKEN_SAFETY_MARGIN
+
+    async def get_token(self, force_refresh: bool = False) -> str:
+        """
+        Актуальный токен. force_refresh — после 401 от модели: токен отозван раньше срока.
+        """
+        if not force_refresh and self._is_fresh():
+            return self._token
+        return await self._refresh()
+
+    async def _refresh(self) -> str:
+        """Single-flight: все ожидающие получают результат одного запроса к IAM."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Задачи прошлого event loop здесь не дождаться
+            self._inflight = None
+            self._refresher = None
+            self._loop = loop
+        if self._inflight is None or self._inflight.done():
+            self._inflight = loop.create_task(self._fetch())
+        return await asyncio.shield(self._inflight)
+
+    async def _fetch(self) -> str:
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": self.key_id,
+            "client_secret": self.key_secret,
+        }
+        timeout = aiohttp.ClientTimeout(total=IAM_REQUEST_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.post(self.token_url, data=data) as resp:
+                text = await resp.text()
+                if resp.status >= 400:
+                    raise RuntimeError(f"IAM token error HTTP {resp.status}: {text[:400]}")
+                try:
+                    payload = await resp.json(content_type=None)
+                except ValueError:
+                    raise RuntimeError(f"IAM вернул не-JSON: {text[:400]}")
+
+        access_token = payload.get("access_token")
+        if not access_token:
+            raise RuntimeError(f"IAM: нет access_token в ответе: {payload}")
+        expires_in = max(TOKEN_MIN_LIFETIME, int(payload.get("expires_in", 3600)))
+
+        self._token = access_token
+        self._expire_at = time.time() + expires_in
+        logger.info("Получен Bearer токен Cloud.ru (действует %s с)", expires_in)
+        self._schedule_refresh(expires_in)
+        return access_token
+
+    def _schedule_refresh(self, expires_in: int) -> None:
+        if self._refresher is not None and not self._refresher.done():
+            self._refresher.cancel()
+        delay = max(TOKEN_MIN_LIFETIME / 2, expires_in - TOKEN_REFRESH_AHEAD)
+        self._refresher = asyncio.get_running_loop().create_task(self._refresh_later(delay))
+
+    async def _refresh_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        try:
+            await self._refresh()
+        except Exception as exc:  # pylint: disable=broad-except
+            # Не страшно: следующий запрос к модели получит токен сам
+            logger.warning("Фоновое обновление токена Cloud.ru не удалось: %s", exc)
+
+    async def close(self) -> None:
+        """Остановить фоновое обновление (при остановке бота)."""
+        if self._refresher is not None and not self._refresher.done():
+            self._refresher.cancel()
+        self._refresher = None
+
+
+_provider: Optional[IamTokenProvider] = None
+
+
+def get_token_provider() -> IamTokenProvider:
+    """Общий провайдер токена для Cloud.ru (singleton)."""
+    global _provider
+    if _provider is None:
+        _provider = IamTokenProvider(
+            settings.cloud_iam_token_url,
+            settings.cloudru_iam_key,
+            settings.cloudru_iam_secret,
+        )
+    return _provider
+
+
+async def close_token_provider() -> None:
+    if _provider is not None:
+        await _provider.close()
@@ -23,6 +23,10 @@ class Settings(BaseSettings):
     postgres_password: str = ""
     postgres_db: str = ""
     db_schema_name: str = "public"
+    db_pool_size: int = 10  # 0 — без пула (NullPool): соединение открывается на каждую сессию
+    db_max_overflow: int = 20
+    db_pool_recycle: int = 1800  # Пересоздавать соединения старше N секунд
+    db_statement_cache_size: int = 256  # Кэш подготовленных выражений asyncpg (0 — выключить, нужно для pgbouncer)
 
     # Redis
     redis_url: Optional[str] = None
@@ -30,6 +34,7 @@ class Settings(BaseSettings):
     redis_port: int = 6379
     redis_password: Optional[str] = None
     redis_db: int = 0
+    redis_max_connections: int = 100  # Размер общего пула соединений (core/redis_pool.py)
 
     # Telegram Bot
     bot_token: str = ""
@@ -44,6 +49,11 @@ class Settings(BaseSettings):
     timezone: str = "Europe/Moscow"
     media_root: str = "media"
 
+    # Broadcast (рассылки касаний и стратсубботы)
+    broadcast_concurrency: int = 50  # Сколько пользователей обрабатывается одновременно
+    broadcast_chunk_size: int = 500  # Сколько пользователей читается из БД за один запрос
+    broadcast_progress_interval: int = 10  # Период логирования прогресса рассылки, сек
+
     # Robokassa
     robokassa_shop_id: str = ""
     robokassa_password1: str = ""
@@ -65,6 +75,17 @@ class Settings(BaseSettings):
     cloudru_iam_secret: str = ""
     whisper_model_url: str = ""
     whisper_model_name: str = ""
+    whisper_audio_encoding: str = "opus"  # opus (голосовые без перекодирования), flac или wav
+    whisper_vad_enabled: bool = True  # вырезать тишину перед отправкой в Whisper
+    whisper_vad_threshold_db: float = -45.0  # громкость кадра (dBFS), ниже которой — тишина
+    whisper_vad_max_pause_ms: int = 800  # паузы длиннее сжимаются до этой длины
+    whisper_vad_min_speech_ms: int = 300  # меньше речи — клип отправляется без обрезки
+    whisper_chunk_seconds: int = 60  # записи длиннее режутся в паузах на куски (0 — не резать)
+    whisper_chunk_concurrency: int = 3  # одновременно распознаваемых кусков одной записи
+    whisper_audio_workers: int = 2  # процессов для конвертации аудио (0 — в потоке)
+    whisper_max_concurrency: int = 8  # одновременных загрузок аудио в Whisper на весь бот
+    whisper_transcription_cache_ttl: int = 7 * 24 * 3600  # хранить расшифровки голосовых, секунды (0 — не кэшировать)
+    whisper_endpoint_rediscover_interval: int = 21600  # перепроверка endpoint'а, секунды (0 — только после 404)
 
     # Cloud.ru API (Qwen)
     cloud_public_url: str = ""
@@ -74,6 +95,7 @@ class Settings(BaseSettings):
     # "library/qwen2.5vl:32b" - vision-language модель 32B (медленнее, но была рабочей)
     qwen_model: str = ""
     system_prompt: str = "Ты - полезный ассистент. Отвечай на русском языке."
+    # Параметры профиля default; у остальных профилей задач свои лимиты (qwen_client.QWEN_TASK_PROFILES)
     qwen_max_tokens: int = 512
     qwen_temperature: float = 0.2
     qwen_top_p: float = 0.9
@@ -82,8 +104,38 @@ class Settings(BaseSettings):
     qwen_repetition_penalty: float = 1.03
     qwen_length_penalty: float = 1.0
     cloud_timeout: int = 300  # 5 минут - модель долго стартует (до 3 минут на первых запусках)
+    qwen_max_concurrency: int = 4  # одновременных запросов к модели
+    qwen_deadline: int = 900  # общий лимит на вызов с учётом ретраев, секунды
+    qwen_max_retries: int = 5
+    qwen_cache_ttl: int = 86400  # хранить ответы на одинаковые запросы, секунды (0 — без кэша)
+    qwen_breaker_failures: int = 3  # неудачных вызовов подряд до размыкания цепи
+    qwen_breaker_open_seconds: int = 60  # сколько цепь разомкнута до пробного вызова
+    qwen_breaker_latency_window: int = 300  # окно для p95 задержки, секунды
+    qwen_budget_format: int = 20  # бюджет профиля format: ответы профиля в список (пользователь ждёт в хендлере)
+    qwen_budget_validation: int = 90  # бюджет профиля validation: резюме ответа на вопрос касания
+    qwen_budget_voice: int = 90  # бюджет профиля challenges: вызовы из голосового
+    qwen_stream_edit_interval: float = 1.5  # не чаще одной правки сообщения за столько секунд при потоковом ответе
     cloud_iam_token_url: str = "https://auth.iam.sbercloud.ru/auth/system/openid/token"
 
+    # Прогрев моделей по расписанию касаний (services/warmup_planner.py)
+    warmup_enabled: bool = True
+    warmup_lead_minutes: int = 5  # прогревать за столько минут до волны касаний
+    warmup_active_window_minutes: int = 45  # держать модели тёплыми после волны и последнего ответа
+    warmup_keepalive_interval: int = 600  # keep-alive простаивающей модели в активное окно, секунды
+    warmup_min_wave_users: int = 1  # меньше касаний в минуту — не волна
+    warmup_cold_after_idle: int = 900  # простой, после которого вызов модели считается холодным, секунды
+
+    # Очередь обработки ответов (services/answer_queue.py)
+    answer_queue_workers: int = 8  # задач, выполняемых одновременно
+    answer_queue_whisper_concurrency: int = 3  # из них одновременно на этапе расшифровки
+    answer_queue_qwen_concurrency: int = 4  # из них одновременно на этапе Qwen
+    answer_queue_max_attempts: int = 3
+    answer_queue_claim_idle: int = 1800  # через сколько секунд без продления задачу остановившегося воркера забирает другой
+
+    # Приоритеты вызовов моделей (services/model_scheduler.py): остальная ёмкость — запросам пользователей
+    model_background_concurrency: int = 1  # одновременных фоновых вызовов каждой модели (рубрики вопросов)
+    model_keepalive_concurrency: int = 1  # одновременных вызовов прогрева каждой модели
+
     # AWS S3 (для Django admin panel)
     aws_s3_endpoint_url: str = ""
     aws_storage_bucket_name: str = ""
@@ -104,6 +156,17 @@ class Settings(BaseSettings):
             f"postgresql://{user}{password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
         )
 
+    @property
+    def async_db_url(self) -> str:
+        """DSN для асинхронного движка (PostgreSQL — asyncpg, SQLite — aiosqlite)."""
+        url = self.db_url
+        for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+            if url.startswith(prefix):
+                return "postgresql+asyncpg://" + url[len(prefix):]
+        if url.startswith("sqlite://"):
+            return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+        return url
+
     @property
     def redis_dsn(self) -> str:
         if self.redis_url:
@@ -0,0 +1,97 @@
+"""
+FSM-хранилище aiogram в Redis.
+
+Диспетчер, планировщик и админка работают с одними и теми же ключами
+`fsm:{bot_id}:{telegram_id}:state|data`: рассылка касаний выставляет состояние
+пользователю через get_user_state(), а хендлеры получают его в обычном FSMContext.
+
+Состояния не истекают, кроме вопросов касаний и вечерней оценки: их, как и раньше,
+выставляет рассылка, и без ответа они живут час с последнего изменения.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Literal, Optional
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+from core.redis_pool import get_redis
+
+logger = logging.getLogger(__name__)
+
+FSM_KEY_PREFIX = "fsm"
+TOUCH_FLOW_TTL_SECONDS = 3600  # состояние касания без ответа живёт час с последнего изменения
+TOUCH_FLOW_STATE_GROUPS = ("TouchQuestionStates:", "EveningRatingStates:")
+
+_storage: Optional["SharedRedisStorage"] = None
+
+
+class UserKeyBuilder(KeyBuilder):
+    """Ключи вида fsm:{bot_id}:{user_id}[:{part}] — бот работает только в личных чатах."""
+
+    def build(self, key: StorageKey, part: Optional[Literal["data", "state", "lock"]] = None) -> str:
+        parts = [FSM_KEY_PREFIX, str(key.bot_id), str(key.user_id)]
+        if part:
+            parts.append(part)
+        return ":".join(parts)
+
+
+def _ttl_for_state(state: Optional[str]) -> Optional[int]:
+    """TTL ключей пользователя в состоянии state: короткий для касаний, иначе без истечения."""
+    if state and state.startswith(TOUCH_FLOW_STATE_GROUPS):
+        return TOUCH_FLOW_TTL_SECONDS
+    return None
+
+
+class SharedRedisStorage(RedisStorage):
+    """
+    RedisStorage поверх общего пула: пул закрывает close_redis(), а не диспетчер.
+    TTL ключей state и data определяется текущим состоянием (_ttl_for_state).
+    """
+
+    async def close(self) -> None:
+        pass
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state_key = self.key_builder.build(key, "state")
+        data_key = self.key_builder.build(key, "data")
+        if state is None:
+            await self.redis.delete(state_key)
+            return
+        state_name = state.state if isinstance(state, State) else state
+        ttl = _ttl_for_state(state_name)
+        await self.redis.set(state_key, state_name, ex=ttl)
+        # Данные живут столько же, сколько состояние
+        if ttl:
+            await self.redis.expire(data_key, ttl)
+        else:
+            await self.redis.persist(data_key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        data_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.redis.delete(data_key)
+            return
+        state_name = await self.redis.get(self.key_builder.build(key, "state"))
+        await self.redis.set(data_key, self.json_dumps(data), ex=_ttl_for_state(state_name))
+
+
+def get_fsm_storage() -> SharedRedisStorage:
+    """Хранилище FSM на текущем клиенте Redis (пересоздаётся вместе с пулом)."""
+    global _storage
+    redis_client = get_redis()
+    if _storage is None or _storage.redis is not redis_client:
+        _storage = SharedRedisStorage(
+            redis=redis_client,
+            key_builder=UserKeyBuilder(),
+        )
+    return _storage
+
+
+def get_user_state(bot_id: int, telegram_id: int) -> FSMContext:
+    """FSMContext пользователя вне хендлера (планировщик, админка)."""
+    key = StorageKey(bot_id=bot_id, chat_id=telegram_id, user_id=telegram_id)
+    return FSMContext(storage=get_fsm_storage(), key=key)
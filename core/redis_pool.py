@@ -0,0 +1,50 @@
+"""
+Общий асинхронный пул соединений Redis.
+
+Все обращения к Redis (FSM-ключи, кэши) идут через get_redis(): клиент с пулом
+соединений создаётся один раз на процесс и не блокирует event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+from redis import asyncio as aioredis
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[aioredis.Redis] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """
+    Клиент Redis поверх общего пула соединений (settings.redis_dsn).
+
+    Соединения привязаны к event loop, поэтому при смене цикла (админка вызывает
+    asyncio.run на каждое действие) пул создаётся заново.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = aioredis.from_url(
+            settings.redis_dsn,
+            decode_responses=True,
+            max_connections=settings.redis_max_connections,
+            health_check_interval=30,
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_redis() -> None:
+    """Закрыть пул соединений (при остановке бота)."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        logger.info("Пул соединений Redis закрыт")
+    _client = None
+    _client_loop = None
@@ -39,6 +39,7 @@ class TouchQuestionStates(StatesGroup):
     """Состояния для ответов на вопросы касания"""
     waiting_for_answer = State()  # Ожидание ответа на вопрос касания
     waiting_for_voice_confirmation = State()  # Ожидание подтверждения голосового сообщения
+    processing_answer = State()  # Ответ в очереди на расшифровку и анализ
 
 
 class EveningRatingStates(StatesGroup):
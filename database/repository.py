@@ -1,5 +1,6 @@
 from typing import Generic, TypeVar, Type, Optional, List
 from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from database.base import Base
 
@@ -62,3 +63,56 @@ class BaseRepository(Generic[ModelType]):
         return list(self.session.scalars(query).all())
 
 
+class AsyncBaseRepository(Generic[ModelType]):
+    """Асинхронный базовый репозиторий с CRUD операциями (AsyncSession)"""
+
+    def __init__(self, model: Type[ModelType], session: AsyncSession):
+        self.model = model
+        self.session = session
+
+    async def get_by_id(self, id: int) -> Optional[ModelType]:
+        """Получить запись по ID"""
+        return await self.session.get(self.model, id)
+
+    async def get_all(self, skip: int = 0, limit: int = 100, active_only: bool = True) -> List[ModelType]:
+        """Получить все записи с пагинацией"""
+        query = select(self.model)
+        if active_only:
+            query = query.where(self.model.is_active == True)
+        query = query.offset(skip).limit(limit)
+        return list((await self.session.scalars(query)).all())
+
+    async def create(self, **kwargs) -> ModelType:
+        """Создать новую запись"""
+        instance = self.model(**kwargs)
+        self.session.add(instance)
+        await self.session.commit()
+        await self.session.refresh(instance)
+        return instance
+
+    async def update(self, id: int, **kwargs) -> Optional[ModelType]:
+        """Обновить запись"""
+        instance = await self.get_by_id(id)
+        if instance:
+            for key, value in kwargs.items():
+                setattr(instance, key, value)
+            await self.session.commit()
+            await self.session.refresh(instance)
+        return instance
+
+    async def delete(self, id: int, soft: bool = True) -> bool:
+        """Удалить запись (soft delete по умолчанию)"""
+        instance = await self.get_by_id(id)
+        if instance:
+            if soft:
+                instance.is_active = False
+            else:
+                await self.session.delete(instance)
+            await self.session.commit()
+            return True
+        return False
+
+    async def filter_by(self, **kwargs) -> List[ModelType]:
+        """Фильтрация по параметрам"""
+        query = select(self.model).filter_by(**kwargs)
+        return list((await self.session.scalars(query)).all())
@@ -1,6 +1,8 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import NullPool
 
@@ -16,13 +18,32 @@ if not DB_URL.startswith("sqlite"):
         "options": "-c statement_timeout=30000",  # Таймаут запросов 30 секунд
     }
 
+
+def _pool_kwargs(url: str) -> dict:
+    """
+    Параметры пула соединений для движка с DSN url.
+
+    DB_POOL_SIZE=0 возвращает прежнее поведение: новое соединение на каждую сессию.
+    SQLite (и aiosqlite) получает пул своего диалекта: размеры QueuePool его пулы не принимают.
+    """
+    if str(url).startswith("sqlite"):
+        return {}
+    if settings.db_pool_size <= 0:
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
 engine = create_engine(
     DB_URL,
-    poolclass=NullPool,
     echo=False,  # settings.debug
     future=True,
     connect_args=connect_args,
     pool_pre_ping=True,  # Проверка соединения перед использованием
+    **_pool_kwargs(DB_URL),
 )
 
 SessionLocal = sessionmaker(
@@ -33,6 +54,37 @@ SessionLocal = sessionmaker(
     future=True
 )
 
+# Асинхронный движок для бота: соединения asyncpg живут в пуле и не блокируют event loop.
+# Соединения привязаны к event loop бота, поэтому админка (asyncio.run на каждое действие)
+# работает только через синхронный SessionLocal.
+ASYNC_DB_URL = settings.async_db_url
+
+async_connect_args = {}
+if ASYNC_DB_URL.startswith("postgresql+asyncpg"):
+    ASYNC_DB_URL = make_url(ASYNC_DB_URL).update_query_dict(
+        {"prepared_statement_cache_size": str(settings.db_statement_cache_size)}
+    )
+    async_connect_args = {
+        "timeout": 10,  # Таймаут подключения 10 секунд
+        "statement_cache_size": settings.db_statement_cache_size,
+        "server_settings": {"statement_timeout": "30000"},  # Таймаут запросов 30 секунд
+    }
+
+async_engine = create_async_engine(
+    ASYNC_DB_URL,
+    echo=False,
+    connect_args=async_connect_args,
+    pool_pre_ping=True,
+    **_pool_kwargs(ASYNC_DB_URL),
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,  # Объекты остаются доступны после commit без повторной загрузки
+)
+
 
 def get_session() -> Generator[Session, None, None]:
     """Генератор сессии для использования в зависимостях"""
@@ -48,3 +100,7 @@ def get_db() -> Generator[Session, None, None]:
     yield from get_session()
 
 
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Асинхронный генератор сессии"""
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -1,17 +1,15 @@
 """Обработчики для вечерней оценки"""
 import logging
-import json
-import redis
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 
-from core.config import settings
 from core.states import EveningRatingStates
 from datetime import date
-from database.session import get_session
-from repositories.user_repository import UserRepository
-from repositories.evening_rating_repository import EveningRatingRepository
+from database.session import AsyncSessionLocal
+from repositories.user_repository import AsyncUserRepository
+from repositories.evening_rating_repository import AsyncEveningRatingRepository
+from repositories.touch_content_repository import AsyncTouchContentRepository
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -28,7 +26,6 @@ async def _handle_rating_energy(callback: CallbackQuery, state: FSMContext):
         current_question=1,
         next_question_text="По шкале от 1 до 10 оцени уровень счастья в деятельности сегодня",
         next_state=EveningRatingStates.rating_happiness,
-        next_state_name="rating_happiness",
         rating_key="rating_energy"
     )
 
@@ -44,7 +41,6 @@ async def _handle_rating_happiness(callback: CallbackQuery, state: FSMContext):
         current_question=2,
         next_question_text="По шкале от 1 до 10 оцени, насколько сегодня ты продвинулся к своим значимым результатам",
         next_state=EveningRatingStates.rating_progress,
-        next_state_name="rating_progress",
         rating_key="rating_happiness"
     )
 
@@ -53,42 +49,26 @@ async def _handle_rating_progress(callback: CallbackQuery, state: FSMContext):
     """Обработка ответа на вопрос 3/5: Оценка продвижения к результату/целям курса."""
     rating_value = int(callback.data.replace("evening_rating_", ""))
     
-    bot_id = callback.bot.id
     telegram_id = callback.from_user.id
     
-    redis_client = _get_redis_client()
-    state_key = f"fsm:{bot_id}:{telegram_id}:state"
-    data_key = f"fsm:{bot_id}:{telegram_id}:data"
-    
-    # Загружаем данные из Redis
-    redis_data_raw = redis_client.get(data_key)
-    if redis_data_raw:
-        redis_data = json.loads(redis_data_raw)
-    else:
-        redis_data = {}
-    
     # Сохраняем текущую оценку
-    redis_data["rating_progress"] = rating_value
-    
-    # Сохраняем обратно в Redis
-    redis_client.set(data_key, json.dumps(redis_data), ex=3600)
+    data = await state.update_data(rating_progress=rating_value)
     
     # Сохраняем в БД
-    session = next(get_session())
-    try:
-        user_repo = UserRepository(session)
-        user = user_repo.get_by_telegram_id(telegram_id)
+    async with AsyncSessionLocal() as session:
+        user_repo = AsyncUserRepository(session)
+        user = await user_repo.get_by_telegram_id(telegram_id)
         if user:
-            rating_repo = EveningRatingRepository(session)
+            rating_repo = AsyncEveningRatingRepository(session)
             rating_date = date.today()
             
-            # Получаем все оценки из Redis
-            rating_energy = redis_data.get('rating_energy')
-            rating_happiness = redis_data.get('rating_happiness')
+            # Получаем все оценки из FSM
+            rating_energy = data.get('rating_energy')
+            rating_happiness = data.get('rating_happiness')
             
             # Если все оценки есть, сохраняем
             if rating_energy is not None and rating_happiness is not None:
-                rating_repo.create_or_update(
+                await rating_repo.create_or_update(
                     user_id=user.id,
                     rating_date=rating_date,
                     rating_energy=rating_energy,
@@ -98,8 +78,6 @@ async def _handle_rating_progress(callback: CallbackQuery, state: FSMContext):
                 logger.info(f"[EVENING_RATING] Сохранены оценки для пользователя {user.id}: энергия={rating_energy}, счастье={rating_happiness}, прогресс={rating_value}")
             else:
                 logger.warning(f"[EVENING_RATING] Не все оценки получены для пользователя {user.id}, сохраняем только прогресс")
-    finally:
-        session.close()
     
     await callback.answer(f"Вы выбрали: {rating_value}")
     
@@ -108,42 +86,34 @@ async def _handle_rating_progress(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer(reflection_text)
     
     # Получаем touch_content_id и отправляем вопросы из админки
-    touch_content_id = redis_data.get("touch_content_id")
-    if touch_content_id:
-        await _send_evening_questions(callback.bot, telegram_id, bot_id, touch_content_id, redis_client, state)
-    else:
-        logger.warning(f"[EVENING_RATING] touch_content_id не найден в Redis для пользователя {telegram_id}")
+    touch_content_id = data.get("touch_content_id")
+    if not touch_content_id:
+        logger.warning(f"[EVENING_RATING] touch_content_id не найден в FSM для пользователя {telegram_id}")
         # Если нет touch_content_id, просто очищаем состояние
-        redis_client.delete(state_key, data_key)
         await state.clear()
+        return
     
-    # Если вопросы не были отправлены, всё равно устанавливаем состояние для обработки ответа на рефлексию
-    # Проверяем, изменилось ли состояние (если нет - значит вопросы не найдены)
-    current_state = redis_client.get(state_key)
-    if current_state and current_state == "EveningRatingStates:rating_progress":
-        # Вопросы не были отправлены, устанавливаем состояние для обработки рефлексии
+    questions_sent = await _send_evening_questions(callback.bot, telegram_id, touch_content_id, state)
+    if not questions_sent:
+        # Вопросы не были отправлены, всё равно устанавливаем состояние для обработки ответа на рефлексию
         from core.states import TouchQuestionStates
-        redis_client.set(state_key, "TouchQuestionStates:waiting_for_answer", ex=3600)
-        redis_data["reflection_mode"] = True  # Флаг, что мы ожидаем ответ на рефлексию без вопросов
-        redis_client.set(data_key, json.dumps(redis_data), ex=3600)
         await state.set_state(TouchQuestionStates.waiting_for_answer)
+        await state.update_data(reflection_mode=True)  # Флаг, что мы ожидаем ответ на рефлексию без вопросов
         logger.info(f"[EVENING_RATING] Вопросы не найдены, устанавливаем состояние для обработки рефлексии")
 
 
-async def _send_evening_questions(bot, telegram_id: int, bot_id: int, touch_content_id: int, redis_client, state: FSMContext) -> None:
-    """Отправить вопросы из админки для вечернего касания."""
-    from database.session import SessionLocal
-    from repositories.touch_content_repository import TouchContentRepository
+async def _send_evening_questions(bot, telegram_id: int, touch_content_id: int, state: FSMContext) -> bool:
+    """Отправить вопросы из админки для вечернего касания. Возвращает True, если вопросы отправлены."""
     from core.states import TouchQuestionStates
     
     # Получаем touch_content из БД
-    with SessionLocal() as session:
-        repo = TouchContentRepository(session)
-        touch_content = repo.get_by_id(touch_content_id)
+    async with AsyncSessionLocal() as session:
+        repo = AsyncTouchContentRepository(session)
+        touch_content = await repo.get_by_id(touch_content_id)
     
     if not touch_content or not touch_content.questions:
         logger.warning(f"[EVENING_RATING] Вопросы не найдены для touch_content_id={touch_content_id}")
-        return
+        return False
     
     # Разделяем вопросы по переносу строки
     questions_text = touch_content.questions.strip()
@@ -152,69 +122,45 @@ async def _send_evening_questions(bot, telegram_id: int, bot_id: int, touch_cont
     
     if not questions_list:
         logger.warning(f"[EVENING_RATING] Список вопросов пуст после разделения")
-        return
+        return False
     
     # Отправляем первый вопрос
     first_question = questions_list[0]
     await bot.send_message(telegram_id, first_question)
     
-    # Сохраняем состояние и данные в Redis для обработки ответов
-    state_key = f"fsm:{bot_id}:{telegram_id}:state"
-    data_key = f"fsm:{bot_id}:{telegram_id}:data"
-    
-    # Сохраняем состояние для обработки вопросов касания
-    redis_client.set(state_key, "TouchQuestionStates:waiting_for_answer", ex=3600)
-    
-    # Сохраняем данные о вопросах
-    redis_data = {
+    # Устанавливаем состояние для обработки вопросов касания
+    await state.set_state(TouchQuestionStates.waiting_for_answer)
+    await state.set_data({
         "touch_content_id": touch_content_id,
         "questions_list": questions_list,
         "current_question_index": 0,
         "answers": []
-    }
-    redis_client.set(data_key, json.dumps(redis_data), ex=3600)
-    
-    # Устанавливаем состояние в FSM
-    await state.set_state(TouchQuestionStates.waiting_for_answer)
-    await state.update_data(
-        touch_content_id=touch_content_id,
-        questions_list=questions_list,
-        current_question_index=0,
-        answers=[]
-    )
+    })
     
     logger.info(f"[EVENING_RATING] Отправлен первый вопрос из админки, всего вопросов: {len(questions_list)}")
+    return True
 
 
 @router.callback_query(F.data.startswith("evening_rating_"))
 async def callback_evening_rating_check_state(callback: CallbackQuery, state: FSMContext):
-    """Проверяет состояние в Redis и перенаправляет на соответствующий обработчик."""
-    bot_id = callback.bot.id
-    telegram_id = callback.from_user.id
+    """Перенаправляет оценку на обработчик текущего вопроса по состоянию FSM."""
+    current_state = await state.get_state()
     
-    redis_client = _get_redis_client()
-    state_key = f"fsm:{bot_id}:{telegram_id}:state"
-    redis_state = redis_client.get(state_key)
+    logger.info(f"[EVENING_RATING] Текущее состояние: {current_state}")
     
-    logger.info(f"[EVENING_RATING] Проверяем Redis для определения состояния: {redis_state}")
-    
-    # Если состояние не найдено в Redis, пропускаем
-    if not redis_state:
-        logger.info(f"[EVENING_RATING] Состояние не найдено в Redis, пропускаем")
+    # Если состояния нет (истекло или уже сброшено), пропускаем
+    if not current_state:
+        logger.info(f"[EVENING_RATING] Состояние не найдено, пропускаем")
         return
     
-    # Устанавливаем состояние в FSM на основе Redis и вызываем соответствующий обработчик
-    if redis_state == "EveningRatingStates:rating_energy":
-        await state.set_state(EveningRatingStates.rating_energy)
+    if current_state == EveningRatingStates.rating_energy.state:
         await _handle_rating_energy(callback, state)
-    elif redis_state == "EveningRatingStates:rating_happiness":
-        await state.set_state(EveningRatingStates.rating_happiness)
+    elif current_state == EveningRatingStates.rating_happiness.state:
         await _handle_rating_happiness(callback, state)
-    elif redis_state == "EveningRatingStates:rating_progress":
-        await state.set_state(EveningRatingStates.rating_progress)
+    elif current_state == EveningRatingStates.rating_progress.state:
         await _handle_rating_progress(callback, state)
     else:
-        logger.warning(f"[EVENING_RATING] Неизвестное состояние в Redis: {redis_state}")
+        logger.warning(f"[EVENING_RATING] Неожиданное состояние для оценки: {current_state}")
 
 
 def _create_rating_keyboard():
@@ -227,16 +173,6 @@ def _create_rating_keyboard():
     return builder.as_markup()
 
 
-def _get_redis_client():
-    """Получить клиент Redis."""
-    return redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        password=settings.redis_password,
-        db=settings.redis_db,
-        decode_responses=True
-    )
-
 
 async def _save_rating_and_send_next(
     callback: CallbackQuery,
@@ -245,38 +181,11 @@ async def _save_rating_and_send_next(
     current_question: int,
     next_question_text: str,
     next_state: EveningRatingStates,
-    next_state_name: str,
     rating_key: str
 ) -> None:
     """Сохранить оценку и отправить следующий вопрос."""
-    bot_id = callback.bot.id
-    telegram_id = callback.from_user.id
-    
-    redis_client = _get_redis_client()
-    state_key = f"fsm:{bot_id}:{telegram_id}:state"
-    data_key = f"fsm:{bot_id}:{telegram_id}:data"
-    
-    # Загружаем данные из Redis
-    redis_data_raw = redis_client.get(data_key)
-    if redis_data_raw:
-        redis_data = json.loads(redis_data_raw)
-    else:
-        redis_data = {
-            "rating_energy": None,
-            "rating_happiness": None,
-            "rating_progress": None,
-            "rating_question_4": None,
-            "rating_question_5": None,
-            "current_question": current_question
-        }
-    
     # Сохраняем текущую оценку
-    redis_data[rating_key] = rating_value
-    redis_data["current_question"] = current_question + 1
-    
-    # Сохраняем обратно в Redis
-    redis_client.set(data_key, json.dumps(redis_data), ex=3600)
-    redis_client.set(state_key, f"EveningRatingStates:{next_state_name}", ex=3600)
+    await state.update_data({rating_key: rating_value, "current_question": current_question + 1})
     
     # Устанавливаем состояние в FSM
     await state.set_state(next_state)
@@ -9,11 +9,10 @@ from zoneinfo import ZoneInfo
 
 from typing import TYPE_CHECKING
 
-import redis
 
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, FSInputFile
+from aiogram.types import CallbackQuery
 
 from datetime import date
 from core.config import settings
@@ -25,13 +24,14 @@ from whisper_client import transcribe_audio
 from io import BytesIO
 from aiogram.types import CallbackQuery
 from database.session import get_session
-from repositories.saturday_reflection_repository import SaturdayReflectionRepository
-from repositories.user_repository import UserRepository
-from database.session import get_session
-from repositories.touch_content_repository import TouchContentRepository
+from repositories.saturday_reflection_repository import AsyncSaturdayReflectionRepository
 from repositories.user_repository import UserRepository
+from database.session import AsyncSessionLocal, get_session
+from repositories.touch_content_repository import AsyncTouchContentRepository
+from repositories.user_repository import AsyncUserRepository, UserRepository
 from services.payment import PaymentService
-from services.touch_utils import calculate_course_day, fetch_touch_content
+from services.touch_utils import calculate_course_day, resolve_touch_contents
+from services.video_cache import send_touch_video
 
 if TYPE_CHECKING:
     from models.user import User
@@ -313,176 +313,180 @@ async def callback_about_bot(callback: CallbackQuery):
     await callback.answer()
 
 
+# Будем отправлять три касания: утро, день, вечер — как в реальных рассылках
+DAY_STRATEGY_TOUCHES = (
+    ("morning", "Касание УТРО"),
+    ("day", "Касание ДЕНЬ"),
+    ("evening", "Касание ВЕЧЕР"),
+)
+
+
 @router.callback_query(F.data == "day_strategy")
 async def callback_day_strategy(callback: CallbackQuery):
     """Экран 'Стратегия дня'."""
     # Отвечаем на callback query сразу, чтобы избежать таймаута
     await callback.answer()
-    
-    session_gen = get_session()
-    session = next(session_gen)
-    try:
-        try:
-            user_repo = UserRepository(session)
-            user = user_repo.get_by_telegram_id(callback.from_user.id)
-        except Exception as db_error:
-            # Если БД недоступна, продолжаем работу без сохранения
-            logger.warning(f"Не удалось получить пользователя из БД: {db_error}. Продолжаем работу.")
-            await callback.message.answer("База данных временно недоступна. Попробуйте позже.")
-            return
 
-        if not user:
-            user = user_repo.create(
-                telegram_id=callback.from_user.id,
-                username=callback.from_user.username,
-                first_name=callback.from_user.first_name,
-                last_name=callback.from_user.last_name,
-                language_code=callback.from_user.language_code,
-            )
+    tz = ZoneInfo("Europe/Moscow")
+    today = datetime.now(tz=tz).date()
+    course_day = None
+    contents = {}
 
-        # Если первый раз - показываем интро
-        if user.is_first_visit:
-            first_text = get_booking_text("know_better_first_time")
-            await callback.message.answer(first_text)
+    # Пользователь и контент загружаются заранее: соединение из пула не удерживается
+    # на время пауз между сообщениями
+    try:
+        async with AsyncSessionLocal() as session:
+            user_repo = AsyncUserRepository(session)
+            user = await user_repo.get_by_telegram_id(callback.from_user.id)
+            if not user:
+                user = await user_repo.create(
+                    telegram_id=callback.from_user.id,
+                    username=callback.from_user.username,
+                    first_name=callback.from_user.first_name,
+                    last_name=callback.from_user.last_name,
+                    language_code=callback.from_user.language_code,
+                )
 
-            second_text = get_booking_text("know_better_three_touches")
-            await _send_keyboard_message(
-                callback,
-                second_text,
-                {"Понятно, идем дальше": "understood_move_on"},
-                interval=1,
-            )
-            return
+            if not user.is_first_visit:
+                logger.info(
+                    "[DAY_STRATEGY] Пользователь %s: рассчитываем день курса для даты %s",
+                    callback.from_user.id,
+                    today,
+                )
+                course_day = calculate_course_day(user, today)
+                touch_repo = AsyncTouchContentRepository(session)
+                for touch_type, _ in DAY_STRATEGY_TOUCHES:
+                    resolved = await resolve_touch_contents(
+                        touch_repo,
+                        touch_type=touch_type,
+                        course_days=[course_day],
+                    )
+                    contents[touch_type] = resolved[course_day]
+    except Exception as db_error:
+        # Если БД недоступна, продолжаем работу без сохранения
+        logger.warning(f"Не удалось получить пользователя из БД: {db_error}. Продолжаем работу.")
+        await callback.message.answer("База данных временно недоступна. Попробуйте позже.")
+        return
 
-        # Если не первый раз - показываем тот же контент «Стратегии дня», что и в дневном касании
-        tz = ZoneInfo("Europe/Moscow")
-        today = datetime.now(tz=tz).date()
+    # Если первый раз - показываем интро
+    if user.is_first_visit:
+        first_text = get_booking_text("know_better_first_time")
+        await callback.message.answer(first_text)
 
-        logger.info(
-            "[DAY_STRATEGY] Пользователь %s: рассчитываем день курса для даты %s",
-            callback.from_user.id,
-            today,
+        second_text = get_booking_text("know_better_three_touches")
+        await _send_keyboard_message(
+            callback,
+            second_text,
+            {"Понятно, идем дальше": "understood_move_on"},
+            interval=1,
         )
+        return
 
-        course_day = calculate_course_day(user, today)
-        touch_repo = TouchContentRepository(session)
+    # Если не первый раз - показываем тот же контент «Стратегии дня», что и в дневном касании
 
-        # Будем отправлять три касания: утро, день, вечер — как в реальных рассылках
-        touch_order = [
-            ("morning", "Касание УТРО"),
-            ("day", "Касание ДЕНЬ"),
-            ("evening", "Касание ВЕЧЕР"),
-        ]
+    # Базовая директория для видеофайлов касаний (Django складывает их в admin_panel/media)
+    from pathlib import Path
 
-        # Базовая директория для видеофайлов касаний (Django складывает их в admin_panel/media)
-        from pathlib import Path
+    media_base = Path("admin_panel") / "media"
 
-        media_base = Path("admin_panel") / "media"
+    any_content_sent = False
 
-        any_content_sent = False
+    for touch_type, header in DAY_STRATEGY_TOUCHES:
+        content = contents.get(touch_type)
+        if not content:
+            logger.warning(
+                "[DAY_STRATEGY] Контент не найден для touch_type=%s, day=%s",
+                touch_type,
+                course_day,
+            )
+            continue
 
-        for touch_type, header in touch_order:
-            content = fetch_touch_content(touch_repo, touch_type=touch_type, course_day=course_day)
-            if not content:
-                # Если на конкретный день нет — используем дефолт или любой активный
-                content = touch_repo.get_default(touch_type) or touch_repo.get_any_active(touch_type)
+        any_content_sent = True
 
-            if not content:
-                logger.warning(
-                    "[DAY_STRATEGY] Контент не найден для touch_type=%s, day=%s",
-                    touch_type,
-                    course_day,
-                )
-                continue
+        logger.info(
+            "[DAY_STRATEGY] Отправляем %s: id=%s, summary=%s, video_url=%s, video_file=%s",
+            touch_type,
+            content.id,
+            "есть" if content.summary else "нет",
+            "есть" if content.video_url else "нет",
+            getattr(content, "video_file_path", None),
+        )
+
+        # Заголовок касания (как в скрине «Касание ДЕНЬ»)
+        await callback.message.answer(header)
+        await asyncio.sleep(3)
 
-            any_content_sent = True
+        # 1) summary используем как caption к видео, если оно есть
+        caption = content.summary.strip() if content.summary else None
 
+        # 2) видео / ссылка на видео
+        video_file_path = getattr(content, "video_file_path", None)
+        if video_file_path:
+            file_path = media_base / video_file_path
             logger.info(
-                "[DAY_STRATEGY] Отправляем %s: id=%s, summary=%s, video_url=%s, video_file=%s",
+                "[DAY_STRATEGY] Видео-файл для %s: %s (exists=%s)",
                 touch_type,
-                content.id,
-                "есть" if content.summary else "нет",
-                "есть" if content.video_url else "нет",
-                getattr(content, "video_file_path", None),
+                file_path,
+                file_path.exists(),
             )
-
-            # Заголовок касания (как в скрине «Касание ДЕНЬ»)
-            await callback.message.answer(header)
-            await asyncio.sleep(3)
-
-            # 1) summary используем как caption к видео, если оно есть
-            caption = content.summary.strip() if content.summary else None
-
-            # 2) видео / ссылка на видео
-            video_file_path = getattr(content, "video_file_path", None)
-            if video_file_path:
-                from aiogram.types import FSInputFile
-
-                file_path = media_base / video_file_path
-                logger.info(
-                    "[DAY_STRATEGY] Видео-файл для %s: %s (exists=%s)",
-                    touch_type,
-                    file_path,
-                    file_path.exists(),
-                )
-                if file_path.exists():
-                    try:
-                        await callback.message.answer_video(
-                            FSInputFile(file_path),
-                            caption=caption,
-                        )
-                    except Exception as send_err:  # noqa: BLE001
-                        logger.warning("Не удалось отправить видео-файл %s: %s", file_path, send_err)
-                        if content.video_url:
-                            from aiogram.types import LinkPreviewOptions
-                            await callback.message.answer(content.video_url.strip(), link_preview_options=LinkPreviewOptions(is_disabled=True))
-                            if caption:
-                                await asyncio.sleep(3)
-                                await callback.message.answer(caption)
-                elif content.video_url:
-                    from aiogram.types import LinkPreviewOptions
-                    await callback.message.answer(content.video_url.strip(), link_preview_options=LinkPreviewOptions(is_disabled=True))
-                    if caption:
-                        await asyncio.sleep(3)
-                        await callback.message.answer(caption)
+            if file_path.exists():
+                try:
+                    await send_touch_video(
+                        callback.bot,
+                        callback.message.chat.id,
+                        content.id,
+                        file_path,
+                        caption=caption,
+                    )
+                except Exception as send_err:  # noqa: BLE001
+                    logger.warning("Не удалось отправить видео-файл %s: %s", file_path, send_err)
+                    if content.video_url:
+                        from aiogram.types import LinkPreviewOptions
+                        await callback.message.answer(content.video_url.strip(), link_preview_options=LinkPreviewOptions(is_disabled=True))
+                        if caption:
+                            await asyncio.sleep(3)
+                            await callback.message.answer(caption)
             elif content.video_url:
-                # Видео по ссылке + caption отдельным сообщением
                 from aiogram.types import LinkPreviewOptions
                 await callback.message.answer(content.video_url.strip(), link_preview_options=LinkPreviewOptions(is_disabled=True))
                 if caption:
                     await asyncio.sleep(3)
                     await callback.message.answer(caption)
-            else:
-                # Если видео нет совсем — просто отправляем описание
-                if caption:
-                    await callback.message.answer(caption)
-
-            # 3) вопросы (если есть): сначала короткое вступление, затем список вопросов
-            if content.questions:
-                await asyncio.sleep(3)
-                await callback.message.answer("Какие вопросы Вас сегодня ожидают.")
+        elif content.video_url:
+            # Видео по ссылке + caption отдельным сообщением
+            from aiogram.types import LinkPreviewOptions
+            await callback.message.answer(content.video_url.strip(), link_preview_options=LinkPreviewOptions(is_disabled=True))
+            if caption:
                 await asyncio.sleep(3)
-                await callback.message.answer(content.questions.strip())
+                await callback.message.answer(caption)
+        else:
+            # Если видео нет совсем — просто отправляем описание
+            if caption:
+                await callback.message.answer(caption)
 
-            # Пауза перед следующим типом касания
+        # 3) вопросы (если есть): сначала короткое вступление, затем список вопросов
+        if content.questions:
             await asyncio.sleep(3)
+            await callback.message.answer("Какие вопросы Вас сегодня ожидают.")
+            await asyncio.sleep(3)
+            await callback.message.answer(content.questions.strip())
 
-        if not any_content_sent:
-            # Если ничего вообще не нашли по всем типам касаний
-            logger.warning("[DAY_STRATEGY] Контент для стратегии дня не найден (morning/day/evening)")
-            error_message = "Контент для стратегии дня временно недоступен. Пожалуйста, попробуйте позже."
-            await callback.message.answer(error_message)
+        # Пауза перед следующим типом касания
+        await asyncio.sleep(3)
 
-            step_6_text = get_booking_text("step_6")
-            await _send_keyboard_message(
-                callback,
-                step_6_text,
-                MAIN_MENU_BUTTONS,
-                interval=2,
-            )
+    if not any_content_sent:
+        # Если ничего вообще не нашли по всем типам касаний
+        logger.warning("[DAY_STRATEGY] Контент для стратегии дня не найден (morning/day/evening)")
+        error_message = "Контент для стратегии дня временно недоступен. Пожалуйста, попробуйте позже."
+        await callback.message.answer(error_message)
 
-    finally:
-        session.close()
+        step_6_text = get_booking_text("step_6")
+        await _send_keyboard_message(
+            callback,
+            step_6_text,
+            MAIN_MENU_BUTTONS,
+            interval=2,
+        )
 
 
 @router.callback_query(F.data == "know_better")
@@ -940,25 +944,22 @@ async def _handle_saturday_confirmation(
         
         # Сохраняем в БД
         try:
-            session = next(get_session())
-            try:
-                user_repo = UserRepository(session)
-                user = user_repo.get_by_telegram_id(callback.from_user.id)
+            async with AsyncSessionLocal() as session:
+                user_repo = AsyncUserRepository(session)
+                user = await user_repo.get_by_telegram_id(callback.from_user.id)
                 
                 if user:
-                    reflection_repo = SaturdayReflectionRepository(session)
+                    reflection_repo = AsyncSaturdayReflectionRepository(session)
                     reflection_date = date.today()
                     
                     # Сохраняем текущий сегмент
                     kwargs = {f"segment_{segment}": processed_text}
-                    reflection_repo.create_or_update(
+                    await reflection_repo.create_or_update(
                         user_id=user.id,
                         reflection_date=reflection_date,
                         **kwargs
                     )
                     logger.info(f"[SATURDAY] Сохранен сегмент {segment} для пользователя {user.id}")
-            finally:
-                session.close()
         except Exception as e:
             logger.error(f"[SATURDAY] Ошибка при сохранении в БД: {e}", exc_info=True)
         
@@ -982,17 +983,16 @@ async def _handle_saturday_confirmation(
         else:
             # Все сегменты пройдены - сохраняем все ответы в БД
             try:
-                session = next(get_session())
-                try:
-                    user_repo = UserRepository(session)
-                    user = user_repo.get_by_telegram_id(callback.from_user.id)
+                async with AsyncSessionLocal() as session:
+                    user_repo = AsyncUserRepository(session)
+                    user = await user_repo.get_by_telegram_id(callback.from_user.id)
                     
                     if user:
-                        reflection_repo = SaturdayReflectionRepository(session)
+                        reflection_repo = AsyncSaturdayReflectionRepository(session)
                         reflection_date = date.today()
                         
                         # Сохраняем все ответы
-                        reflection_repo.create_or_update(
+                        await reflection_repo.create_or_update(
                             user_id=user.id,
                             reflection_date=reflection_date,
                             segment_1=answers.get("segment_1"),
@@ -1002,8 +1002,6 @@ async def _handle_saturday_confirmation(
                             segment_5=answers.get("segment_5"),
                         )
                         logger.info(f"[SATURDAY] Сохранена полная рефлексия для пользователя {user.id}")
-                finally:
-                    session.close()
             except Exception as e:
                 logger.error(f"[SATURDAY] Ошибка при сохранении полной рефлексии в БД: {e}", exc_info=True)
             
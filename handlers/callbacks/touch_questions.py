@@ -1,11 +1,10 @@
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
-from io import BytesIO
 
 from core.keyboards import KeyboardOperations
 from core.states import TouchQuestionStates
-from whisper_client import transcribe_audio
+from core.texts import get_booking_text
 import logging
 
 router = Router()
@@ -29,50 +28,9 @@ async def callback_touch_voice_confirm(callback: CallbackQuery, state: FSMContex
     """Обработчик кнопки 'Фиксируем' для голосового сообщения"""
     await callback.answer()
     
-    # Загружаем данные из Redis, если их нет в state
-    try:
-        import redis
-        import json
-        from core.config import settings
-        
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-            db=settings.redis_db,
-            decode_responses=True
-        )
-        
-        bot_id = callback.bot.id
-        telegram_id = callback.from_user.id
-        data_key = f"fsm:{bot_id}:{telegram_id}:data"
-        
-        # Загружаем данные из Redis
-        redis_data = redis_client.get(data_key)
-        if redis_data:
-            logger.info(f"[TOUCH_QUESTION] Загружаем данные из Redis в callback")
-            data = json.loads(redis_data)
-            questions_list = data.get("questions_list", [])
-            current_question_index = data.get("current_question_index", 0)
-            logger.info(f"[TOUCH_QUESTION] ===== ЗАГРУЗКА ДАННЫХ ИЗ REDIS =====")
-            logger.info(f"[TOUCH_QUESTION] Ключ Redis: {data_key}")
-            logger.info(f"[TOUCH_QUESTION] Текущий индекс вопроса из Redis: {current_question_index}")
-            logger.info(f"[TOUCH_QUESTION] Всего вопросов: {len(questions_list)}")
-            if questions_list and current_question_index < len(questions_list):
-                logger.info(f"[TOUCH_QUESTION] Текущий вопрос (индекс {current_question_index}): {questions_list[current_question_index]}")
-            logger.info(f"[TOUCH_QUESTION] Список всех вопросов: {questions_list}")
-            logger.info(f"[TOUCH_QUESTION] =====================================")
-            # Сохраняем в state для использования
-            await state.update_data(
-                touch_content_id=data.get("touch_content_id"),
-                questions_list=questions_list,
-                current_question_index=current_question_index,
-                answers=data.get("answers", []),
-                telegram_id=callback.from_user.id  # Сохраняем telegram_id для использования при обновлении
-            )
-            logger.info(f"[TOUCH_QUESTION] Данные загружены в callback: questions_list={len(questions_list)}, current_question_index={current_question_index}, telegram_id={callback.from_user.id}")
-    except Exception as e:
-        logger.error(f"[TOUCH_QUESTION] Ошибка при загрузке данных из Redis в callback: {e}", exc_info=True)
+    # Повторное нажатие, пока ответ уже в очереди на обработку
+    if await state.get_state() != TouchQuestionStates.waiting_for_voice_confirmation.state:
+        return
     
     # Получаем file_id голосового сообщения из state
     data = await state.get_data()
@@ -89,45 +47,15 @@ async def callback_touch_voice_confirm(callback: CallbackQuery, state: FSMContex
     except:
         pass
     
-    # Показываем, что обрабатываем
-    processing_msg = await callback.message.answer("🔄 Обрабатываю голосовое сообщение...")
-    
-    try:
-        # Скачиваем голосовое сообщение
-        file = await callback.bot.get_file(voice_file_id)
-        audio_data = BytesIO()
-        await callback.bot.download_file(file.file_path, destination=audio_data)
-        
-        # Расшифровываем через Whisper
-        logger.info(f"[TOUCH_QUESTION] Расшифровываем голосовое сообщение")
-        answer_text = await transcribe_audio(audio_data)
-        
-        if not answer_text or not answer_text.strip():
-            await processing_msg.delete()
-            await callback.message.answer("Не удалось распознать речь в голосовом сообщении. Попробуйте записать заново.")
-            await state.set_state(TouchQuestionStates.waiting_for_answer)
-            return
-        
-        logger.info(f"[TOUCH_QUESTION] Расшифрованный текст: {answer_text}")
-        
-        # Удаляем промежуточное сообщение
-        try:
-            await processing_msg.delete()
-        except:
-            pass
-        
-        # Обрабатываем ответ с валидацией
-        from handlers.start import _process_answer_with_validation
-        await _process_answer_with_validation(callback.message, state, answer_text)
-        
-    except Exception as e:
-        logger.error(f"[TOUCH_QUESTION] Ошибка при обработке голосового сообщения: {e}", exc_info=True)
-        try:
-            await processing_msg.delete()
-        except:
-            pass
-        await callback.message.answer("Произошла ошибка при обработке голосового сообщения. Попробуйте отправить текстовое сообщение или повторите попытку позже.")
-        await state.set_state(TouchQuestionStates.waiting_for_answer)
+    # Расшифровка и валидация выполняются воркером очереди ответов
+    from handlers.start import _enqueue_touch_answer
+    await _enqueue_touch_answer(
+        callback.message,
+        state,
+        callback.from_user.id,
+        voice_file_id=voice_file_id,
+        voice_file_unique_id=data.get("voice_file_unique_id"),
+    )
 
 
 @router.callback_query(F.data == "touch_questions_continue")
@@ -146,29 +74,5 @@ async def callback_touch_questions_continue(callback: CallbackQuery, state: FSMC
     
     await callback.message.answer(final_message, reply_markup=menu_keyboard)
     
-    # Очищаем состояние и данные из Redis
+    # Состояние и данные FSM хранятся в общем RedisStorage — очищаем их через FSMContext
     await state.clear()
-    
-    try:
-        import redis
-        from core.config import settings
-        
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-            db=settings.redis_db,
-            decode_responses=True
-        )
-        
-        bot_id = callback.bot.id
-        telegram_id = callback.from_user.id
-        state_key = f"fsm:{bot_id}:{telegram_id}:state"
-        data_key = f"fsm:{bot_id}:{telegram_id}:data"
-        
-        # Очищаем данные из Redis
-        redis_client.delete(state_key, data_key)
-        logger.info(f"[TOUCH_QUESTION] Данные очищены из Redis для пользователя {telegram_id}")
-    except Exception as e:
-        logger.error(f"[TOUCH_QUESTION] Ошибка при очистке данных из Redis: {e}", exc_info=True)
-
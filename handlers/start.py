@@ -2,25 +2,28 @@ import asyncio
 import logging
 import re
 from datetime import date, time
-from io import BytesIO
 import requests
 
-from aiogram import Router, F
+from aiogram import Bot, Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from core.config import settings
 from core.texts import get_booking_text
 from core.keyboards import KeyboardOperations
+from core.fsm_storage import get_user_state
 from core.states import FeedbackStates, ProfileStates, NotificationSettingsStates, TouchQuestionStates, SaturdayReflectionStates
-from database.session import get_session
-from repositories.user_repository import UserRepository
-from repositories.touch_answer_repository import TouchAnswerRepository
-from repositories.touch_content_repository import TouchContentRepository
-from repositories.evening_reflection_repository import EveningReflectionRepository
-from repositories.saturday_reflection_repository import SaturdayReflectionRepository
-from qwen_client import generate_qwen_response
-from whisper_client import transcribe_audio
+from database.session import AsyncSessionLocal, get_session
+from repositories.user_repository import AsyncUserRepository, UserRepository
+from repositories.touch_answer_repository import AsyncTouchAnswerRepository
+from repositories.touch_content_repository import AsyncTouchContentRepository
+from repositories.evening_reflection_repository import AsyncEveningReflectionRepository
+from repositories.saturday_reflection_repository import AsyncSaturdayReflectionRepository
+from qwen_client import QwenUnavailable, generate_qwen_response, stream_qwen_response
+from services.answer_queue import answer_job, enqueue_answer_job, job_stage, queue_depth
+from services.touch_rubrics import get_question_rubric
+from services.transcription_cache import transcribe_voice
 
 router = Router()
 keyboard_ops = KeyboardOperations()
@@ -271,13 +274,10 @@ async def _extract_text(message: Message) -> tuple[str, bool]:
             processing_msg = await message.answer("🔄 Обрабатываю голосовое сообщение...")
             logger.info("Отправлено промежуточное сообщение для предотвращения таймаута")
             
-            # Получаем файл голосового сообщения
-            file = await message.bot.get_file(message.voice.file_id)
-            # Скачиваем файл
-            audio_data = BytesIO()
-            await message.bot.download_file(file.file_path, destination=audio_data)
-            # Транскрибируем через Whisper
-            transcribed_text = await transcribe_audio(audio_data)
+            # Скачиваем и транскрибируем через Whisper (повторно — из кэша)
+            transcribed_text = await transcribe_voice(
+                message.bot, message.voice.file_id, message.voice.file_unique_id
+            )
             logger.info("Голосовое сообщение успешно расшифровано")
             
             # Удаляем промежуточное сообщение
@@ -373,7 +373,7 @@ async def _format_with_llm(text: str, title: str) -> str:
     )
 
     try:
-        result = (await generate_qwen_response(prompt)).strip()
+        result = (await generate_qwen_response(prompt, profile="format")).strip()
         if result:
             # Проверяем, не вернула ли модель маркер о непонятном тексте
             if "UNPARSEABLE_TEXT" in result.upper():
@@ -891,77 +891,101 @@ async def process_saturday_segment_5(message: Message, state: FSMContext):
     )
 
 
+@router.message(TouchQuestionStates.processing_answer)
+async def process_message_while_answer_processing(message: Message, state: FSMContext):
+    """Пока предыдущий ответ в очереди на обработку, новые ответы не принимаются"""
+    await message.answer("⏳ Ещё обрабатываю ваш предыдущий ответ, подождите немного.")
+
+
+async def _delete_message(bot: Bot, chat_id: int, message_id: int | None) -> None:
+    """Удалить промежуточное сообщение, если оно ещё есть."""
+    if not message_id:
+        return
+    try:
+        await bot.delete_message(chat_id, message_id)
+    except Exception as e:
+        logger.warning(f"Не удалось удалить промежуточное сообщение: {e}")
+
+
+STREAM_CURSOR = " ▌"
+TELEGRAM_TEXT_LIMIT = 4096
+
+
+async def _stream_into_message(bot: Bot, chat_id: int, message_id: int, prefix: str, chunks) -> str:
+    """
+    Показывать генерацию в сообщении message_id: по мере прихода кусков текст
+    дописывается правкой сообщения, не чаще раза в QWEN_STREAM_EDIT_INTERVAL секунд
+    (лимиты Telegram на редактирование). Промежуточные правки — best-effort,
+    итоговую правку делает вызывающий. Возвращает полный текст без префикса.
+    """
+    loop = asyncio.get_running_loop()
+    text = ""
+    shown = ""
+    last_edit_at = loop.time()  # плейсхолдер только что отправлен
+    async for delta in chunks:
+        text += delta
+        if loop.time() - last_edit_at < settings.qwen_stream_edit_interval:
+            continue
+        partial = (prefix + text.strip())[: TELEGRAM_TEXT_LIMIT - len(STREAM_CURSOR)] + STREAM_CURSOR
+        if partial == shown:
+            continue
+        try:
+            # Без разметки: незакрытый тег в середине генерации ломает HTML
+            await bot.edit_message_text(partial, chat_id=chat_id, message_id=message_id, parse_mode=None)
+            shown = partial
+        except Exception as e:
+            logger.debug(f"Не удалось обновить сообщение {message_id} по ходу генерации: {e}")
+        last_edit_at = loop.time()
+    return text.strip()
+
+
+async def _enqueue_answer(message: Message, telegram_id: int, kind: str, **payload) -> bool:
+    """
+    Поставить обработку ответа в очередь (services/answer_queue.py) и показать
+    пользователю промежуточное сообщение; результат пришлёт воркер.
+    """
+    placeholder = None
+    try:
+        depth = await queue_depth()
+        if depth["queued"]:
+            placeholder_text = f"🔄 Ответ в очереди на обработку (перед вами: {depth['queued']})..."
+        else:
+            placeholder_text = "🔄 Обрабатываю ответ..."
+        placeholder = await message.answer(placeholder_text)
+        await enqueue_answer_job(kind, telegram_id, placeholder_message_id=placeholder.message_id, **payload)
+        return True
+    except Exception as e:
+        logger.error(f"Не удалось поставить ответ пользователя {telegram_id} в очередь: {e}", exc_info=True)
+        if placeholder:
+            await _delete_message(message.bot, telegram_id, placeholder.message_id)
+        await message.answer("Произошла ошибка при обработке ответа. Попробуйте ещё раз чуть позже.")
+        return False
+
+
+async def _enqueue_touch_answer(message: Message, state: FSMContext, telegram_id: int, **payload) -> None:
+    """Поставить ответ на вопрос касания в очередь; до его обработки новые ответы не принимаются."""
+    data = await state.get_data()
+    await state.set_state(TouchQuestionStates.processing_answer)
+    queued = await _enqueue_answer(
+        message,
+        telegram_id,
+        "touch_answer",
+        question_index=data.get("current_question_index", 0),
+        **payload,
+    )
+    if not queued:
+        await state.set_state(TouchQuestionStates.waiting_for_answer)
+
+
 @router.message(F.voice | F.text)
 async def process_touch_question_answer(message: Message, state: FSMContext):
-    """Обработчик ответов на вопросы касания (проверяет Redis для определения состояния)"""
-    logger.info(f"[TOUCH_QUESTION] Проверяем Redis для определения состояния")
-    
-    # Сначала проверяем текущее состояние FSM
+    """Обработчик ответов на вопросы касания (состояние выставляет рассылка касаний через общее FSM-хранилище)"""
     current_fsm_state = await state.get_state()
     logger.info(f"[TOUCH_QUESTION] Текущее состояние FSM: {current_fsm_state}")
     
-    if current_fsm_state:
-        # Проверяем, не находится ли пользователь в состоянии стратсубботы
-        if current_fsm_state.startswith("SaturdayReflectionStates:"):
-            logger.info(f"[TOUCH_QUESTION] Пользователь в состоянии стратсубботы ({current_fsm_state}), пропускаем обработку касаний - даем возможность другим обработчикам обработать")
-            # НЕ обрабатываем, чтобы дать возможность специфичным обработчикам состояний обработать сообщение
-            return
-        # Если состояние не TouchQuestionStates.waiting_for_answer, пропускаем
-        if current_fsm_state != "TouchQuestionStates:waiting_for_answer":
-            logger.info(f"[TOUCH_QUESTION] Состояние FSM не TouchQuestionStates.waiting_for_answer ({current_fsm_state}), пропускаем")
-            return
-    
-    # Сначала проверяем, есть ли состояние в Redis
-    try:
-        import redis
-        # from core.config import settings
-        
-        from core.config import settings
-        
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-            db=settings.redis_db,
-            decode_responses=True
-        )
-        
-        bot_id = message.bot.id
-        telegram_id = message.from_user.id
-        state_key = f"fsm:{bot_id}:{telegram_id}:state"
-        redis_state = redis_client.get(state_key)
-        
-        logger.info(f"[TOUCH_QUESTION] Состояние в Redis: {redis_state}, ключ: {state_key}")
-        
-        # Проверяем, не находится ли пользователь в состоянии стратсубботы
-        saturday_states = [
-            "SaturdayReflectionStates:answering_segment_1",
-            "SaturdayReflectionStates:answering_segment_2",
-            "SaturdayReflectionStates:answering_segment_3",
-            "SaturdayReflectionStates:answering_segment_4",
-            "SaturdayReflectionStates:answering_segment_5",
-            "SaturdayReflectionStates:confirming_segment_1",
-            "SaturdayReflectionStates:confirming_segment_2",
-            "SaturdayReflectionStates:confirming_segment_3",
-            "SaturdayReflectionStates:confirming_segment_4",
-            "SaturdayReflectionStates:confirming_segment_5",
-        ]
-        
-        if redis_state in saturday_states:
-            logger.info(f"[TOUCH_QUESTION] Пользователь в состоянии стратсубботы ({redis_state}), пропускаем обработку касаний")
-            return
-        
-        # Если состояние не TouchQuestionStates.waiting_for_answer, пропускаем
-        if redis_state != "TouchQuestionStates:waiting_for_answer":
-            logger.info(f"[TOUCH_QUESTION] Состояние не TouchQuestionStates.waiting_for_answer, пропускаем")
-            return
-        
-        logger.info(f"[TOUCH_QUESTION] Состояние найдено в Redis, устанавливаем в FSM и обрабатываем")
-        
-        # Устанавливаем состояние в FSM
-        await state.set_state(TouchQuestionStates.waiting_for_answer)
-    except Exception as e:
-        logger.error(f"[TOUCH_QUESTION] Ошибка при проверке Redis: {e}", exc_info=True)
+    # Стратсуббота и прочие сценарии обрабатываются своими хендлерами
+    if current_fsm_state != TouchQuestionStates.waiting_for_answer.state:
+        logger.info(f"[TOUCH_QUESTION] Состояние FSM не TouchQuestionStates.waiting_for_answer ({current_fsm_state}), пропускаем")
         return
     
     # Продолжаем обработку
@@ -974,70 +998,25 @@ async def _process_touch_question_answer_internal(message: Message, state: FSMCo
     logger.info(f"[TOUCH_QUESTION] Обработчик ответа на вопрос касания вызван")
     logger.info(f"[TOUCH_QUESTION] Тип сообщения: voice={message.voice is not None}, text={message.text is not None}")
     
-    # Загружаем данные из Redis, если их нет в state
-    try:
-        import redis
-        import json
-        # from core.config import settings
-        
-        from core.config import settings
-        
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-            db=settings.redis_db,
-            decode_responses=True
-        )
-        
-        bot_id = message.bot.id
-        telegram_id = message.from_user.id
-        data_key = f"fsm:{bot_id}:{telegram_id}:data"
-        
-        # Загружаем данные из Redis
-        redis_data = redis_client.get(data_key)
-        if redis_data:
-            logger.info(f"[TOUCH_QUESTION] Загружаем данные из Redis")
-            data = json.loads(redis_data)
-            questions_list_from_redis = data.get("questions_list", [])
-            current_question_index_from_redis = data.get("current_question_index", 0)
-            
-            logger.info(f"[TOUCH_QUESTION] ===== ЗАГРУЗКА ДАННЫХ ИЗ REDIS (ГОЛОСОВОЕ) =====")
-            logger.info(f"[TOUCH_QUESTION] Ключ Redis: {data_key}")
-            logger.info(f"[TOUCH_QUESTION] Текущий индекс вопроса из Redis: {current_question_index_from_redis}")
-            logger.info(f"[TOUCH_QUESTION] Всего вопросов: {len(questions_list_from_redis)}")
-            if questions_list_from_redis and current_question_index_from_redis < len(questions_list_from_redis):
-                logger.info(f"[TOUCH_QUESTION] Текущий вопрос (индекс {current_question_index_from_redis}): {questions_list_from_redis[current_question_index_from_redis]}")
-            logger.info(f"[TOUCH_QUESTION] Список всех вопросов: {questions_list_from_redis}")
-            logger.info(f"[TOUCH_QUESTION] =================================================")
-            
-            # Сохраняем в state для использования
-            await state.update_data(
-                touch_content_id=data.get("touch_content_id"),
-                questions_list=questions_list_from_redis,
-                current_question_index=current_question_index_from_redis,
-                answers=data.get("answers", []),
-                telegram_id=message.from_user.id  # Сохраняем telegram_id для использования при обновлении
-            )
-            logger.info(f"[TOUCH_QUESTION] Данные сохранены в state: questions_list={len(questions_list_from_redis)}, current_question_index={current_question_index_from_redis}, telegram_id={message.from_user.id}")
-        else:
-            logger.warning(f"[TOUCH_QUESTION] Данные не найдены в Redis по ключу {data_key}")
-            # Пробуем найти все ключи с этим пользователем
-            pattern = f"fsm:*:{telegram_id}:data"
-            all_keys = redis_client.keys(pattern)
-            logger.info(f"[TOUCH_QUESTION] Найдены ключи Redis для пользователя {telegram_id}: {all_keys}")
-            await message.answer("Ошибка: не найдены данные о вопросах. Попробуйте начать заново.")
-            return
-    except Exception as e:
-        logger.error(f"[TOUCH_QUESTION] Ошибка при загрузке данных из Redis: {e}", exc_info=True)
-        await message.answer("Ошибка при загрузке данных. Попробуйте начать заново.")
+    data = await state.get_data()
+    questions_list = data.get("questions_list", [])
+    if not questions_list and not data.get("reflection_mode"):
+        logger.warning(f"[TOUCH_QUESTION] Данные о вопросах не найдены в FSM для пользователя {message.from_user.id}")
+        await message.answer("Ошибка: не найдены данные о вопросах. Попробуйте начать заново.")
         return
     
+    logger.info(f"[TOUCH_QUESTION] Текущий индекс вопроса: {data.get('current_question_index', 0)}, всего вопросов: {len(questions_list)}")
+    
     # Проверяем, голосовое ли сообщение
     if message.voice:
         logger.info(f"[TOUCH_QUESTION] Получено голосовое сообщение, показываем клавиатуру")
-        # Сохраняем file_id голосового сообщения
-        await state.update_data(voice_file_id=message.voice.file_id)
+        # Сохраняем file_id голосового сообщения и telegram_id: подтверждение придёт
+        # через callback, где message.from_user — это бот
+        await state.update_data(
+            voice_file_id=message.voice.file_id,
+            voice_file_unique_id=message.voice.file_unique_id,
+            telegram_id=message.from_user.id,
+        )
         
         # Показываем клавиатуру с кнопками "Перезаписать" и "Фиксируем"
         keyboard_buttons = {
@@ -1057,15 +1036,58 @@ async def _process_touch_question_answer_internal(message: Message, state: FSMCo
         await message.answer("Пожалуйста, отправьте текстовое сообщение.")
         return
     
-    # Обрабатываем текстовый ответ
-    await _process_answer_with_validation(message, state, answer_text)
+    # Валидация через Qwen выполняется воркером очереди
+    await _enqueue_touch_answer(message, state, message.from_user.id, answer_text=answer_text)
 
 
-async def _process_answer_with_validation(message: Message, state: FSMContext, answer_text: str):
-    """Обрабатывает ответ пользователя с валидацией через Qwen"""
+async def _touch_answer_failed(bot: Bot, job: dict, exc: BaseException | None) -> None:
+    telegram_id = job["telegram_id"]
+    await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+    state = get_user_state(bot.id, telegram_id)
+    if await state.get_state() == TouchQuestionStates.processing_answer.state:
+        await state.set_state(TouchQuestionStates.waiting_for_answer)
+    await bot.send_message(
+        telegram_id,
+        "Произошла ошибка при обработке ответа. Попробуйте отправить его ещё раз или ответьте текстом.",
+    )
+
+
+@answer_job("touch_answer", on_failure=_touch_answer_failed)
+async def _run_touch_answer_job(bot: Bot, job: dict) -> None:
+    """Задача очереди: расшифровать голосовой ответ (если нужно) и провалидировать его."""
+    telegram_id = job["telegram_id"]
+    state = get_user_state(bot.id, telegram_id)
+    data = await state.get_data()
+    # Повтор задачи после частичного выполнения: ответ уже принят, вопрос сменился
+    if (
+        await state.get_state() != TouchQuestionStates.processing_answer.state
+        or data.get("current_question_index", 0) != job.get("question_index", 0)
+    ):
+        logger.info(f"[TOUCH_QUESTION] Ответ пользователя {telegram_id} уже обработан, пропускаем задачу")
+        await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+        return
+
+    answer_text = job.get("answer_text")
+    if answer_text is None:
+        logger.info(f"[TOUCH_QUESTION] Расшифровываем голосовое сообщение")
+        async with job_stage("whisper"):
+            answer_text = await transcribe_voice(bot, job["voice_file_id"], job.get("voice_file_unique_id"))
+        if not answer_text or not answer_text.strip():
+            await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+            await bot.send_message(telegram_id, "Не удалось распознать речь в голосовом сообщении. Попробуйте записать заново.")
+            await state.set_state(TouchQuestionStates.waiting_for_answer)
+            return
+        logger.info(f"[TOUCH_QUESTION] Расшифрованный текст: {answer_text}")
+
+    await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+    await _process_answer_with_validation(bot, telegram_id, state, answer_text)
+
+
+async def _process_answer_with_validation(bot: Bot, telegram_id: int, state: FSMContext, answer_text: str):
+    """Обрабатывает ответ пользователя с валидацией через Qwen (выполняется воркером очереди ответов)"""
     logger.info(f"[TOUCH_QUESTION] Начало обработки ответа с валидацией")
     
-    # Получаем данные из state (или из Redis, если state пустой)
+    # Получаем данные из state
     data = await state.get_data()
     questions_list = data.get("questions_list", [])
     current_question_index = data.get("current_question_index", 0)
@@ -1073,54 +1095,6 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
     
     logger.info(f"[TOUCH_QUESTION] Данные из state: questions_list={len(questions_list) if questions_list else 0}, current_question_index={current_question_index}")
     
-    # Если данных нет в state, пробуем получить из Redis
-    if not questions_list:
-        try:
-            import redis
-            import json
-            from core.config import settings
-            
-            redis_client = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                password=settings.redis_password,
-                db=settings.redis_db,
-                decode_responses=True
-            )
-            
-            bot_id = message.bot.id
-            telegram_id = message.from_user.id
-            data_key = f"fsm:{bot_id}:{telegram_id}:data"
-            
-            logger.info(f"[TOUCH_QUESTION] Пытаемся загрузить данные из Redis: key={data_key}")
-            
-            redis_data = redis_client.get(data_key)
-            if redis_data:
-                logger.info(f"[TOUCH_QUESTION] Данные найдены в Redis: {redis_data[:100]}...")
-                data = json.loads(redis_data)
-                questions_list = data.get("questions_list", [])
-                current_question_index = data.get("current_question_index", 0)
-                answers = data.get("answers", [])
-                logger.info(f"[TOUCH_QUESTION] Загружено из Redis: questions_list={len(questions_list) if questions_list else 0}, current_question_index={current_question_index}")
-                
-                # Сохраняем в state для дальнейшего использования
-                await state.update_data(
-                    questions_list=questions_list,
-                    current_question_index=current_question_index,
-                    answers=answers,
-                    touch_content_id=data.get("touch_content_id"),
-                    reflection_mode=data.get("reflection_mode", False),
-                    telegram_id=message.from_user.id  # Сохраняем telegram_id для использования при обновлении
-                )
-            else:
-                logger.warning(f"[TOUCH_QUESTION] Данные не найдены в Redis по ключу {data_key}")
-                # Пробуем найти все ключи с этим пользователем
-                pattern = f"fsm:*:{telegram_id}:data"
-                all_keys = redis_client.keys(pattern)
-                logger.info(f"[TOUCH_QUESTION] Найдены ключи Redis для пользователя {telegram_id}: {all_keys}")
-        except Exception as e:
-            logger.error(f"[TOUCH_QUESTION] Ошибка при загрузке данных из Redis: {e}", exc_info=True)
-    
     # Проверяем, не в режиме ли рефлексии без вопросов
     reflection_mode = data.get("reflection_mode", False)
     if not questions_list:
@@ -1130,51 +1104,28 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
             
             # Сохраняем ответ на рефлексию в БД
             try:
-                session = next(get_session())
-                try:
-                    user_repo = UserRepository(session)
-                    user = user_repo.get_by_telegram_id(message.from_user.id)
+                async with AsyncSessionLocal() as session:
+                    user_repo = AsyncUserRepository(session)
+                    user = await user_repo.get_by_telegram_id(telegram_id)
                     
                     if user:
-                        reflection_repo = EveningReflectionRepository(session)
+                        reflection_repo = AsyncEveningReflectionRepository(session)
                         reflection_date = date.today()
                         
-                        reflection_repo.create_or_update(
+                        await reflection_repo.create_or_update(
                             user_id=user.id,
                             reflection_date=reflection_date,
                             reflection_text=answer_text,
                         )
                         logger.info(f"[EVENING_REFLECTION] Сохранена вечерняя рефлексия для пользователя {user.id}")
-                finally:
-                    session.close()
             except Exception as e:
                 logger.error(f"[EVENING_REFLECTION] Ошибка при сохранении вечерней рефлексии в БД: {e}", exc_info=True)
             
             # Отправляем благодарность и главное меню
-            await message.answer("Спасибо! Твоя рефлексия сохранена. Это поможет сформировать твою мини-стратегию.")
+            await bot.send_message(telegram_id, "Спасибо! Твоя рефлексия сохранена. Это поможет сформировать твою мини-стратегию.")
             
             # Очищаем состояние
             await state.clear()
-            try:
-                import redis
-                from core.config import settings
-                
-                redis_client = redis.Redis(
-                    host=settings.redis_host,
-                    port=settings.redis_port,
-                    password=settings.redis_password,
-                    db=settings.redis_db,
-                    decode_responses=True
-                )
-                
-                bot_id = message.bot.id
-                telegram_id = message.from_user.id
-                state_key = f"fsm:{bot_id}:{telegram_id}:state"
-                data_key = f"fsm:{bot_id}:{telegram_id}:data"
-                redis_client.delete(state_key, data_key)
-                logger.info(f"[TOUCH_QUESTION] Данные очищены из Redis для пользователя {telegram_id}")
-            except Exception as e:
-                logger.error(f"[TOUCH_QUESTION] Ошибка при очистке данных из Redis: {e}", exc_info=True)
             
             # Отправляем главное меню
             step_6_text = get_booking_text("step_6")
@@ -1188,23 +1139,23 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
                 },
                 interval=2,
             )
-            await message.answer(step_6_text, reply_markup=menu_keyboard)
+            await bot.send_message(telegram_id, step_6_text, reply_markup=menu_keyboard)
             return
         else:
-            await message.answer("Ошибка: не найдены данные о вопросах. Попробуйте начать заново.")
+            await bot.send_message(telegram_id, "Ошибка: не найдены данные о вопросах. Попробуйте начать заново.")
             await state.clear()
             return
     
     # Получаем текущий вопрос для валидации
     if current_question_index >= len(questions_list):
         logger.error(f"[TOUCH_QUESTION] Индекс вопроса ({current_question_index}) больше количества вопросов ({len(questions_list)})")
-        await message.answer("Ошибка: индекс вопроса некорректен. Попробуйте начать заново.")
+        await bot.send_message(telegram_id, "Ошибка: индекс вопроса некорректен. Попробуйте начать заново.")
         await state.clear()
         return
     
     if current_question_index < 0:
         logger.error(f"[TOUCH_QUESTION] Индекс вопроса ({current_question_index}) отрицательный")
-        await message.answer("Ошибка: индекс вопроса некорректен. Попробуйте начать заново.")
+        await bot.send_message(telegram_id, "Ошибка: индекс вопроса некорректен. Попробуйте начать заново.")
         await state.clear()
         return
     
@@ -1215,21 +1166,34 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
     logger.info(f"[TOUCH_QUESTION] Текст ответа пользователя: {answer_text[:200]}...")
     
     # Отправляем промежуточное сообщение, чтобы Telegram не отключался по таймауту
-    validation_msg = await message.answer("🔄 Анализирую ваш ответ...")
+    validation_msg = await bot.send_message(telegram_id, "🔄 Анализирую ваш ответ...")
+    
+    summary_prefix = "📝 Резюме по вашему ответу:\n\n"
     
     # Отправляем ответ в Qwen для проверки
     try:
-        validation_prompt = (
-            f"Вопрос #{question_number}: {current_question}\n\n"
-            f"Ответ пользователя: {answer_text}\n\n"
-            "Проанализируй ответ пользователя на этот конкретный вопрос. "
-            "Напиши короткое резюме (2-3 предложения) о правильности ответа, обращаясь к пользователю напрямую от первого лица (как в диалоге). "
-            "Используй формулировки типа 'Ты...', 'В твоём ответе...', 'Тебе стоит...', 'Ты хорошо...' и т.д. "
-            "НЕ просто говори 'правильно' или 'неправильно', а объясни ЧТО именно не так или что можно улучшить. "
-            "Если ответ хороший, укажи что именно хорошо. "
-            "Если есть проблемы, конкретно укажи что не так и что нужно исправить. "
-            f"ВАЖНО: Пользователь отвечал именно на вопрос #{question_number} '{current_question}', не путай с другими вопросами."
-        )
+        rubric = await get_question_rubric(data.get("touch_content_id"), current_question)
+        if rubric:
+            # Критерии вопроса составлены заранее — промпт короче, а резюме одинаковы у всех пользователей
+            validation_prompt = (
+                f"Вопрос #{question_number}: {current_question}\n\n"
+                f"Критерии хорошего ответа:\n{rubric}\n\n"
+                f"Ответ пользователя: {answer_text}\n\n"
+                "По этим критериям напиши короткое резюме (2-3 предложения), обращаясь к пользователю на «ты»: "
+                "что именно хорошо и что конкретно стоит улучшить. Не просто «правильно» или «неправильно»."
+            )
+        else:
+            validation_prompt = (
+                f"Вопрос #{question_number}: {current_question}\n\n"
+                f"Ответ пользователя: {answer_text}\n\n"
+                "Проанализируй ответ пользователя на этот конкретный вопрос. "
+                "Напиши короткое резюме (2-3 предложения) о правильности ответа, обращаясь к пользователю напрямую от первого лица (как в диалоге). "
+                "Используй формулировки типа 'Ты...', 'В твоём ответе...', 'Тебе стоит...', 'Ты хорошо...' и т.д. "
+                "НЕ просто говори 'правильно' или 'неправильно', а объясни ЧТО именно не так или что можно улучшить. "
+                "Если ответ хороший, укажи что именно хорошо. "
+                "Если есть проблемы, конкретно укажи что не так и что нужно исправить. "
+                f"ВАЖНО: Пользователь отвечал именно на вопрос #{question_number} '{current_question}', не путай с другими вопросами."
+            )
         
         logger.info(f"[TOUCH_QUESTION] ===== ОТПРАВКА В QWEN =====")
         logger.info(f"[TOUCH_QUESTION] Вопрос #{question_number} (индекс {current_question_index}): {current_question}")
@@ -1237,8 +1201,17 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
         logger.info(f"[TOUCH_QUESTION] Полный промпт для Qwen (первые 500 символов): {validation_prompt[:500]}...")
         logger.info(f"[TOUCH_QUESTION] ============================")
         
-        logger.info(f"[TOUCH_QUESTION] Отправляем ответ в Qwen для валидации")
-        validation_result = await generate_qwen_response(validation_prompt)
+        logger.info(f"[TOUCH_QUESTION] Отправляем ответ в Qwen для валидации (потоковый режим, рубрика: {'да' if rubric else 'нет'})")
+        async with job_stage("qwen"):
+            # Резюме проявляется в промежуточном сообщении по мере генерации
+            validation_result = await _stream_into_message(
+                bot,
+                telegram_id,
+                validation_msg.message_id,
+                summary_prefix,
+                # Резюме ответа конкретного пользователя не повторяется — в кэш его не кладём
+                stream_qwen_response(validation_prompt, profile="validation", use_cache=False),
+            )
         logger.info(f"[TOUCH_QUESTION] Получено резюме от Qwen (длина: {len(validation_result) if validation_result else 0}): {validation_result[:200] if validation_result else 'None'}...")
         
         # Проверяем, что ответ не пустой
@@ -1246,77 +1219,58 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
             logger.warning(f"[TOUCH_QUESTION] Qwen вернул пустой ответ, используем fallback")
             validation_result = "Ответ получен и сохранён."
         
-        # Удаляем промежуточное сообщение
+        # Показываем итоговое резюме в промежуточном сообщении
+        summary_text = f"{summary_prefix}{validation_result}"[:TELEGRAM_TEXT_LIMIT]
         try:
-            await validation_msg.delete()
-            logger.info(f"[TOUCH_QUESTION] Промежуточное сообщение удалено")
-        except Exception as del_exc:
-            logger.warning(f"[TOUCH_QUESTION] Не удалось удалить промежуточное сообщение: {del_exc}")
-        
-        # Показываем резюме пользователю
-        try:
-            logger.info(f"[TOUCH_QUESTION] Отправляем резюме пользователю (длина текста: {len(validation_result)})")
-            await message.answer(f"📝 Резюме по вашему ответу:\n\n{validation_result}")
-            logger.info(f"[TOUCH_QUESTION] ✓ Резюме успешно отправлено пользователю")
-        except Exception as send_exc:
-            logger.error(f"[TOUCH_QUESTION] ✗ Ошибка при отправке резюме пользователю: {send_exc}", exc_info=True)
-            # Пробуем отправить хотя бы уведомление
+            logger.info(f"[TOUCH_QUESTION] Показываем резюме пользователю (длина текста: {len(validation_result)})")
+            await bot.edit_message_text(
+                summary_text,
+                chat_id=telegram_id,
+                message_id=validation_msg.message_id,
+                parse_mode=None,
+            )
+            logger.info(f"[TOUCH_QUESTION] ✓ Резюме успешно показано пользователю")
+        except Exception as edit_exc:
+            logger.warning(f"[TOUCH_QUESTION] Не удалось отредактировать промежуточное сообщение: {edit_exc}")
+            await _delete_message(bot, telegram_id, validation_msg.message_id)
             try:
-                await message.answer("📝 Ваш ответ проанализирован и сохранён.")
-            except:
-                pass
+                await bot.send_message(telegram_id, summary_text, parse_mode=None)
+            except Exception as send_exc:
+                logger.error(f"[TOUCH_QUESTION] ✗ Ошибка при отправке резюме пользователю: {send_exc}", exc_info=True)
+                # Пробуем отправить хотя бы уведомление
+                try:
+                    await bot.send_message(telegram_id, "📝 Ваш ответ проанализирован и сохранён.")
+                except:
+                    pass
     except Exception as e:
-        logger.error(f"[TOUCH_QUESTION] Ошибка при валидации ответа через Qwen: {e}", exc_info=True)
+        if isinstance(e, QwenUnavailable):
+            logger.warning(f"[TOUCH_QUESTION] Qwen недоступен ({e}), сохраняем ответ без резюме")
+        else:
+            logger.error(f"[TOUCH_QUESTION] Ошибка при валидации ответа через Qwen: {e}", exc_info=True)
         # Удаляем промежуточное сообщение
         try:
             await validation_msg.delete()
         except:
             pass
         # Продолжаем без валидации, если Qwen не ответил
-        await message.answer("⚠️ Не удалось проанализировать ответ, но он сохранён. Продолжаем...")
+        await bot.send_message(telegram_id, "⚠️ Не удалось проанализировать ответ, но он сохранён. Продолжаем...")
+    
+    # Задача могла выполниться повторно (забрана через XAUTOCLAIM, пока шла первая попытка):
+    # ответ на вопрос сохраняется один раз — по его индексу, а не дописыванием в конец
+    data = await state.get_data()
+    if (
+        await state.get_state() != TouchQuestionStates.processing_answer.state
+        or data.get("current_question_index", 0) != current_question_index
+    ):
+        logger.info(f"[TOUCH_QUESTION] Ответ на вопрос #{question_number} пользователя {telegram_id} уже сохранён, пропускаем")
+        return
+    answers = data.get("answers", [])[:current_question_index]
     
     # Сохраняем ответ
     answers.append(answer_text)
     
-    # Обновляем данные в state и Redis
-    await state.update_data(
-        questions_list=questions_list,
-        current_question_index=current_question_index,
-        answers=answers
-    )
-    
-    # Также обновляем в Redis
-    try:
-        import redis
-        import json
-        # from core.config import settings
-        
-        from core.config import settings
-        
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-            db=settings.redis_db,
-            decode_responses=True
-        )
-        
-        bot_id = message.bot.id
-        telegram_id = message.from_user.id
-        data_key = f"fsm:{bot_id}:{telegram_id}:data"
-        
-        redis_client.set(
-            data_key,
-            json.dumps({
-                "touch_content_id": data.get("touch_content_id"),
-                "questions_list": questions_list,
-                "current_question_index": current_question_index,
-                "answers": answers
-            }),
-            ex=3600
-        )
-    except Exception as e:
-        logger.warning(f"Не удалось обновить данные в Redis: {e}")
+    # Обновляем данные в state
+    await state.update_data(answers=answers)
     
     # Проверяем, есть ли еще вопросы
     next_question_index = current_question_index + 1
@@ -1326,7 +1280,7 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
         # Отправляем следующий вопрос
         next_question = questions_list[next_question_index]
         logger.info(f"[TOUCH_QUESTION] Отправляем вопрос #{next_question_index + 1}: {next_question[:50]}...")
-        await message.answer(next_question)
+        await bot.send_message(telegram_id, next_question)
         
         # Обновляем состояние и данные
         await state.set_state(TouchQuestionStates.waiting_for_answer)
@@ -1337,97 +1291,28 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
             touch_content_id=data.get("touch_content_id")
         )
         
-        # Обновляем индекс в Redis
-        try:
-            import redis
-            import json
-            from core.config import settings
-            
-            redis_client = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                password=settings.redis_password,
-                db=settings.redis_db,
-                decode_responses=True
-            )
-            
-            bot_id = message.bot.id
-            telegram_id = message.from_user.id
-            
-            # Проверяем, что telegram_id не равен bot_id (это было бы ошибкой)
-            if telegram_id == bot_id:
-                logger.error(f"[TOUCH_QUESTION] ОШИБКА: telegram_id ({telegram_id}) равен bot_id ({bot_id})! Это неправильно!")
-                # Пробуем получить telegram_id из state или из предыдущих данных
-                telegram_id_from_data = data.get("telegram_id")
-                if telegram_id_from_data and telegram_id_from_data != bot_id:
-                    logger.warning(f"[TOUCH_QUESTION] Используем telegram_id из данных: {telegram_id_from_data}")
-                    telegram_id = telegram_id_from_data
-                else:
-                    logger.error(f"[TOUCH_QUESTION] Не удалось найти правильный telegram_id! Используем message.from_user.id, но это может быть ошибкой.")
-            
-            data_key = f"fsm:{bot_id}:{telegram_id}:data"
-            
-            # Обновляем данные в Redis с новым индексом
-            redis_data_to_save = {
-                "touch_content_id": data.get("touch_content_id"),
-                "questions_list": questions_list,
-                "current_question_index": next_question_index,
-                "answers": answers,
-                "telegram_id": telegram_id  # Сохраняем telegram_id для проверки
-            }
-            logger.info(f"[TOUCH_QUESTION] ===== ОБНОВЛЕНИЕ ИНДЕКСА В REDIS =====")
-            logger.info(f"[TOUCH_QUESTION] bot_id: {bot_id}, telegram_id: {telegram_id}")
-            logger.info(f"[TOUCH_QUESTION] Ключ Redis: {data_key}")
-            logger.info(f"[TOUCH_QUESTION] Старый индекс: {current_question_index}, новый индекс: {next_question_index}")
-            logger.info(f"[TOUCH_QUESTION] Данные для сохранения: current_question_index={next_question_index}, questions_list={len(questions_list)}")
-            redis_client.set(data_key, json.dumps(redis_data_to_save), ex=3600)
-            logger.info(f"[TOUCH_QUESTION] Обновлен индекс в Redis: {next_question_index} (вопрос #{next_question_index + 1})")
-            
-            # Проверяем, что данные сохранились правильно
-            saved_data_raw = redis_client.get(data_key)
-            if saved_data_raw:
-                saved_data = json.loads(saved_data_raw)
-                saved_index = saved_data.get('current_question_index')
-                logger.info(f"[TOUCH_QUESTION] Проверка: сохраненный индекс в Redis = {saved_index}")
-                logger.info(f"[TOUCH_QUESTION] Проверка: сохраненный список вопросов = {saved_data.get('questions_list', [])}")
-                if saved_index != next_question_index:
-                    logger.error(f"[TOUCH_QUESTION] ОШИБКА: Индекс не совпадает! Ожидалось: {next_question_index}, получено: {saved_index}")
-            else:
-                logger.error(f"[TOUCH_QUESTION] ОШИБКА: Данные не найдены в Redis после сохранения!")
-            logger.info(f"[TOUCH_QUESTION] ======================================")
-        except Exception as e:
-            logger.error(f"[TOUCH_QUESTION] Ошибка при обновлении индекса в Redis: {e}", exc_info=True)
+        logger.info(f"[TOUCH_QUESTION] Обновлен индекс вопроса: {next_question_index} (вопрос #{next_question_index + 1})")
     else:
         # Все вопросы отвечены
-        # Получаем telegram_id до очистки состояния
-        bot_id = message.bot.id
-        telegram_id = message.from_user.id
-        
-        # Проверяем, что telegram_id не равен bot_id
-        telegram_id_from_data = data.get("telegram_id")
-        if telegram_id == bot_id and telegram_id_from_data and telegram_id_from_data != bot_id:
-            telegram_id = telegram_id_from_data
-        
         # Сохраняем ответы в БД перед очисткой состояния
         touch_content_id = data.get("touch_content_id")
         if touch_content_id and answers:
             try:
-                session = next(get_session())
-                try:
-                    user_repo = UserRepository(session)
-                    user = user_repo.get_by_telegram_id(telegram_id)
+                async with AsyncSessionLocal() as session:
+                    user_repo = AsyncUserRepository(session)
+                    user = await user_repo.get_by_telegram_id(telegram_id)
                     
                     if user:
                         # Проверяем, что touch_content существует
-                        touch_content_repo = TouchContentRepository(session)
-                        touch_content = touch_content_repo.get_by_id(touch_content_id)
+                        touch_content_repo = AsyncTouchContentRepository(session)
+                        touch_content = await touch_content_repo.get_by_id(touch_content_id)
                         
                         if touch_content:
-                            answer_repo = TouchAnswerRepository(session)
+                            answer_repo = AsyncTouchAnswerRepository(session)
                             touch_date = date.today()
                             
                             # Сохраняем все ответы
-                            answer_repo.create_answers(
+                            await answer_repo.create_answers(
                                 user_id=user.id,
                                 touch_content_id=touch_content_id,
                                 touch_date=touch_date,
@@ -1440,13 +1325,11 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
                             )
                         else:
                             logger.warning(f"[TOUCH_ANSWER] TouchContent с id={touch_content_id} не найден")
-                finally:
-                    session.close()
             except Exception as e:
                 logger.error(f"[TOUCH_ANSWER] Ошибка при сохранении ответов в БД: {e}", exc_info=True)
         
         saved_text = get_booking_text("touch_answers_saved")
-        await message.answer(saved_text)
+        await bot.send_message(telegram_id, saved_text)
         
         # Отправляем сообщение с кнопками
         from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -1466,73 +1349,23 @@ async def _process_answer_with_validation(message: Message, state: FSMContext, a
         keyboard = keyboard_builder.as_markup()
         
         chat_invitation_text = get_booking_text("touch_chat_invitation")
-        await message.answer(chat_invitation_text, reply_markup=keyboard)
+        await bot.send_message(telegram_id, chat_invitation_text, reply_markup=keyboard)
         
-        # Очищаем состояние и данные из Redis после завершения всех вопросов
+        # Очищаем состояние после завершения всех вопросов
         await state.clear()
-        
-        # Очищаем данные из Redis
-        try:
-            import redis
-            from core.config import settings
-            
-            redis_client = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                password=settings.redis_password,
-                db=settings.redis_db,
-                decode_responses=True
-            )
-            
-            state_key = f"fsm:{bot_id}:{telegram_id}:state"
-            data_key = f"fsm:{bot_id}:{telegram_id}:data"
-            
-            # Очищаем данные из Redis
-            redis_client.delete(state_key, data_key)
-            logger.info(f"[TOUCH_QUESTION] Данные очищены из Redis для пользователя {telegram_id} после завершения вопросов")
-        except Exception as e:
-            logger.error(f"[TOUCH_QUESTION] Ошибка при очистке данных из Redis: {e}", exc_info=True)
 
 
 @router.message(F.voice)
 async def handle_voice_message(message: Message, state: FSMContext):
-    """Универсальный обработчик голосовых сообщений:
+    """Универсальный обработчик голосовых сообщений: ставит в очередь задачу, которая
     1. Скачивает голосовое сообщение
     2. Расшифровывает через Whisper
     3. Отправляет в Qwen для форматирования (убрать лишнее, выписать ключевые вызовы)
     4. Возвращает результат пользователю
     """
-    # Проверяем, есть ли активное состояние FSM (включая Redis)
+    # Проверяем, есть ли активное состояние FSM (в том числе выставленное рассылкой или админкой)
     current_state = await state.get_state()
     
-    # Также проверяем Redis на случай, если состояние установлено из админки
-    try:
-        import redis
-        import json
-        # from core.config import settings
-        
-        from core.config import settings
-        
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-            db=settings.redis_db,
-            decode_responses=True
-        )
-        
-        bot_id = message.bot.id
-        telegram_id = message.from_user.id
-        state_key = f"fsm:{bot_id}:{telegram_id}:state"
-        redis_state = redis_client.get(state_key)
-        
-        if redis_state == "TouchQuestionStates:waiting_for_answer":
-            # Пользователь ожидает ответ на вопрос касания, устанавливаем состояние
-            await state.set_state(TouchQuestionStates.waiting_for_answer)
-            current_state = TouchQuestionStates.waiting_for_answer
-    except Exception as e:
-        logger.warning(f"Не удалось проверить состояние в Redis: {e}")
-    
     logger.info(f"[VOICE] Проверка FSM состояния: {current_state}")
     
     # Если пользователь в состоянии ожидания ответа на вопрос касания - пропускаем
@@ -1547,264 +1380,239 @@ async def handle_voice_message(message: Message, state: FSMContext):
         logger.info(f"[VOICE] Пользователь в FSM состоянии {current_state}, пропускаем универсальный обработчик")
         return
     
-    # Обрабатываем голосовое сообщение только если пользователь НЕ в состоянии FSM
-    processing_msg = None
+    # Обрабатываем голосовое сообщение только если пользователь НЕ в состоянии FSM:
+    # расшифровка и Qwen выполняются воркером очереди, хендлер сразу освобождается
+    logger.info(
+        f"[VOICE] Голосовое от пользователя {message.from_user.id}: file_id={message.voice.file_id}, "
+        f"длительность {message.voice.duration} сек, размер {message.voice.file_size} байт"
+    )
+    await _enqueue_answer(
+        message,
+        message.from_user.id,
+        "voice_challenges",
+        voice_file_id=message.voice.file_id,
+        voice_file_unique_id=message.voice.file_unique_id,
+    )
+
+
+async def _voice_challenges_failed(bot: Bot, job: dict, exc: BaseException | None) -> None:
+    telegram_id = job["telegram_id"]
+    await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+    if isinstance(exc, TimeoutError):
+        text = "Сервер обрабатывает голосовое сообщение слишком долго. Попробуйте отправить более короткое сообщение или повторите попытку позже."
+    else:
+        text = "Произошла ошибка при обработке голосового сообщения. Попробуйте отправить текстовое сообщение или повторите попытку позже."
+    await bot.send_message(telegram_id, text)
+
+
+@answer_job("voice_challenges", on_failure=_voice_challenges_failed)
+async def _run_voice_challenges_job(bot: Bot, job: dict) -> None:
+    """Задача очереди: голосовое → Whisper → Qwen (выписать ключевые вызовы) → ответ пользователю."""
+    telegram_id = job["telegram_id"]
+    logger.info(f"[VOICE] ===== НАЧАЛО ОБРАБОТКИ ГОЛОСОВОГО СООБЩЕНИЯ (пользователь {telegram_id}) =====")
+
+    # Шаги 1–2: скачиваем голосовое и преобразуем в текст через Whisper
+    # (повторная расшифровка того же файла берётся из кэша)
+    logger.info(f"[VOICE] ШАГ 1–2: Скачиваем файл и отправляем в Whisper для преобразования в текст...")
+    async with job_stage("whisper"):
+        transcribed_text = await transcribe_voice(bot, job["voice_file_id"], job.get("voice_file_unique_id"))
+
+    if not transcribed_text or not transcribed_text.strip():
+        logger.warning(f"[VOICE] ✗ Whisper вернул пустой текст!")
+        await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+        await bot.send_message(telegram_id, "Не удалось распознать речь в голосовом сообщении. Попробуйте записать заново.")
+        return
+
+    logger.info(f"[VOICE] ✓ Whisper успешно преобразовал аудио в текст!")
+    logger.info(f"[VOICE] Длина расшифрованного текста: {len(transcribed_text)} символов")
+    logger.info(f"[VOICE] Полный текст расшифровки: {transcribed_text}")
+
+    # Шаг 3: Отправляем в Qwen для форматирования
+    logger.info(f"[VOICE] ШАГ 3: Отправляем расшифрованный текст в Qwen для обработки...")
+    qwen_prompt = (
+        "Извлеки из текста ТОЛЬКО те вызовы/проблемы, которые упомянул пользователь.\n\n"
+        f"Исходный текст пользователя: {transcribed_text.strip()}\n\n"
+        "КРИТИЧЕСКИ ВАЖНО:\n"
+        "- Верни ТОЛЬКО то, что есть в тексте выше. НЕ додумывай, НЕ интерпретируй, НЕ добавляй от себя.\n"
+        "- Если в тексте нет явных вызовов, верни пустую строку.\n"
+        "- Формат ответа (БЕЗ заголовков, БЕЗ дополнительных слов):\n"
+        "- вызов 1\n"
+        "- вызов 2\n"
+        "- вызов 3\n\n"
+        "ЗАПРЕЩЕНО:\n"
+        "- Добавлять заголовки типа 'Ваши вызовы', 'Цели' и т.д.\n"
+        "- Добавлять информацию о целях или других разделах\n"
+        "- Додумывать вызовы, которых нет в исходном тексте\n"
+        "- Добавлять комментарии или объяснения\n\n"
+        "Верни ТОЛЬКО список вызовов из текста, без заголовков и лишних слов."
+    )
+    logger.info(f"[VOICE] Промпт для Qwen: {qwen_prompt[:200]}...")
+
+    formatted_text = None
     try:
-        user_id = message.from_user.id
-        logger.info(f"[VOICE] ===== НАЧАЛО ОБРАБОТКИ ГОЛОСОВОГО СООБЩЕНИЯ =====")
-        logger.info(f"[VOICE] Пользователь ID: {user_id}")
-        logger.info(f"[VOICE] File ID: {message.voice.file_id}")
-        logger.info(f"[VOICE] Длительность: {message.voice.duration} сек")
-        logger.info(f"[VOICE] Размер файла: {message.voice.file_size} байт")
-        
-        # Отправляем промежуточное сообщение, чтобы Telegram не отключался по таймауту
-        processing_msg = await message.answer("🔄 Обрабатываю голосовое сообщение...")
-        logger.info(f"[VOICE] Отправлено промежуточное сообщение для предотвращения таймаута")
-        
-        # Шаг 1: Скачиваем голосовое сообщение
-        logger.info(f"[VOICE] ШАГ 1: Получаем информацию о файле...")
-        file = await message.bot.get_file(message.voice.file_id)
-        logger.info(f"[VOICE] Путь к файлу: {file.file_path}")
-        logger.info(f"[VOICE] Размер файла: {file.file_size} байт")
-        
-        logger.info(f"[VOICE] ШАГ 1: Скачиваем файл...")
-        audio_data = BytesIO()
-        await message.bot.download_file(file.file_path, destination=audio_data)
-        audio_size = len(audio_data.getvalue())
-        logger.info(f"[VOICE] ✓ Файл успешно скачан! Размер: {audio_size} байт")
-        
-        # Шаг 2: Преобразуем аудио в текст через Whisper
-        logger.info(f"[VOICE] ШАГ 2: Отправляем аудио файл в Whisper для преобразования в текст...")
-        logger.info(f"[VOICE] Размер данных для отправки: {audio_size} байт")
-        
-        transcribed_text = await transcribe_audio(audio_data)
-        
-        if not transcribed_text or not transcribed_text.strip():
-            logger.warning(f"[VOICE] ✗ Whisper вернул пустой текст!")
-            await message.answer("Не удалось распознать речь в голосовом сообщении. Попробуйте записать заново.")
-            return
-        
-        logger.info(f"[VOICE] ✓ Whisper успешно преобразовал аудио в текст!")
-        logger.info(f"[VOICE] Длина расшифрованного текста: {len(transcribed_text)} символов")
-        logger.info(f"[VOICE] Полный текст расшифровки: {transcribed_text}")
-        
-        # Шаг 3: Отправляем в Qwen для форматирования
-        logger.info(f"[VOICE] ШАГ 3: Отправляем расшифрованный текст в Qwen для обработки...")
-        qwen_prompt = (
-            "Извлеки из текста ТОЛЬКО те вызовы/проблемы, которые упомянул пользователь.\n\n"
-            f"Исходный текст пользователя: {transcribed_text.strip()}\n\n"
-            "КРИТИЧЕСКИ ВАЖНО:\n"
-            "- Верни ТОЛЬКО то, что есть в тексте выше. НЕ додумывай, НЕ интерпретируй, НЕ добавляй от себя.\n"
-            "- Если в тексте нет явных вызовов, верни пустую строку.\n"
-            "- Формат ответа (БЕЗ заголовков, БЕЗ дополнительных слов):\n"
-            "- вызов 1\n"
-            "- вызов 2\n"
-            "- вызов 3\n\n"
-            "ЗАПРЕЩЕНО:\n"
-            "- Добавлять заголовки типа 'Ваши вызовы', 'Цели' и т.д.\n"
-            "- Добавлять информацию о целях или других разделах\n"
-            "- Додумывать вызовы, которых нет в исходном тексте\n"
-            "- Добавлять комментарии или объяснения\n\n"
-            "Верни ТОЛЬКО список вызовов из текста, без заголовков и лишних слов."
-        )
-        logger.info(f"[VOICE] Промпт для Qwen: {qwen_prompt[:200]}...")
-        
+        async with job_stage("qwen"):
+            formatted_text = await generate_qwen_response(qwen_prompt, profile="challenges")
+        logger.info(f"[VOICE] ✓ Qwen успешно обработал текст!")
+        logger.info(f"[VOICE] Длина обработанного текста: {len(formatted_text)} символов")
+        logger.info(f"[VOICE] Результат от Qwen: {formatted_text}")
+    except QwenUnavailable as e:
+        logger.warning(f"[VOICE] Qwen недоступен ({e}), сразу просим написать вручную")
         formatted_text = None
-        try:
-            formatted_text = await generate_qwen_response(qwen_prompt)
-            logger.info(f"[VOICE] ✓ Qwen успешно обработал текст!")
-            logger.info(f"[VOICE] Длина обработанного текста: {len(formatted_text)} символов")
-            logger.info(f"[VOICE] Результат от Qwen: {formatted_text}")
-        except (TimeoutError, requests.exceptions.Timeout, requests.exceptions.ReadTimeout) as e:
-            logger.warning(f"[VOICE] Таймаут при запросе к Qwen: {e}")
-            logger.info(f"[VOICE] Qwen не ответил, попросим пользователя написать вручную")
-            formatted_text = None
-        except Exception as e:
-            logger.error(f"[VOICE] Ошибка при запросе к Qwen: {e}", exc_info=True)
-            logger.info(f"[VOICE] Qwen не ответил, попросим пользователя написать вручную")
-            formatted_text = None
-        
-        # Очищаем результат от лишних заголовков, разделов и додумок
-        # Если Qwen не ответил (таймаут или ошибка), попросим написать вручную
-        if formatted_text is None:
-            logger.info(f"[VOICE] Qwen не ответил, отправляем просьбу написать вручную")
-            # Удаляем промежуточное сообщение
-            if processing_msg:
-                try:
-                    await processing_msg.delete()
-                    logger.info(f"[VOICE] Промежуточное сообщение удалено")
-                except Exception as e:
-                    logger.warning(f"[VOICE] Не удалось удалить промежуточное сообщение: {e}")
-            
-            # Просим написать вручную
-            await message.answer(
-                "✍️ Теперь Расскажите 1–3 ключевых вызова, которые стоят перед вами прямо сейчас.\n"
-                "Например: «не хватает энергии», «хочу больше времени для семьи», «нужна ясность в делах».\n"
-                "(Эти ответы тоже войдут в ваш артефакт.)"
-            )
-            logger.info(f"[VOICE] ✓ Отправлена просьба написать вручную")
-            logger.info(f"[VOICE] ===== ОБРАБОТКА ЗАВЕРШЕНА =====")
-            return
-        else:
-            cleaned_text = formatted_text.strip()
-            lines = cleaned_text.split('\n')
-            filtered_lines = []
-            found_list_start = False
-            
-            # Список ключевых слов, которые указывают на начало нежелательных разделов
-            unwanted_keywords = [
-                'ваши цели', 'цели:', 'цели\n', 'цели ', 
-                'ваши вызовы:', 'вызовы:', 'вызовы\n', 'вызовы ',
-                'например', 'пример:', 'примеры'
-            ]
-            
-            for line in lines:
+    except (TimeoutError, requests.exceptions.Timeout, requests.exceptions.ReadTimeout) as e:
+        logger.warning(f"[VOICE] Таймаут при запросе к Qwen: {e}")
+        logger.info(f"[VOICE] Qwen не ответил, попросим пользователя написать вручную")
+        formatted_text = None
+    except Exception as e:
+        logger.error(f"[VOICE] Ошибка при запросе к Qwen: {e}", exc_info=True)
+        logger.info(f"[VOICE] Qwen не ответил, попросим пользователя написать вручную")
+        formatted_text = None
+
+    # Очищаем результат от лишних заголовков, разделов и додумок
+    # Если Qwen не ответил (таймаут или ошибка), попросим написать вручную
+    if formatted_text is None:
+        logger.info(f"[VOICE] Qwen не ответил, отправляем просьбу написать вручную")
+        await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+
+        # Просим написать вручную
+        await bot.send_message(
+            telegram_id,
+            "✍️ Теперь Расскажите 1–3 ключевых вызова, которые стоят перед вами прямо сейчас.\n"
+            "Например: «не хватает энергии», «хочу больше времени для семьи», «нужна ясность в делах».\n"
+            "(Эти ответы тоже войдут в ваш артефакт.)"
+        )
+        logger.info(f"[VOICE] ✓ Отправлена просьба написать вручную")
+        logger.info(f"[VOICE] ===== ОБРАБОТКА ЗАВЕРШЕНА =====")
+        return
+    else:
+        cleaned_text = formatted_text.strip()
+        lines = cleaned_text.split('\n')
+        filtered_lines = []
+        found_list_start = False
+
+        # Список ключевых слов, которые указывают на начало нежелательных разделов
+        unwanted_keywords = [
+            'ваши цели', 'цели:', 'цели\n', 'цели ', 
+            'ваши вызовы:', 'вызовы:', 'вызовы\n', 'вызовы ',
+            'например', 'пример:', 'примеры'
+        ]
+
+        for line in lines:
+            line_stripped = line.strip()
+            line_lower = line_stripped.lower()
+
+            # Пропускаем пустые строки в начале
+            if not found_list_start and not line_stripped:
+                continue
+
+            # Если встретили раздел целей - останавливаемся
+            if 'цели' in line_lower and 'вызовы' not in line_lower:
+                logger.info(f"[VOICE] Обнаружен раздел целей, останавливаем фильтрацию: {line_stripped}")
+                break
+
+            # Пропускаем заголовки и нежелательные разделы
+            if any(keyword in line_lower for keyword in unwanted_keywords):
+                # Если это заголовок "Ваши вызовы" или просто "Вызовы" - пропускаем, но продолжаем
+                if ('вызовы' in line_lower and 'цели' not in line_lower) or line_lower == 'вызовы':
+                    logger.info(f"[VOICE] Пропускаем заголовок: {line_stripped}")
+                    continue
+                # Если это другие нежелательные слова - пропускаем
+                if any(unwanted in line_lower for unwanted in ['цели', 'например', 'пример']):
+                    logger.info(f"[VOICE] Пропускаем нежелательную строку: {line_stripped}")
+                    continue
+
+            # Берем только строки, которые выглядят как пункты списка (начинаются с -, •, или цифры)
+            if line_stripped.startswith(('-', '•', '*')) or (line_stripped and line_stripped[0].isdigit()):
+                found_list_start = True
+                filtered_lines.append(line_stripped)
+            elif found_list_start and line_stripped:
+                # Если уже начали собирать список, но встретили не-пункт - возможно, это конец списка
+                # Проверяем, не является ли это началом нового раздела
+                if any(unwanted in line_lower for unwanted in ['цели', 'например', 'пример', 'ваши']):
+                    break
+                # Если это продолжение предыдущего пункта (многострочный), добавляем
+                if filtered_lines:
+                    filtered_lines.append(line_stripped)
+
+        cleaned_text = '\n'.join(filtered_lines).strip()
+        logger.info(f"[VOICE] Отфильтрованный текст (только вызовы): {cleaned_text}")
+
+        # Если после фильтрации ничего не осталось, используем исходный текст (но без заголовков и целей)
+        if not cleaned_text:
+            logger.warning(f"[VOICE] После фильтрации результат пустой, пытаемся извлечь из исходного ответа Qwen")
+            # Пытаемся извлечь хотя бы что-то из исходного ответа
+            original_lines = formatted_text.strip().split('\n')
+            temp_lines = []
+            found_goals_section = False
+
+            for line in original_lines:
                 line_stripped = line.strip()
                 line_lower = line_stripped.lower()
-                
-                # Пропускаем пустые строки в начале
-                if not found_list_start and not line_stripped:
-                    continue
-                
+
                 # Если встретили раздел целей - останавливаемся
                 if 'цели' in line_lower and 'вызовы' not in line_lower:
-                    logger.info(f"[VOICE] Обнаружен раздел целей, останавливаем фильтрацию: {line_stripped}")
+                    found_goals_section = True
                     break
-                
-                # Пропускаем заголовки и нежелательные разделы
-                if any(keyword in line_lower for keyword in unwanted_keywords):
-                    # Если это заголовок "Ваши вызовы" или просто "Вызовы" - пропускаем, но продолжаем
-                    if ('вызовы' in line_lower and 'цели' not in line_lower) or line_lower == 'вызовы':
-                        logger.info(f"[VOICE] Пропускаем заголовок: {line_stripped}")
-                        continue
-                    # Если это другие нежелательные слова - пропускаем
-                    if any(unwanted in line_lower for unwanted in ['цели', 'например', 'пример']):
-                        logger.info(f"[VOICE] Пропускаем нежелательную строку: {line_stripped}")
-                        continue
-                
-                # Берем только строки, которые выглядят как пункты списка (начинаются с -, •, или цифры)
-                if line_stripped.startswith(('-', '•', '*')) or (line_stripped and line_stripped[0].isdigit()):
-                    found_list_start = True
-                    filtered_lines.append(line_stripped)
-                elif found_list_start and line_stripped:
-                    # Если уже начали собирать список, но встретили не-пункт - возможно, это конец списка
-                    # Проверяем, не является ли это началом нового раздела
-                    if any(unwanted in line_lower for unwanted in ['цели', 'например', 'пример', 'ваши']):
-                        break
-                    # Если это продолжение предыдущего пункта (многострочный), добавляем
-                    if filtered_lines:
-                        filtered_lines.append(line_stripped)
-            
-            cleaned_text = '\n'.join(filtered_lines).strip()
-            logger.info(f"[VOICE] Отфильтрованный текст (только вызовы): {cleaned_text}")
-            
-            # Если после фильтрации ничего не осталось, используем исходный текст (но без заголовков и целей)
+
+                # Пропускаем заголовки
+                if any(keyword in line_lower for keyword in ['ваши вызовы', 'вызовы:', 'ваши цели']):
+                    continue
+
+                # Берем все строки, которые не пустые и не являются заголовками
+                if line_stripped and not found_goals_section:
+                    temp_lines.append(line_stripped)
+
+            if temp_lines:
+                cleaned_text = '\n'.join(temp_lines).strip()
+                logger.info(f"[VOICE] Извлечен текст из исходного ответа: {cleaned_text}")
+
+            # Если все еще пусто после всех попыток извлечения, отправляем просьбу написать вручную
             if not cleaned_text:
-                logger.warning(f"[VOICE] После фильтрации результат пустой, пытаемся извлечь из исходного ответа Qwen")
-                # Пытаемся извлечь хотя бы что-то из исходного ответа
-                original_lines = formatted_text.strip().split('\n')
-                temp_lines = []
-                found_goals_section = False
-                
-                for line in original_lines:
-                    line_stripped = line.strip()
-                    line_lower = line_stripped.lower()
-                    
-                    # Если встретили раздел целей - останавливаемся
-                    if 'цели' in line_lower and 'вызовы' not in line_lower:
-                        found_goals_section = True
-                        break
-                    
-                    # Пропускаем заголовки
-                    if any(keyword in line_lower for keyword in ['ваши вызовы', 'вызовы:', 'ваши цели']):
-                        continue
-                    
-                    # Берем все строки, которые не пустые и не являются заголовками
-                    if line_stripped and not found_goals_section:
-                        temp_lines.append(line_stripped)
-                
-                if temp_lines:
-                    cleaned_text = '\n'.join(temp_lines).strip()
-                    logger.info(f"[VOICE] Извлечен текст из исходного ответа: {cleaned_text}")
-                
-                # Если все еще пусто после всех попыток извлечения, отправляем просьбу написать вручную
-                if not cleaned_text:
-                    logger.warning(f"[VOICE] Не удалось извлечь вызовы из ответа Qwen, попросим написать вручную")
-                    # Удаляем промежуточное сообщение
-                    if processing_msg:
-                        try:
-                            await processing_msg.delete()
-                            logger.info(f"[VOICE] Промежуточное сообщение удалено")
-                        except Exception as e:
-                            logger.warning(f"[VOICE] Не удалось удалить промежуточное сообщение: {e}")
-                    
-                    # Просим написать вручную
-                    await message.answer(
-                        "✍️ Теперь Расскажите 1–3 ключевых вызова, которые стоят перед вами прямо сейчас.\n"
-                        "Например: «не хватает энергии», «хочу больше времени для семьи», «нужна ясность в делах».\n"
-                        "(Эти ответы тоже войдут в ваш артефакт.)"
-                    )
-                    logger.info(f"[VOICE] ✓ Отправлена просьба написать вручную")
-                    logger.info(f"[VOICE] ===== ОБРАБОТКА ЗАВЕРШЕНА =====")
-                    return
-        
-        # Шаг 4: Возвращаем результат пользователю
-        logger.info(f"[VOICE] ШАГ 4: Отправляем результат пользователю...")
-        logger.info(f"[VOICE] Финальный cleaned_text: '{cleaned_text}' (длина: {len(cleaned_text) if cleaned_text else 0})")
-        
-        if cleaned_text:
-            result_message = (
-                "✍️ Теперь Расскажите 1–3 ключевых вызова, которые стоят перед вами прямо сейчас.\n"
-                "Например: «не хватает энергии», «хочу больше времени для семьи», «нужна ясность в делах».\n"
-                "(Эти ответы тоже войдут в ваш артефакт.)\n\n"
-                f"{cleaned_text}"
-            )
-        else:
-            # Если все равно пусто, отправляем только инструкцию
-            logger.warning(f"[VOICE] Не удалось извлечь вызовы из ответа Qwen, отправляем только инструкцию")
-            result_message = (
-                "✍️ Теперь Расскажите 1–3 ключевых вызова, которые стоят перед вами прямо сейчас.\n"
-                "Например: «не хватает энергии», «хочу больше времени для семьи», «нужна ясность в делах».\n"
-                "(Эти ответы тоже войдут в ваш артефакт.)"
-            )
-        
-        logger.info(f"[VOICE] Готовимся отправить сообщение длиной: {len(result_message)} символов")
-        logger.info(f"[VOICE] Содержимое сообщения: {result_message[:200]}...")
-        
-        # Удаляем промежуточное сообщение и отправляем результат
-        if processing_msg:
-            try:
-                await processing_msg.delete()
-                logger.info(f"[VOICE] Промежуточное сообщение удалено")
-            except Exception as e:
-                logger.warning(f"[VOICE] Не удалось удалить промежуточное сообщение: {e}")
-        
-        try:
-            await message.answer(result_message)
-            logger.info(f"[VOICE] ✓ Результат успешно отправлен пользователю!")
-            logger.info(f"[VOICE] ===== ОБРАБОТКА ЗАВЕРШЕНА УСПЕШНО =====")
-        except Exception as e:
-            logger.error(f"[VOICE] ОШИБКА при отправке сообщения: {e}", exc_info=True)
-            raise
-            
-    except TimeoutError:
-        logger.error("[VOICE] Таймаут при обработке голосового сообщения", exc_info=True)
-        # Удаляем промежуточное сообщение, если оно было отправлено
-        if processing_msg:
-            try:
-                await processing_msg.delete()
-            except:
-                pass
-        await message.answer("Сервер обрабатывает голосовое сообщение слишком долго. Попробуйте отправить более короткое сообщение или повторите попытку позже.")
+                logger.warning(f"[VOICE] Не удалось извлечь вызовы из ответа Qwen, попросим написать вручную")
+                await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+
+                # Просим написать вручную
+                await bot.send_message(
+                    telegram_id,
+                    "✍️ Теперь Расскажите 1–3 ключевых вызова, которые стоят перед вами прямо сейчас.\n"
+                    "Например: «не хватает энергии», «хочу больше времени для семьи», «нужна ясность в делах».\n"
+                    "(Эти ответы тоже войдут в ваш артефакт.)"
+                )
+                logger.info(f"[VOICE] ✓ Отправлена просьба написать вручную")
+                logger.info(f"[VOICE] ===== ОБРАБОТКА ЗАВЕРШЕНА =====")
+                return
+
+    # Шаг 4: Возвращаем результат пользователю
+    logger.info(f"[VOICE] ШАГ 4: Отправляем результат пользователю...")
+    logger.info(f"[VOICE] Финальный cleaned_text: '{cleaned_text}' (длина: {len(cleaned_text) if cleaned_text else 0})")
+
+    if cleaned_text:
+        result_message = (
+            "✍️ Теперь Расскажите 1–3 ключевых вызова, которые стоят перед вами прямо сейчас.\n"
+            "Например: «не хватает энергии», «хочу больше времени для семьи», «нужна ясность в делах».\n"
+            "(Эти ответы тоже войдут в ваш артефакт.)\n\n"
+            f"{cleaned_text}"
+        )
+    else:
+        # Если все равно пусто, отправляем только инструкцию
+        logger.warning(f"[VOICE] Не удалось извлечь вызовы из ответа Qwen, отправляем только инструкцию")
+        result_message = (
+            "✍️ Теперь Расскажите 1–3 ключевых вызова, которые стоят перед вами прямо сейчас.\n"
+            "Например: «не хватает энергии», «хочу больше времени для семьи», «нужна ясность в делах».\n"
+            "(Эти ответы тоже войдут в ваш артефакт.)"
+        )
+
+    logger.info(f"[VOICE] Готовимся отправить сообщение длиной: {len(result_message)} символов")
+    logger.info(f"[VOICE] Содержимое сообщения: {result_message[:200]}...")
+
+    await _delete_message(bot, telegram_id, job.get("placeholder_message_id"))
+
+    try:
+        await bot.send_message(telegram_id, result_message)
+        logger.info(f"[VOICE] ✓ Результат успешно отправлен пользователю!")
+        logger.info(f"[VOICE] ===== ОБРАБОТКА ЗАВЕРШЕНА УСПЕШНО =====")
     except Exception as e:
-        logger.error(f"[VOICE] Ошибка при обработке голосового сообщения: {e}", exc_info=True)
-        # Удаляем промежуточное сообщение, если оно было отправлено
-        if processing_msg:
-            try:
-                await processing_msg.delete()
-            except:
-                pass
-        await message.answer("Произошла ошибка при обработке голосового сообщения. Попробуйте отправить текстовое сообщение или повторите попытку позже.")
+        logger.error(f"[VOICE] ОШИБКА при отправке сообщения: {e}", exc_info=True)
+        raise
 
 
 async def _process_saturday_reflection_answer(
@@ -1824,10 +1632,7 @@ async def _process_saturday_reflection_answer(
             logger.info("[SATURDAY] Получено голосовое сообщение, начинаем транскрипцию...")
             processing_msg = await message.answer("🔄 Обрабатываю голосовое сообщение...")
             
-            file = await message.bot.get_file(message.voice.file_id)
-            audio_data = BytesIO()
-            await message.bot.download_file(file.file_path, destination=audio_data)
-            answer_text = await transcribe_audio(audio_data)
+            answer_text = await transcribe_voice(message.bot, message.voice.file_id, message.voice.file_unique_id)
             
             if processing_msg:
                 try:
@@ -1852,25 +1657,22 @@ async def _process_saturday_reflection_answer(
         
         # Сохраняем в БД
         try:
-            session = next(get_session())
-            try:
-                user_repo = UserRepository(session)
-                user = user_repo.get_by_telegram_id(message.from_user.id)
+            async with AsyncSessionLocal() as session:
+                user_repo = AsyncUserRepository(session)
+                user = await user_repo.get_by_telegram_id(message.from_user.id)
                 
                 if user:
-                    reflection_repo = SaturdayReflectionRepository(session)
+                    reflection_repo = AsyncSaturdayReflectionRepository(session)
                     reflection_date = date.today()
                     
                     # Сохраняем текущий сегмент
                     kwargs = {f"segment_{current_segment}": answer_text.strip()}
-                    reflection_repo.create_or_update(
+                    await reflection_repo.create_or_update(
                         user_id=user.id,
                         reflection_date=reflection_date,
                         **kwargs
                     )
                     logger.info(f"[SATURDAY] Сохранен сегмент {current_segment} для пользователя {user.id}")
-            finally:
-                session.close()
         except Exception as e:
             logger.error(f"[SATURDAY] Ошибка при сохранении в БД: {e}", exc_info=True)
         
@@ -1883,17 +1685,16 @@ async def _process_saturday_reflection_answer(
         else:
             # Все сегменты пройдены - сохраняем все ответы в БД
             try:
-                session = next(get_session())
-                try:
-                    user_repo = UserRepository(session)
-                    user = user_repo.get_by_telegram_id(message.from_user.id)
+                async with AsyncSessionLocal() as session:
+                    user_repo = AsyncUserRepository(session)
+                    user = await user_repo.get_by_telegram_id(message.from_user.id)
                     
                     if user:
-                        reflection_repo = SaturdayReflectionRepository(session)
+                        reflection_repo = AsyncSaturdayReflectionRepository(session)
                         reflection_date = date.today()
                         
                         # Сохраняем все ответы
-                        reflection_repo.create_or_update(
+                        await reflection_repo.create_or_update(
                             user_id=user.id,
                             reflection_date=reflection_date,
                             segment_1=answers.get("segment_1"),
@@ -1903,8 +1704,6 @@ async def _process_saturday_reflection_answer(
                             segment_5=answers.get("segment_5"),
                         )
                         logger.info(f"[SATURDAY] Сохранена полная рефлексия для пользователя {user.id}")
-                finally:
-                    session.close()
             except Exception as e:
                 logger.error(f"[SATURDAY] Ошибка при сохранении полной рефлексии в БД: {e}", exc_info=True)
             
@@ -0,0 +1,50 @@
+"""add_touch_due_indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (тип касания, время по умолчанию) — должны совпадать с DEFAULT_*_TIME в services/*_touch.py,
+# иначе выражение COALESCE в запросе не совпадёт с выражением индекса и планировщик его не использует.
+TOUCH_DEFAULT_TIMES = (
+    ("morning", "09:00:00"),
+    ("day", "12:00:00"),
+    ("evening", "21:00:00"),
+)
+
+
+def upgrade() -> None:
+    # Частичные составные индексы для выборки пользователей, которым касание положено в текущую минуту:
+    # (subscription_type, COALESCE(время уведомления, время по умолчанию), *_touch_sent_at)
+    for touch_type, default_time in TOUCH_DEFAULT_TIMES:
+        op.create_index(
+            f"ix_users_{touch_type}_touch_due",
+            "users",
+            [
+                "subscription_type",
+                sa.text(
+                    f"COALESCE({touch_type}_notification_time, CAST('{default_time}' AS TIME WITHOUT TIME ZONE))"
+                ),
+                f"{touch_type}_touch_sent_at",
+            ],
+            unique=False,
+            postgresql_where=sa.text("subscription_type IN ('trial', 'paid')"),
+        )
+
+
+def downgrade() -> None:
+    for touch_type, _ in reversed(TOUCH_DEFAULT_TIMES):
+        op.drop_index(f"ix_users_{touch_type}_touch_due", table_name="users")
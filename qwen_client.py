@@ -2,16 +2,26 @@
 Клиент для работы с Qwen API на Cloud.ru.
 Обрабатывает авторизацию и генерацию ответов через модель Qwen.
 """
+import asyncio
+import hashlib
 import json
 import time
 import logging
-from typing import List, Dict, Any, Optional
-import requests
+import re
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, List, Dict, Any, Optional, Tuple
+
+import aiohttp
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+from cloudru_auth import get_token_provider
 from core.config import settings
+from core.redis_pool import get_redis
+from services.model_activity import is_warmup_call, track_model_call
+from services.model_scheduler import ModelCallPreempted, PriorityScheduler, lane_limits
 
 # Используем переменные окружения для Cloud.ru API (Qwen)
 CLOUDRU_IAM_KEY = settings.cloudru_iam_key
@@ -31,18 +41,240 @@ QWEN_LENGTH_PENALTY = settings.qwen_length_penalty
 QWEN_STOP = ["User:", "System:"]  # Стандартные стоп-слова
 CLOUD_TIMEOUT = settings.cloud_timeout
 
-# IAM endpoint
-IAM_TOKEN_URL = settings.cloud_iam_token_url
+# Ограничения вызова
+QWEN_MAX_CONCURRENCY = settings.qwen_max_concurrency
+QWEN_DEADLINE = settings.qwen_deadline
+QWEN_MAX_RETRIES = settings.qwen_max_retries
+QWEN_RETRY_DELAY = 10  # Задержка между попытками (секунды)
+QWEN_TIMEOUT_RETRY_DELAY = 20  # Большая задержка после таймаута (модель может стартовать)
+QWEN_RETRY_STATUSES = {502, 503, 504}  # serverless-модель ещё поднимается
+
+# Размыкатель цепи
+QWEN_BREAKER_FAILURES = settings.qwen_breaker_failures
+QWEN_BREAKER_OPEN_SECONDS = settings.qwen_breaker_open_seconds
+QWEN_BREAKER_LATENCY_WINDOW = settings.qwen_breaker_latency_window
+BREAKER_MIN_SAMPLES = 5  # меньше замеров — p95 не считаем
+
+# Кэш ответов
+QWEN_CACHE_TTL = settings.qwen_cache_ttl
+LLM_CACHE_PREFIX = "llm_cache"
+LLM_CACHE_LOG_EVERY = 100  # обращений к кэшу между записями счётчиков в лог
+EMPTY_RESPONSE_TEXT = "Извините, не удалось получить ответ от модели."
+_HORIZONTAL_SPACE_RE = re.compile(r"[ \t]+")
 
 # Проверяем наличие обязательных переменных
 if not all([CLOUDRU_IAM_KEY, CLOUDRU_IAM_SECRET, CLOUD_PUBLIC_URL]):
     logger.warning("Не все переменные окружения для Cloud.ru Qwen API установлены. Проверьте .env файл")
 
 
+class QwenTaskProfile:
+    """
+    Параметры вызова Qwen под конкретную задачу: лимит токенов, сэмплирование,
+    таймаут одной попытки, число ретраев и общий срок вызова.
+    
+    budget — срок, после которого вызывающему выгоднее локальный fallback, чем
+    ожидание (см. CircuitBreaker); без него действует deadline и полная лестница
+    ретраев на холодный старт.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_tokens: int,
+        temperature: float,
+        timeout: float,
+        max_retries: int,
+        deadline: Optional[float] = None,
+        budget: Optional[float] = None,
+    ):
+        self.name = name
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.budget = budget
+
+
+QWEN_TASK_PROFILES: Dict[str, QwenTaskProfile] = {
+    profile.name: profile
+    for profile in (
+        QwenTaskProfile(
+            "default",
+            max_tokens=QWEN_MAX_TOKENS,
+            temperature=QWEN_TEMPERATURE,
+            timeout=CLOUD_TIMEOUT,
+            max_retries=QWEN_MAX_RETRIES,
+            deadline=QWEN_DEADLINE,
+        ),
+        # Резюме ответа на вопрос касания: 2–3 предложения
+        QwenTaskProfile(
+            "validation",
+            max_tokens=200,
+            temperature=0.3,
+            timeout=60,
+            max_retries=1,
+            budget=settings.qwen_budget_validation,
+        ),
+        # Форматирование ответов профиля в список из нескольких пунктов; пользователь ждёт в хендлере
+        QwenTaskProfile(
+            "format",
+            max_tokens=160,
+            temperature=0.1,
+            timeout=settings.qwen_budget_format,
+            max_retries=0,
+            budget=settings.qwen_budget_format,
+        ),
+        # Выделение 1–3 вызовов из расшифровки голосового
+        QwenTaskProfile(
+            "challenges",
+            max_tokens=160,
+            temperature=0.1,
+            timeout=60,
+            max_retries=1,
+            budget=settings.qwen_budget_voice,
+        ),
+        # Рубрика вопроса касания (services/touch_rubrics.py): считается фоном, холодный старт ждём полностью
+        QwenTaskProfile(
+            "rubric",
+            max_tokens=200,
+            temperature=0.1,
+            timeout=CLOUD_TIMEOUT,
+            max_retries=QWEN_MAX_RETRIES,
+            deadline=QWEN_DEADLINE,
+        ),
+        # Прогрев и health check: хватает одного токена, но холодный старт ждём полностью
+        QwenTaskProfile(
+            "warmup",
+            max_tokens=1,
+            temperature=QWEN_TEMPERATURE,
+            timeout=CLOUD_TIMEOUT,
+            max_retries=QWEN_MAX_RETRIES,
+            deadline=QWEN_DEADLINE,
+        ),
+    )
+}
+
+
+def get_task_profile(profile: "str | QwenTaskProfile") -> QwenTaskProfile:
+    """Профиль задачи по имени (или уже готовый профиль)."""
+    if isinstance(profile, QwenTaskProfile):
+        return profile
+    try:
+        return QWEN_TASK_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Неизвестный профиль задачи Qwen: {profile}") from None
+
+
+class QwenUnavailable(RuntimeError):
+    """Модель заведомо не ответит вовремя: цепь разомкнута или p95 задержки выше бюджета вызова."""
+
+
+class _StreamHTTPError(RuntimeError):
+    """Потоковый запрос завершился HTTP-ошибкой до первого куска текста."""
+    
+    def __init__(self, status: int, text: str):
+        super().__init__(f"Cloud.ru error HTTP {status}: {text[:600]}")
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи для вызовов Qwen.
+    
+    После QWEN_BREAKER_FAILURES неудачных вызовов подряд цепь размыкается на
+    QWEN_BREAKER_OPEN_SECONDS: вызовы сразу получают QwenUnavailable, а не ждут ретраи.
+    Затем пропускается один пробный вызов; его успех замыкает цепь. Прогрев модели
+    проходит и при разомкнутой цепи — он и поднимает модель.
+    
+    Длительности вызовов за последние QWEN_BREAKER_LATENCY_WINDOW секунд дают p95
+    (отдельно по профилям задач — длина генерации у них разная): вызов, чей бюджет
+    меньше p95 своего профиля, отклоняется сразу.
+    """
+    
+    def __init__(self, failure_threshold: int, open_seconds: float, latency_window: float):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.latency_window = latency_window
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._latencies: Dict[str, Deque[Tuple[float, float]]] = {}
+    
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+    
+    def _add_latency(self, profile_name: str, duration: float) -> None:
+        samples = self._latencies.setdefault(profile_name, deque(maxlen=200))
+        samples.append((time.monotonic(), duration))
+    
+    def p95(self, profile_name: str) -> Optional[float]:
+        """95-й перцентиль длительности вызовов профиля за окно; None — мало замеров."""
+        cutoff = time.monotonic() - self.latency_window
+        samples = sorted(duration for at, duration in self._latencies.get(profile_name, ()) if at >= cutoff)
+        if len(samples) < BREAKER_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    
+    def before_call(self, profile_name: str, budget: Optional[float], force: bool = False) -> None:
+        """Пропустить вызов или сразу отклонить его (QwenUnavailable)."""
+        if force:
+            return
+        state = self.state
+        if state == "open":
+            raise QwenUnavailable("цепь разомкнута после серии ошибок Qwen")
+        if state == "half_open":
+            if self._probe_in_flight:
+                raise QwenUnavailable("цепь разомкнута, идёт пробный вызов Qwen")
+            self._probe_in_flight = True
+            return
+        if budget is not None:
+            p95 = self.p95(profile_name)
+            if p95 is not None and p95 > budget:
+                raise QwenUnavailable(f"p95 задержки Qwen {p95:.1f}s больше бюджета вызова {budget}s")
+    
+    def record_success(self, profile_name: str, duration: float) -> None:
+        self._add_latency(profile_name, duration)
+        if self._opened_at is not None:
+            logger.info("Qwen снова отвечает, цепь замкнута")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+    
+    def record_slow(self, profile_name: str, duration: float) -> None:
+        """Вызов прерван по бюджету: модель медленная, но это ещё не ошибка."""
+        self._add_latency(profile_name, duration)
+        self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or (self._opened_at is None and self._failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            logger.warning(
+                f"Qwen: {self._failures} неудачных вызовов подряд, цепь разомкнута на {self.open_seconds}s — "
+                f"вызовы сразу получают локальный fallback"
+            )
+    
+    def release(self) -> None:
+        """Вызов отменён снаружи — результата нет, пробный слот освобождается."""
+        self._probe_in_flight = False
+
+
 class QwenClient:
     """
-    Клиент для работы с моделью Qwen на Cloud.ru.
-    Обрабатывает авторизацию через OAuth2 и генерацию ответов.
+    Асинхронный клиент для работы с моделью Qwen на Cloud.ru.
+    Генерирует ответы; Bearer токен берётся из общего кэша cloudru_auth.
+    
+    HTTP-соединения переиспользуются (keep-alive пул aiohttp), одновременных запросов
+    к модели не больше QWEN_MAX_CONCURRENCY — запросы пользователей получают слот раньше
+    фоновых и прогрева; ожидание ретраев не блокирует event loop.
     """
     
     def __init__(self):
@@ -50,78 +282,75 @@ class QwenClient:
         self.key_id = CLOUDRU_IAM_KEY
         self.key_secret = CLOUDRU_IAM_SECRET
         self.model_name = QWEN_MODEL
-        self.timeout = CLOUD_TIMEOUT
         self.system_prompt = SYSTEM_PROMPT
         
-        # Параметры генерации
-        self.max_tokens = QWEN_MAX_TOKENS
-        self.temperature = QWEN_TEMPERATURE
+        # Общие параметры генерации; лимит токенов, температура и таймауты — в профиле задачи
         self.top_p = QWEN_TOP_P
         self.top_k = QWEN_TOP_K
         self.frequency_penalty = QWEN_FREQUENCY_PENALTY
         self.repetition_penalty = QWEN_REPETITION_PENALTY
         self.length_penalty = QWEN_LENGTH_PENALTY
         self.stop = QWEN_STOP
-        self.iam_token_url = IAM_TOKEN_URL
         
-        # Кэш токена
-        self._access_token: Optional[str] = None
-        self._token_expire_at: float = 0.0
+        # Сессия и планировщик вызовов привязаны к event loop и создаются при первом запросе
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._scheduler: Optional[PriorityScheduler] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Идущие запросы по ключу кэша: одинаковые одновременные вызовы ждут один ответ модели
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.breaker = CircuitBreaker(QWEN_BREAKER_FAILURES, QWEN_BREAKER_OPEN_SECONDS, QWEN_BREAKER_LATENCY_WINDOW)
         
         if not self.base_url or not self.key_id or not self.key_secret:
             raise RuntimeError("Нужны CLOUD_PUBLIC_URL, CLOUDRU_IAM_KEY и CLOUDRU_IAM_SECRET")
     
-    def _have_valid_token(self) -> bool:
-        """Проверяет, есть ли валидный токен (с запасом 30 секунд)."""
-        return bool(self._access_token) and (time.time() < self._token_expire_at - 30)
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Сессия с пулом keep-alive соединений (пересоздаётся при смене event loop)."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=QWEN_MAX_CONCURRENCY * 2, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._scheduler = PriorityScheduler("qwen", QWEN_MAX_CONCURRENCY, lane_limits())
+            self._loop = loop
+        return self._session
     
-    def _fetch_token(self) -> None:
-        """Получает новый Bearer токен через OAuth2."""
-        data = {
-            "grant_type": "client_credentials",
-            "client_id": self.key_id,
-            "client_secret": self.key_secret,
-        }
-        
-        resp = requests.post(self.iam_token_url, data=data, timeout=self.timeout)
-        if resp.status_code >= 400:
-            raise RuntimeError(f"IAM token error HTTP {resp.status_code}: {resp.text[:400]}")
-        
-        try:
-            payload = resp.json()
-        except Exception:
-            raise RuntimeError(f"IAM вернул не-JSON: {resp.text[:400]}")
-        
-        access_token = payload.get("access_token")
-        expires_in = int(payload.get("expires_in", 3600))
-        if not access_token:
-            raise RuntimeError(f"IAM: нет access_token в ответе: {payload}")
-        
-        self._access_token = access_token
-        self._token_expire_at = time.time() + max(60, expires_in)
-        logger.info("Успешно получен Bearer токен для Qwen")
-    
-    def _auth_headers(self) -> Dict[str, str]:
-        """Получает заголовки авторизации с Bearer токеном."""
-        if not self._have_valid_token():
-            self._fetch_token()
+    async def close(self) -> None:
+        """Закрыть HTTP-сессию (при остановке бота)."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+    
+    async def _auth_headers(self, force_refresh: bool = False) -> Dict[str, str]:
+        """Получает заголовки авторизации с Bearer токеном (общий кэш токена Cloud.ru)."""
+        token = await get_token_provider().get_token(force_refresh=force_refresh)
         return {
-            "Authorization": f"Bearer {self._access_token}",
+            "Authorization": f"Bearer {token}",
             "Accept": "application/json",
             "Content-Type": "application/json",
         }
     
-    def generate_response(self, user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
-        """
-        Генерирует ответ на сообщение пользователя.
-        
-        Args:
-            user_message: Сообщение пользователя
-            conversation_history: История диалога (опционально)
-        
-        Returns:
-            Ответ модели
-        """
+    async def _post(self, url: str, body: Dict[str, Any], timeout: float) -> Tuple[int, str]:
+        """Один запрос к модели в слоте планировщика (services/model_scheduler.py): возвращает (HTTP статус, тело ответа)."""
+        session = self._get_session()
+        async with self._scheduler.slot():
+            headers = await self._auth_headers()
+            async with session.post(url, headers=headers, json=body, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                if resp.status == 401:
+                    logger.warning("Получен 401, обновляем токен")
+                else:
+                    return resp.status, await resp.text()
+            # Авторизационный 401 — обновляем токен и повторяем 1 раз
+            headers = await self._auth_headers(force_refresh=True)
+            async with session.post(url, headers=headers, json=body, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                return resp.status, await resp.text()
+    
+    def _build_body(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        profile: QwenTaskProfile,
+    ) -> Dict[str, Any]:
+        """Тело запроса chat/completions: сообщения и параметры генерации профиля."""
         # Формируем сообщения для API
         messages = []
         
@@ -136,107 +365,118 @@ class QwenClient:
         # Добавляем текущее сообщение пользователя
         messages.append({"role": "user", "content": user_message})
         
-        # Отправляем запрос
-        url = self.base_url.rstrip("/") + "/v1/chat/completions"
-        body = {
+        return {
             "model": self.model_name,
             "messages": messages,
-            "temperature": self.temperature,
+            "temperature": profile.temperature,
             "top_p": self.top_p,
             "top_k": self.top_k,
             "frequency_penalty": self.frequency_penalty,
             "repetition_penalty": self.repetition_penalty,
             "length_penalty": self.length_penalty,
-            "max_tokens": self.max_tokens,
+            "max_tokens": profile.max_tokens,
             "stop": self.stop,
             "stream": False,
         }
+    
+    def cache_key(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        profile: "str | QwenTaskProfile" = "default",
+    ) -> str:
+        """
+        Ключ кэша ответа: хэш нормализованных сообщений и параметров генерации.
+        Повторные пробелы и табуляции схлопываются, пробелы по краям строк отбрасываются;
+        переводы строк сохраняются: ответы по строкам и те же слова в одну строку — разные промпты.
+        """
+        body = self._build_body(user_message, conversation_history, get_task_profile(profile))
+        body["messages"] = [
+            {"role": message["role"], "content": _normalize_prompt_text(str(message.get("content", "")))}
+            for message in body["messages"]
+        ]
+        digest = hashlib.sha256(json.dumps(body, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{LLM_CACHE_PREFIX}:{digest}"
+    
+    async def generate_response(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        deadline: Optional[float] = None,
+        profile: "str | QwenTaskProfile" = "default",
+    ) -> str:
+        """
+        Генерирует ответ на сообщение пользователя.
         
-        logger.info(f"Отправляем запрос к Qwen API: {url}")
-        logger.info(f"Модель: {self.model_name}, max_tokens: {self.max_tokens}, timeout: {self.timeout}s")
-        logger.info("Внимание: модель может долго стартовать (до 3 минут на первых запусках), это нормально")
-        logger.debug(f"Тело запроса: {body}")
+        Args:
+            user_message: Сообщение пользователя
+            conversation_history: История диалога (опционально)
+            deadline: Общий лимит времени на вызов с учётом ретраев, секунды (по умолчанию — бюджет или срок профиля)
+            profile: Профиль задачи (QWEN_TASK_PROFILES). Если у профиля есть budget, а p95 модели
+                выше или цепь разомкнута — сразу QwenUnavailable, иначе вызов прерывается по истечении бюджета
         
-        # Пробуем несколько раз с ретраями (serverless модель может долго стартовать после 5 минут простоя)
-        # Для serverless моделей увеличиваем количество попыток, так как машина может отключаться
-        max_retries = 5  # Увеличено до 5 попыток (всего 6) для serverless режима
-        retry_delay = 10  # Задержка между попытками (секунды)
-        timeout_retry_delay = 20  # Большая задержка после таймаута (модель может стартовать)
+        Returns:
+            Ответ модели
         
-        # Для больших моделей увеличиваем таймаут запроса
-        request_timeout = max(self.timeout, 600)  # Минимум 10 минут для больших моделей
+        Raises:
+            QwenUnavailable: модель заведомо не ответит вовремя (вызывающий берёт локальный fallback)
+        """
+        url = self.base_url.rstrip("/") + "/v1/chat/completions"
+        profile = get_task_profile(profile)
+        body = self._build_body(user_message, conversation_history, profile)
         
-        last_exception = None
-        for attempt in range(max_retries + 1):
-            t0 = time.time()
-            try:
-                if attempt > 0:
-                    # После таймаута делаем большую задержку, так как модель может стартовать
-                    delay = timeout_retry_delay if isinstance(last_exception, requests.exceptions.Timeout) else retry_delay
-                    logger.info(f"Повторная попытка {attempt}/{max_retries} через {delay} секунд...")
-                    time.sleep(delay)
-                
-                logger.info(f"Попытка {attempt + 1}/{max_retries + 1}: отправка запроса к Qwen (таймаут: {request_timeout}s)")
-                resp = requests.post(
-                    url,
-                    headers=self._auth_headers(),
-                    json=body,
-                    timeout=request_timeout
-                )
-                logger.info(f"✓ Получен ответ от Qwen (статус: {resp.status_code})")
-                break  # Успешно, выходим из цикла
-                
-            except requests.exceptions.Timeout:
-                elapsed = time.time() - t0
-                last_exception = requests.exceptions.Timeout()
-                if attempt < max_retries:
-                    logger.warning(f"✗ Таймаут при запросе к Qwen API (попытка {attempt + 1}/{max_retries + 1}, "
-                                 f"прошло {elapsed:.1f}s из {request_timeout}s). "
-                                 f"Serverless модель может стартовать после простоя. Повторяем через {timeout_retry_delay} секунд...")
-                    continue
-                else:
-                    total_time = time.time() - t0
-                    logger.error(f"✗ Таймаут при запросе к Qwen API после {max_retries + 1} попыток. "
-                              f"Модель {self.model_name} не отвечает. "
-                              f"Общее время ожидания: {total_time:.1f}s. "
-                              f"Возможно, модель недоступна или перегружена.")
-                    raise TimeoutError(f"Qwen API не отвечает после {max_retries + 1} попыток (общее время: {total_time:.1f}s)")
-            except requests.exceptions.RequestException as e:
-                last_exception = e
-                logger.error(f"✗ Ошибка сети при запросе к Qwen API (попытка {attempt + 1}): {e}")
-                if attempt < max_retries:
-                    logger.info(f"Повторяем попытку через {retry_delay} секунд...")
-                    continue
-                else:
-                    raise
-            except Exception as e:
-                last_exception = e
-                logger.error(f"✗ Неожиданная ошибка при запросе к Qwen API: {e}", exc_info=True)
+        budget = profile.budget
+        self.breaker.before_call(profile.name, budget, force=is_warmup_call())
+        # Явно переданный срок важнее бюджета профиля — как и остальные параметры вызова
+        deadline = deadline or budget or profile.deadline or QWEN_DEADLINE
+        logger.info(f"Отправляем запрос к Qwen API: {url}")
+        logger.info(f"Модель: {self.model_name}, профиль: {profile.name}, max_tokens: {profile.max_tokens}, "
+                    f"timeout: {profile.timeout}s, ретраев: {profile.max_retries}, deadline: {deadline}s")
+        logger.debug(f"Тело запроса: {body}")
+        
+        t0 = time.monotonic()
+        call_timeout = asyncio.timeout(deadline)
+        try:
+            async with call_timeout, track_model_call("qwen"):
+                status, text = await self._post_with_retries(url, body, profile)
+        except TimeoutError:
+            if not call_timeout.expired():
+                self.breaker.record_failure()
                 raise
+            total_time = time.monotonic() - t0
+            if budget:
+                self.breaker.record_slow(profile.name, total_time)
+                logger.warning(f"✗ Qwen API не уложился в бюджет вызова {budget}s, отдаём локальный fallback")
+            else:
+                self.breaker.record_failure()
+                logger.error(f"✗ Qwen API не ответил за {total_time:.1f}s (deadline {deadline}s). "
+                             f"Возможно, модель {self.model_name} недоступна или перегружена.")
+            raise TimeoutError(f"Qwen API не ответил за отведённое время ({deadline}s)")
+        except (asyncio.CancelledError, ModelCallPreempted):
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
         
-        llm_ms = round((time.time() - t0) * 1000, 2)
-        logger.info(f"Получен ответ от Qwen за {llm_ms}ms (статус: {resp.status_code})")
+        llm_ms = round((time.monotonic() - t0) * 1000, 2)
+        logger.info(f"Получен ответ от Qwen за {llm_ms}ms (статус: {status})")
         
-        # Авторизационный 401 — пробуем обновить токен 1 раз
-        if resp.status_code == 401:
-            logger.warning("Получен 401, обновляем токен")
-            self._fetch_token()
-            resp = requests.post(
-                url,
-                headers=self._auth_headers(),
-                json=body,
-                timeout=self.timeout
-            )
+        # 4xx (кроме 429) — ошибка запроса, а не недоступность модели
+        if status >= 500 or status == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success(profile.name, llm_ms / 1000)
         
-        if resp.status_code >= 400:
-            txt = (resp.text or "")[:600]
-            logger.error(f"Cloud.ru error HTTP {resp.status_code}: {txt}")
-            raise RuntimeError(f"Cloud.ru error HTTP {resp.status_code}: {txt}")
+        if status >= 400:
+            txt = (text or "")[:600]
+            logger.error(f"Cloud.ru error HTTP {status}: {txt}")
+            raise RuntimeError(f"Cloud.ru error HTTP {status}: {txt}")
         
         try:
-            data = resp.json()
+            data = json.loads(text)
         except ValueError:
-            raise RuntimeError(f"Cloud.ru вернул не-JSON: {resp.text[:400]}")
+            raise RuntimeError(f"Cloud.ru вернул не-JSON: {text[:400]}")
         
         # Извлекаем ответ
         choices = data.get("choices") or []
@@ -249,12 +489,200 @@ class QwenClient:
         
         if not content:
             logger.warning("Пустой ответ от модели")
-            content = "Извините, не удалось получить ответ от модели."
+            content = EMPTY_RESPONSE_TEXT
+        
+        return content
+    
+    async def _post_with_retries(self, url: str, body: Dict[str, Any], profile: QwenTaskProfile) -> Tuple[int, str]:
+        """
+        Запрос к модели с ретраями: serverless-модель может долго стартовать после простоя.
+        Паузы между попытками — asyncio.sleep, слот планировщика на время паузы не удерживается.
+        """
+        for attempt in range(profile.max_retries + 1):
+            t0 = time.monotonic()
+            try:
+                logger.info(f"Попытка {attempt + 1}/{profile.max_retries + 1}: отправка запроса к Qwen (таймаут: {profile.timeout}s)")
+                status, text = await self._post(url, body, profile.timeout)
+                if status not in QWEN_RETRY_STATUSES or attempt == profile.max_retries:
+                    return status, text
+                delay = QWEN_RETRY_DELAY
+                logger.warning(f"✗ Qwen API вернул HTTP {status} (попытка {attempt + 1}), модель ещё стартует. "
+                               f"Повторяем через {delay} секунд...")
+            except asyncio.TimeoutError:
+                if attempt == profile.max_retries:
+                    logger.error(f"✗ Таймаут при запросе к Qwen API после {profile.max_retries + 1} попыток. "
+                                 f"Модель {self.model_name} не отвечает.")
+                    raise TimeoutError(f"Qwen API не отвечает после {profile.max_retries + 1} попыток")
+                delay = QWEN_TIMEOUT_RETRY_DELAY
+                logger.warning(f"✗ Таймаут при запросе к Qwen API (попытка {attempt + 1}/{profile.max_retries + 1}, "
+                               f"прошло {time.monotonic() - t0:.1f}s). "
+                               f"Serverless модель может стартовать после простоя. Повторяем через {delay} секунд...")
+            except aiohttp.ClientError as e:
+                logger.error(f"✗ Ошибка сети при запросе к Qwen API (попытка {attempt + 1}): {e}")
+                if attempt == profile.max_retries:
+                    raise
+                delay = QWEN_RETRY_DELAY
+                logger.info(f"Повторяем попытку через {delay} секунд...")
+            await asyncio.sleep(delay)
+        raise RuntimeError("Qwen API: попытки исчерпаны")
+    
+    async def generate_cached(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        profile: "str | QwenTaskProfile" = "default",
+    ) -> str:
+        """
+        generate_response через кэш ответов в Redis (QWEN_CACHE_TTL) с single-flight:
+        одинаковые одновременные запросы объединяются в один вызов модели.
+        Кэш работает и при разомкнутой цепи — закэшированный ответ отдаётся сразу.
+        Вытеснение сверх TTL — политикой maxmemory Redis (volatile-lru).
+        """
+        key = self.cache_key(user_message, conversation_history, profile)
+        cached = await _cache_get(key)
+        if cached is not None:
+            _count_cache("hits")
+            return cached
         
-        logger.info(f"Получен ответ от Qwen (время: {llm_ms}ms)")
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            _count_cache("merged")
+            return await asyncio.shield(task)
+        
+        _count_cache("misses")
+        task = asyncio.get_running_loop().create_task(
+            self._generate_and_store(key, user_message, conversation_history, profile)
+        )
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._forget_inflight(key, done))
+        # shield: отмена одного ожидающего не прерывает запрос, нужный остальным
+        return await asyncio.shield(task)
+    
+    async def _generate_and_store(
+        self,
+        key: str,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        profile: "str | QwenTaskProfile",
+    ) -> str:
+        content = await self.generate_response(user_message, conversation_history, profile=profile)
+        if content and content != EMPTY_RESPONSE_TEXT:
+            await _cache_set(key, content)
         return content
     
-    def health_check(self) -> Dict[str, Any]:
+    def _forget_inflight(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # ошибка уже получена ожидающими; не даём asyncio ругаться на неё
+    
+    @asynccontextmanager
+    async def _open_stream(self, url: str, body: Dict[str, Any], timeout: aiohttp.ClientTimeout) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Потоковый запрос в слоте планировщика (до конца чтения ответа); при 401 токен обновляется и запрос повторяется 1 раз."""
+        session = self._get_session()
+        async with self._scheduler.slot():
+            headers = await self._auth_headers()
+            headers["Accept"] = "text/event-stream"
+            resp = await session.post(url, headers=headers, json=body, timeout=timeout)
+            if resp.status == 401:
+                resp.release()
+                logger.warning("Получен 401, обновляем токен")
+                headers = await self._auth_headers(force_refresh=True)
+                headers["Accept"] = "text/event-stream"
+                resp = await session.post(url, headers=headers, json=body, timeout=timeout)
+            try:
+                yield resp
+            finally:
+                resp.release()
+    
+    async def stream_response(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        profile: "str | QwenTaskProfile" = "default",
+    ) -> AsyncIterator[str]:
+        """
+        Потоковая генерация ("stream": true, SSE): отдаёт куски текста по мере генерации.
+        
+        Ретраи (HTTP 502/503/504, таймаут, ошибка сети) — только до первого куска, пока
+        модель стартует: повтор после него показал бы текст заново. Срок профиля (budget
+        или deadline) действует на весь поток, профиль timeout — на паузу между кусками.
+        Размыкатель цепи и QwenUnavailable — как в generate_response.
+        """
+        url = self.base_url.rstrip("/") + "/v1/chat/completions"
+        profile = get_task_profile(profile)
+        body = self._build_body(user_message, conversation_history, profile)
+        body["stream"] = True
+        
+        budget = profile.budget
+        self.breaker.before_call(profile.name, budget, force=is_warmup_call())
+        deadline = budget or profile.deadline or QWEN_DEADLINE
+        logger.info(f"Потоковый запрос к Qwen API: профиль {profile.name}, max_tokens: {profile.max_tokens}, "
+                    f"ретраев: {profile.max_retries}, deadline: {deadline}s")
+        
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + deadline
+        t0 = time.monotonic()
+        first_delta_at: Optional[float] = None
+        try:
+            async with track_model_call("qwen"):
+                for attempt in range(profile.max_retries + 1):
+                    remaining = deadline_at - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    timeout = aiohttp.ClientTimeout(total=remaining, sock_read=profile.timeout)
+                    try:
+                        async with self._open_stream(url, body, timeout) as resp:
+                            if resp.status < 400:
+                                async for delta in _iter_sse_deltas(resp):
+                                    if first_delta_at is None:
+                                        first_delta_at = time.monotonic()
+                                        logger.info(f"Первый кусок ответа Qwen через {first_delta_at - t0:.1f}s")
+                                    yield delta
+                                break
+                            text = await resp.text()
+                            if resp.status not in QWEN_RETRY_STATUSES or attempt == profile.max_retries:
+                                raise _StreamHTTPError(resp.status, text)
+                        logger.warning(f"✗ Qwen API вернул HTTP {resp.status} (попытка {attempt + 1}), модель ещё стартует")
+                    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                        if first_delta_at is not None or attempt == profile.max_retries or loop.time() >= deadline_at:
+                            raise
+                        logger.warning(f"✗ Ошибка потокового запроса к Qwen (попытка {attempt + 1}): {e!r}")
+                    await asyncio.sleep(min(QWEN_RETRY_DELAY, max(0.0, deadline_at - loop.time())))
+        except asyncio.TimeoutError:
+            total_time = time.monotonic() - t0
+            # sock_read — модель замолчала посреди ответа; срок вызова — модель медленная
+            if loop.time() < deadline_at:
+                self.breaker.record_failure()
+                logger.error(f"✗ Qwen API перестал отвечать посреди потока ({total_time:.1f}s)")
+            elif budget:
+                self.breaker.record_slow(profile.name, total_time)
+                logger.warning(f"✗ Qwen API не уложился в бюджет вызова {budget}s")
+            else:
+                self.breaker.record_failure()
+                logger.error(f"✗ Qwen API не ответил за {total_time:.1f}s (deadline {deadline}s)")
+            raise TimeoutError(f"Qwen API не ответил за отведённое время ({deadline}s)")
+        except _StreamHTTPError as e:
+            # 4xx (кроме 429) — ошибка запроса, а не недоступность модели
+            if e.status >= 500 or e.status == 429:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success(profile.name, time.monotonic() - t0)
+            logger.error(str(e))
+            raise
+        except (asyncio.CancelledError, GeneratorExit, ModelCallPreempted):
+            # Отмена задачи, читатель бросил поток или вызов снят планировщиком — результата нет
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        
+        total_time = time.monotonic() - t0
+        self.breaker.record_success(profile.name, total_time)
+        logger.info(f"Потоковый ответ Qwen получен за {total_time:.1f}s")
+    
+    async def health_check(self) -> Dict[str, Any]:
         """
         Проверяет работоспособность API.
         
@@ -262,7 +690,7 @@ class QwenClient:
             Словарь со статусом проверки
         """
         try:
-            test_response = self.generate_response("Привет")
+            test_response = await self.generate_response("Привет", profile="warmup")
             return {
                 "status": "ok",
                 "model": self.model_name,
@@ -277,6 +705,69 @@ class QwenClient:
             }
 
 
+async def _iter_sse_deltas(resp: aiohttp.ClientResponse) -> AsyncIterator[str]:
+    """Куски текста из SSE-ответа chat/completions: строки `data: {...}`, конец — `data: [DONE]`."""
+    async for raw_line in resp.content:
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if not line.startswith("data:"):
+            continue  # пустые строки-разделители, комментарии и keep-alive
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            logger.warning(f"Некорректный кусок потока Qwen: {data[:200]}")
+            continue
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        delta = (choices[0].get("delta") or {}).get("content") or choices[0].get("text") or ""
+        if delta:
+            yield delta
+
+
+def _normalize_prompt_text(text: str) -> str:
+    return "\n".join(_HORIZONTAL_SPACE_RE.sub(" ", line).strip() for line in text.strip().splitlines())
+
+
+_cache_stats: Dict[str, int] = {"hits": 0, "misses": 0, "merged": 0}
+
+
+def _count_cache(event: str) -> None:
+    _cache_stats[event] += 1
+    stats = get_llm_cache_stats()
+    if (stats["hits"] + stats["misses"] + stats["merged"]) % LLM_CACHE_LOG_EVERY == 0:
+        logger.info(f"Кэш ответов Qwen: {stats}")
+
+
+async def _cache_get(key: str) -> Optional[str]:
+    if QWEN_CACHE_TTL <= 0:
+        return None
+    try:
+        return await get_redis().get(key)
+    except Exception as e:
+        # Кэш — только ускорение: без Redis идём в модель
+        logger.warning(f"Кэш ответов Qwen недоступен: {e}")
+        return None
+
+
+async def _cache_set(key: str, content: str) -> None:
+    if QWEN_CACHE_TTL <= 0:
+        return
+    try:
+        await get_redis().set(key, content, ex=QWEN_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить ответ Qwen в кэш: {e}")
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    """Счётчики кэша ответов Qwen с запуска процесса: попадания, промахи, объединённые запросы."""
+    lookups = _cache_stats["hits"] + _cache_stats["misses"] + _cache_stats["merged"]
+    saved = _cache_stats["hits"] + _cache_stats["merged"]
+    return {**_cache_stats, "hit_ratio": round(saved / lookups, 3) if lookups else 0.0}
+
+
 # Глобальный экземпляр клиента (singleton)
 _qwen_client: Optional[QwenClient] = None
 
@@ -294,20 +785,72 @@ def get_qwen_client() -> QwenClient:
     return _qwen_client
 
 
-async def generate_qwen_response(user_message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+async def close_qwen_client() -> None:
+    """Закрыть HTTP-сессию клиента Qwen (при остановке бота)."""
+    if _qwen_client is not None:
+        await _qwen_client.close()
+
+
+async def generate_qwen_response(
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    profile: "str | QwenTaskProfile" = "default",
+    use_cache: bool = True,
+) -> str:
     """
-    Асинхронная обертка для генерации ответа Qwen.
+    Сгенерировать ответ Qwen, не блокируя event loop.
+    
+    Одинаковые запросы (те же сообщения и параметры генерации) отдаются из кэша
+    и объединяются, пока идёт первый; use_cache=False — там, где нужен свежий ответ.
     
     Args:
         user_message: Сообщение пользователя
         conversation_history: История диалога (опционально)
+        profile: Профиль задачи — лимит токенов, таймауты, ретраи и бюджет (QWEN_TASK_PROFILES)
+        use_cache: Брать ответ из кэша и объединять одинаковые запросы
     
     Returns:
         Ответ модели
+    
+    Raises:
+        QwenUnavailable: цепь разомкнута или модель сейчас медленнее бюджета профиля
     """
     client = get_qwen_client()
-    # Выполняем синхронный запрос в отдельном потоке (для async совместимости)
-    import asyncio
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, client.generate_response, user_message, conversation_history)
+    if not use_cache:
+        return await client.generate_response(user_message, conversation_history, profile=profile)
+    return await client.generate_cached(user_message, conversation_history, profile=profile)
+
 
+async def stream_qwen_response(
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    profile: "str | QwenTaskProfile" = "default",
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Потоковая генерация ответа Qwen: куски текста по мере генерации.
+    
+    Закэшированный ответ отдаётся одним куском; полный ответ после генерации
+    сохраняется в тот же кэш, что и у generate_qwen_response. Одинаковые
+    одновременные потоки не объединяются — каждый читатель получает свой поток.
+    
+    Raises:
+        QwenUnavailable: цепь разомкнута или модель сейчас медленнее бюджета профиля
+    """
+    client = get_qwen_client()
+    key = client.cache_key(user_message, conversation_history, profile) if use_cache else None
+    if key is not None:
+        cached = await _cache_get(key)
+        if cached is not None:
+            _count_cache("hits")
+            yield cached
+            return
+        _count_cache("misses")
+    
+    parts: List[str] = []
+    async for delta in client.stream_response(user_message, conversation_history, profile=profile):
+        parts.append(delta)
+        yield delta
+    content = "".join(parts).strip()
+    if key is not None and content:
+        await _cache_set(key, content)
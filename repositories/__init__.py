@@ -1,8 +1,13 @@
 from repositories.payment_repository import PaymentRepository
 from repositories.quiz_result_repository import QuizResultRepository
-from repositories.touch_content_repository import TouchContentRepository
-from repositories.user_repository import UserRepository
-
-__all__ = ["UserRepository", "QuizResultRepository", "TouchContentRepository", "PaymentRepository"]
-
+from repositories.touch_content_repository import AsyncTouchContentRepository, TouchContentRepository
+from repositories.user_repository import AsyncUserRepository, UserRepository
 
+__all__ = [
+    "UserRepository",
+    "QuizResultRepository",
+    "TouchContentRepository",
+    "PaymentRepository",
+    "AsyncUserRepository",
+    "AsyncTouchContentRepository",
+]
@@ -1,10 +1,11 @@
 from datetime import date
 from typing import Optional
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 
-from database.repository import BaseRepository
+from database.repository import AsyncBaseRepository, BaseRepository
 from models.evening_rating import EveningRating
 
 
@@ -58,3 +59,49 @@ class EveningRatingRepository(BaseRepository[EveningRating]):
                 rating_progress=rating_progress,
             )
 
+
+class AsyncEveningRatingRepository(AsyncBaseRepository[EveningRating]):
+    """Асинхронный репозиторий для вечерних оценок."""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(EveningRating, session)
+
+    async def get_by_user_and_date(
+        self,
+        user_id: int,
+        rating_date: date
+    ) -> Optional[EveningRating]:
+        """Получить оценки пользователя за конкретную дату."""
+        query = select(EveningRating).where(
+            EveningRating.user_id == user_id,
+            EveningRating.rating_date == rating_date,
+            EveningRating.is_active == True
+        )
+        return (await self.session.scalars(query)).first()
+
+    async def create_or_update(
+        self,
+        *,
+        user_id: int,
+        rating_date: date,
+        rating_energy: int,
+        rating_happiness: int,
+        rating_progress: int,
+    ) -> EveningRating:
+        """Создать или обновить вечерние оценки пользователя."""
+        existing = await self.get_by_user_and_date(user_id, rating_date)
+
+        if existing:
+            existing.rating_energy = rating_energy
+            existing.rating_happiness = rating_happiness
+            existing.rating_progress = rating_progress
+            await self.session.commit()
+            await self.session.refresh(existing)
+            return existing
+        return await self.create(
+            user_id=user_id,
+            rating_date=rating_date,
+            rating_energy=rating_energy,
+            rating_happiness=rating_happiness,
+            rating_progress=rating_progress,
+        )
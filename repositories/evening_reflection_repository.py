@@ -1,10 +1,11 @@
 from datetime import date
 from typing import Optional
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 
-from database.repository import BaseRepository
+from database.repository import AsyncBaseRepository, BaseRepository
 from models.evening_reflection import EveningReflection
 
 
@@ -52,3 +53,43 @@ class EveningReflectionRepository(BaseRepository[EveningReflection]):
                 reflection_text=reflection_text,
             )
 
+
+class AsyncEveningReflectionRepository(AsyncBaseRepository[EveningReflection]):
+    """Асинхронный репозиторий для вечерних рефлексий."""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(EveningReflection, session)
+
+    async def get_by_user_and_date(
+        self,
+        user_id: int,
+        reflection_date: date
+    ) -> Optional[EveningReflection]:
+        """Получить рефлексию пользователя за конкретную дату."""
+        query = select(EveningReflection).where(
+            EveningReflection.user_id == user_id,
+            EveningReflection.reflection_date == reflection_date,
+            EveningReflection.is_active == True
+        )
+        return (await self.session.scalars(query)).first()
+
+    async def create_or_update(
+        self,
+        *,
+        user_id: int,
+        reflection_date: date,
+        reflection_text: str,
+    ) -> EveningReflection:
+        """Создать или обновить вечернюю рефлексию пользователя."""
+        existing = await self.get_by_user_and_date(user_id, reflection_date)
+
+        if existing:
+            existing.reflection_text = reflection_text
+            await self.session.commit()
+            await self.session.refresh(existing)
+            return existing
+        return await self.create(
+            user_id=user_id,
+            reflection_date=reflection_date,
+            reflection_text=reflection_text,
+        )
@@ -1,10 +1,11 @@
 from datetime import date
 from typing import Optional
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 
-from database.repository import BaseRepository
+from database.repository import AsyncBaseRepository, BaseRepository
 from models.saturday_reflection import SaturdayReflection
 
 
@@ -69,3 +70,56 @@ class SaturdayReflectionRepository(BaseRepository[SaturdayReflection]):
                 segment_5=segment_5,
             )
 
+
+class AsyncSaturdayReflectionRepository(AsyncBaseRepository[SaturdayReflection]):
+    """Асинхронный репозиторий для рефлексий стратсубботы."""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(SaturdayReflection, session)
+
+    async def get_by_user_and_date(
+        self,
+        user_id: int,
+        reflection_date: date
+    ) -> Optional[SaturdayReflection]:
+        """Получить рефлексию пользователя за конкретную дату."""
+        query = select(SaturdayReflection).where(
+            SaturdayReflection.user_id == user_id,
+            SaturdayReflection.reflection_date == reflection_date,
+            SaturdayReflection.is_active == True
+        )
+        return (await self.session.scalars(query)).first()
+
+    async def create_or_update(
+        self,
+        *,
+        user_id: int,
+        reflection_date: date,
+        segment_1: Optional[str] = None,
+        segment_2: Optional[str] = None,
+        segment_3: Optional[str] = None,
+        segment_4: Optional[str] = None,
+        segment_5: Optional[str] = None,
+    ) -> SaturdayReflection:
+        """Создать или обновить рефлексию пользователя (заполняются только переданные сегменты)."""
+        segments = {
+            "segment_1": segment_1,
+            "segment_2": segment_2,
+            "segment_3": segment_3,
+            "segment_4": segment_4,
+            "segment_5": segment_5,
+        }
+        existing = await self.get_by_user_and_date(user_id, reflection_date)
+
+        if existing:
+            for field, value in segments.items():
+                if value is not None:
+                    setattr(existing, field, value)
+            await self.session.commit()
+            await self.session.refresh(existing)
+            return existing
+        return await self.create(
+            user_id=user_id,
+            reflection_date=reflection_date,
+            **segments,
+        )
@@ -1,10 +1,11 @@
 from datetime import date
 from typing import List, Optional
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 
-from database.repository import BaseRepository
+from database.repository import AsyncBaseRepository, BaseRepository
 from models.touch_answer import TouchAnswer
 
 
@@ -53,3 +54,51 @@ class TouchAnswerRepository(BaseRepository[TouchAnswer]):
             ).order_by(TouchAnswer.question_index).all()
         )
 
+
+class AsyncTouchAnswerRepository(AsyncBaseRepository[TouchAnswer]):
+    """Асинхронный репозиторий для ответов на вопросы касаний."""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(TouchAnswer, session)
+
+    async def create_answers(
+        self,
+        *,
+        user_id: int,
+        touch_content_id: int,
+        touch_date: date,
+        answers: List[str],
+    ) -> List[TouchAnswer]:
+        """Создать ответы на все вопросы касания (одной транзакцией)."""
+        created_answers = [
+            TouchAnswer(
+                user_id=user_id,
+                touch_content_id=touch_content_id,
+                touch_date=touch_date,
+                question_index=index,
+                answer_text=answer_text,
+            )
+            for index, answer_text in enumerate(answers)
+        ]
+        self.session.add_all(created_answers)
+        await self.session.commit()
+        return created_answers
+
+    async def get_by_user_and_content_and_date(
+        self,
+        user_id: int,
+        touch_content_id: int,
+        touch_date: date
+    ) -> List[TouchAnswer]:
+        """Получить все ответы пользователя на конкретное касание за конкретную дату."""
+        query = (
+            select(TouchAnswer)
+            .where(
+                TouchAnswer.user_id == user_id,
+                TouchAnswer.touch_content_id == touch_content_id,
+                TouchAnswer.touch_date == touch_date,
+                TouchAnswer.is_active == True
+            )
+            .order_by(TouchAnswer.question_index)
+        )
+        return list((await self.session.scalars(query)).all())
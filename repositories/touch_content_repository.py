@@ -1,15 +1,88 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, Iterable, Optional
 
-from sqlalchemy import select
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database.repository import BaseRepository
+from database.repository import AsyncBaseRepository, BaseRepository
 from models.course_day import CourseDay
 from models.touch_content import TouchContent
 
 
+def _for_day_stmt(touch_type: str, day_number: int) -> Select:
+    return (
+        select(TouchContent)
+        .join(CourseDay, TouchContent.course_day_id == CourseDay.id, isouter=True)
+        .where(
+            TouchContent.touch_type == touch_type,
+            TouchContent.is_active.is_(True),
+            CourseDay.day_number == day_number,
+            CourseDay.is_active.is_(True),
+        )
+        .order_by(
+            TouchContent.order_index.asc(),
+            TouchContent.updated_at.desc(),
+        )
+    )
+
+
+def _for_days_stmt(touch_type: str, day_numbers: set) -> Select:
+    return (
+        select(CourseDay.day_number, TouchContent)
+        .join(CourseDay, TouchContent.course_day_id == CourseDay.id)
+        .where(
+            TouchContent.touch_type == touch_type,
+            TouchContent.is_active.is_(True),
+            CourseDay.day_number.in_(day_numbers),
+            CourseDay.is_active.is_(True),
+        )
+        .order_by(
+            CourseDay.day_number.asc(),
+            TouchContent.order_index.asc(),
+            TouchContent.updated_at.desc(),
+        )
+    )
+
+
+def _default_stmt(touch_type: str) -> Select:
+    return (
+        select(TouchContent)
+        .where(
+            TouchContent.touch_type == touch_type,
+            TouchContent.is_active.is_(True),
+            TouchContent.course_day_id.is_(None),
+        )
+        .order_by(
+            TouchContent.order_index.asc(),
+            TouchContent.updated_at.desc(),
+        )
+    )
+
+
+def _any_active_stmt(touch_type: str) -> Select:
+    return (
+        select(TouchContent)
+        .where(
+            TouchContent.touch_type == touch_type,
+            TouchContent.is_active.is_(True),
+        )
+        .order_by(
+            TouchContent.order_index.asc(),
+            TouchContent.updated_at.desc(),
+        )
+    )
+
+
+def _first_per_day(rows) -> Dict[int, TouchContent]:
+    contents: Dict[int, TouchContent] = {}
+    for day_number, content in rows:
+        # Первая строка для дня — та же, что вернул бы get_for_day
+        contents.setdefault(day_number, content)
+    return contents
+
+
 class TouchContentRepository(BaseRepository[TouchContent]):
     """Репозиторий для работы с контентом касаний."""
 
@@ -17,50 +90,42 @@ class TouchContentRepository(BaseRepository[TouchContent]):
         super().__init__(TouchContent, session)
 
     def get_for_day(self, touch_type: str, day_number: int) -> Optional[TouchContent]:
-        stmt = (
-            select(TouchContent)
-            .join(CourseDay, TouchContent.course_day_id == CourseDay.id, isouter=True)
-            .where(
-                TouchContent.touch_type == touch_type,
-                TouchContent.is_active.is_(True),
-                CourseDay.day_number == day_number,
-                CourseDay.is_active.is_(True),
-            )
-            .order_by(
-                TouchContent.order_index.asc(),
-                TouchContent.updated_at.desc(),
-            )
-        )
-        return self.session.scalars(stmt).first()
+        return self.session.scalars(_for_day_stmt(touch_type, day_number)).first()
+
+    def get_for_days(self, touch_type: str, day_numbers: Iterable[int]) -> Dict[int, TouchContent]:
+        """Получить контент сразу для нескольких дней курса одним запросом (день -> контент)."""
+        numbers = set(day_numbers)
+        if not numbers:
+            return {}
+        return _first_per_day(self.session.execute(_for_days_stmt(touch_type, numbers)))
 
     def get_default(self, touch_type: str) -> Optional[TouchContent]:
-        stmt = (
-            select(TouchContent)
-            .where(
-                TouchContent.touch_type == touch_type,
-                TouchContent.is_active.is_(True),
-                TouchContent.course_day_id.is_(None),
-            )
-            .order_by(
-                TouchContent.order_index.asc(),
-                TouchContent.updated_at.desc(),
-            )
-        )
-        return self.session.scalars(stmt).first()
+        return self.session.scalars(_default_stmt(touch_type)).first()
     
     def get_any_active(self, touch_type: str) -> Optional[TouchContent]:
         """Получить любой активный контент для touch_type, если дефолтного нет."""
-        stmt = (
-            select(TouchContent)
-            .where(
-                TouchContent.touch_type == touch_type,
-                TouchContent.is_active.is_(True),
-            )
-            .order_by(
-                TouchContent.order_index.asc(),
-                TouchContent.updated_at.desc(),
-            )
-        )
-        return self.session.scalars(stmt).first()
+        return self.session.scalars(_any_active_stmt(touch_type)).first()
 
 
+class AsyncTouchContentRepository(AsyncBaseRepository[TouchContent]):
+    """Асинхронный репозиторий для работы с контентом касаний."""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(TouchContent, session)
+
+    async def get_for_day(self, touch_type: str, day_number: int) -> Optional[TouchContent]:
+        return (await self.session.scalars(_for_day_stmt(touch_type, day_number))).first()
+
+    async def get_for_days(self, touch_type: str, day_numbers: Iterable[int]) -> Dict[int, TouchContent]:
+        """Получить контент сразу для нескольких дней курса одним запросом (день -> контент)."""
+        numbers = set(day_numbers)
+        if not numbers:
+            return {}
+        return _first_per_day(await self.session.execute(_for_days_stmt(touch_type, numbers)))
+
+    async def get_default(self, touch_type: str) -> Optional[TouchContent]:
+        return (await self.session.scalars(_default_stmt(touch_type))).first()
+
+    async def get_any_active(self, touch_type: str) -> Optional[TouchContent]:
+        """Получить любой активный контент для touch_type, если дефолтного нет."""
+        return (await self.session.scalars(_any_active_stmt(touch_type))).first()
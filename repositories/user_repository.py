@@ -1,8 +1,15 @@
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from models.user import User
-from database.repository import BaseRepository
+from database.repository import AsyncBaseRepository, BaseRepository
+
+NOTIFICATION_TIME_FIELDS = {
+    "morning": "morning_notification_time",
+    "day": "day_notification_time",
+    "evening": "evening_notification_time",
+}
 
 
 class UserRepository(BaseRepository[User]):
@@ -33,12 +40,7 @@ class UserRepository(BaseRepository[User]):
         return user
 
     def set_notification_time(self, user: User, touch_type: str, value) -> User:
-        field_map = {
-            "morning": "morning_notification_time",
-            "day": "day_notification_time",
-            "evening": "evening_notification_time",
-        }
-        field = field_map.get(touch_type)
+        field = NOTIFICATION_TIME_FIELDS.get(touch_type)
         if not field:
             raise ValueError(f"Unknown touch type: {touch_type}")
         setattr(user, field, value)
@@ -47,3 +49,38 @@ class UserRepository(BaseRepository[User]):
         return user
 
 
+class AsyncUserRepository(AsyncBaseRepository[User]):
+    """Асинхронный репозиторий для работы с пользователями"""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(User, session)
+
+    async def get_by_telegram_id(self, telegram_id: int) -> Optional[User]:
+        """Получить пользователя по Telegram ID"""
+        query = select(User).where(User.telegram_id == telegram_id)
+        return await self.session.scalar(query)
+
+    async def get_or_create(self, telegram_id: int, **kwargs) -> User:
+        """Получить или создать пользователя"""
+        user = await self.get_by_telegram_id(telegram_id)
+        if not user:
+            user = await self.create(telegram_id=telegram_id, **kwargs)
+        else:
+            updated = False
+            for field, value in kwargs.items():
+                if value is not None and hasattr(user, field) and getattr(user, field) != value:
+                    setattr(user, field, value)
+                    updated = True
+            if updated:
+                await self.session.commit()
+                await self.session.refresh(user)
+        return user
+
+    async def set_notification_time(self, user: User, touch_type: str, value) -> User:
+        field = NOTIFICATION_TIME_FIELDS.get(touch_type)
+        if not field:
+            raise ValueError(f"Unknown touch type: {touch_type}")
+        setattr(user, field, value)
+        await self.session.commit()
+        await self.session.refresh(user)
+        return user
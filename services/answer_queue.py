@@ -0,0 +1,268 @@
+"""
+Очередь обработки ответов пользователей (голос → Whisper → Qwen) на Redis Streams.
+
+Хендлер только ставит задачу в поток answer_jobs и сразу освобождается; воркеры
+читают поток через consumer group, выполняют задачу и сами пишут результат в чат.
+Задача подтверждается (XACK) только после выполнения: если бот упал посреди
+работы, она остаётся в pending и забирается другим воркером через XAUTOCLAIM;
+выполняющаяся задача, сколько бы ни шли ретраи, раз в минуту продлевает себя
+(XCLAIM JUSTID) и брошенной не считается.
+Номер попытки хранится в Redis, поэтому падающая задача не повторяется бесконечно.
+
+Обработчики регистрируются декоратором answer_job(kind), число задач на одном
+этапе (whisper, qwen) ограничивается через job_stage().
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import socket
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from redis.exceptions import ResponseError
+
+from core.config import settings
+from core.redis_pool import get_redis
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "answer_jobs"
+GROUP_NAME = "answer_workers"
+ATTEMPTS_KEY = "answer_jobs:attempts"
+STREAM_MAXLEN = 10000
+READ_BLOCK_MS = 5000
+RETRY_BASE_DELAY = 5  # секунды; удваивается с каждой попыткой
+MONITOR_INTERVAL = 60  # период логирования глубины очереди и поиска брошенных задач
+CLAIM_REFRESH_INTERVAL = 60  # как часто выполняющаяся задача подтверждает, что она не брошена
+
+JobHandler = Callable[[Bot, Dict[str, Any]], Awaitable[None]]
+# Вызывается, когда попытки исчерпаны; исключения нет, если задача не пережила падение воркера
+FailureHandler = Callable[[Bot, Dict[str, Any], Optional[BaseException]], Awaitable[None]]
+
+_handlers: Dict[str, Tuple[JobHandler, Optional[FailureHandler]]] = {}
+_stage_semaphores: Dict[str, asyncio.Semaphore] = {}
+_tasks: List[asyncio.Task] = []
+# Брошенные задачи, забранные монитором: выполняются отдельно, чтобы монитор оставался периодическим
+_reclaimed_tasks: Set[asyncio.Task] = set()
+# Имя потребителя стабильно между перезапусками: после рестарта воркер сначала дорабатывает свои задачи
+_consumer_prefix = socket.gethostname()
+
+
+def answer_job(kind: str, on_failure: Optional[FailureHandler] = None) -> Callable[[JobHandler], JobHandler]:
+    """Декоратор: зарегистрировать обработчик задач типа kind."""
+    def decorator(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = (handler, on_failure)
+        return handler
+    return decorator
+
+
+def _stage_limit(stage: str) -> int:
+    limits = {
+        "whisper": settings.answer_queue_whisper_concurrency,
+        "qwen": settings.answer_queue_qwen_concurrency,
+    }
+    return max(1, limits[stage])
+
+
+@asynccontextmanager
+async def job_stage(stage: str) -> AsyncIterator[None]:
+    """Ограничить число задач, одновременно выполняющих этап stage (whisper или qwen)."""
+    semaphore = _stage_semaphores.get(stage)
+    if semaphore is None:
+        semaphore = _stage_semaphores[stage] = asyncio.Semaphore(_stage_limit(stage))
+    async with semaphore:
+        yield
+
+
+async def enqueue_answer_job(kind: str, telegram_id: Optional[int] = None, **payload: Any) -> str:
+    """Поставить задачу в очередь (telegram_id=None — фоновая задача без пользователя). Возвращает id записи в потоке."""
+    if kind not in _handlers:
+        raise ValueError(f"Неизвестный тип задачи: {kind}")
+    job = {"kind": kind, "telegram_id": telegram_id, **payload}
+    entry_id = await get_redis().xadd(
+        STREAM_KEY,
+        {"job": json.dumps(job, ensure_ascii=False)},
+        maxlen=STREAM_MAXLEN,
+        approximate=True,
+    )
+    if telegram_id is None:
+        logger.info("[ANSWER_QUEUE] Фоновая задача %s (%s) поставлена в очередь", entry_id, kind)
+    else:
+        logger.info("[ANSWER_QUEUE] Задача %s (%s) для пользователя %s поставлена в очередь", entry_id, kind, telegram_id)
+    return entry_id
+
+
+async def queue_depth() -> Dict[str, int]:
+    """Глубина очереди: задачи, ожидающие воркера, и задачи в работе."""
+    redis_client = get_redis()
+    total = await redis_client.xlen(STREAM_KEY)
+    try:
+        in_progress = (await redis_client.xpending(STREAM_KEY, GROUP_NAME))["pending"]
+    except ResponseError:
+        # Группа ещё не создана — воркеры не запускались
+        in_progress = 0
+    return {"queued": max(0, total - in_progress), "in_progress": in_progress}
+
+
+async def _ensure_group() -> None:
+    try:
+        await get_redis().xgroup_create(STREAM_KEY, GROUP_NAME, id="0", mkstream=True)
+    except ResponseError as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+async def _finish(entry_id: str) -> None:
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.xack(STREAM_KEY, GROUP_NAME, entry_id)
+        pipe.xdel(STREAM_KEY, entry_id)
+        pipe.hdel(ATTEMPTS_KEY, entry_id)
+        await pipe.execute()
+
+
+async def _fail(bot: Bot, job: Dict[str, Any], on_failure: Optional[FailureHandler], exc: Optional[BaseException]) -> None:
+    if on_failure is None:
+        return
+    try:
+        await on_failure(bot, job, exc)
+    except Exception as notify_exc:  # pylint: disable=broad-except
+        logger.error("[ANSWER_QUEUE] Ошибка в обработчике неудачи задачи %s: %s", job.get("kind"), notify_exc, exc_info=True)
+
+
+async def _keep_claimed(entry_id: str, consumer: str) -> None:
+    """
+    Пока задача выполняется, обновлять время её последней доставки (XCLAIM JUSTID):
+    иначе долгую задачу (ретраи Whisper и Qwen) монитор счёл бы брошенной и выполнил повторно.
+    """
+    interval = max(1, min(CLAIM_REFRESH_INTERVAL, settings.answer_queue_claim_idle // 3))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await get_redis().xclaim(STREAM_KEY, GROUP_NAME, consumer, 0, [entry_id], justid=True)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("[ANSWER_QUEUE] Не удалось продлить задачу %s: %s", entry_id, exc)
+
+
+async def _run_job(bot: Bot, entry_id: str, fields: Optional[Dict[str, str]], consumer: str) -> None:
+    try:
+        job = json.loads(fields["job"])
+        handler, on_failure = _handlers[job["kind"]]
+    except (KeyError, TypeError, ValueError) as exc:
+        logger.error("[ANSWER_QUEUE] Некорректная задача %s, пропускаем: %s", entry_id, exc)
+        await _finish(entry_id)
+        return
+
+    max_attempts = max(1, settings.answer_queue_max_attempts)
+    redis_client = get_redis()
+    heartbeat = asyncio.create_task(_keep_claimed(entry_id, consumer))
+    try:
+        while True:
+            attempt = await redis_client.hincrby(ATTEMPTS_KEY, entry_id, 1)
+            if attempt > max_attempts:
+                # Задача исчерпала попытки, падая вместе с воркером
+                logger.error("[ANSWER_QUEUE] Задача %s (%s) не завершилась за %s попыток", entry_id, job["kind"], max_attempts)
+                await _fail(bot, job, on_failure, None)
+                break
+            try:
+                await handler(bot, job)
+                break
+            except Exception as exc:  # pylint: disable=broad-except
+                if attempt >= max_attempts:
+                    logger.error(
+                        "[ANSWER_QUEUE] Задача %s (%s) не выполнена за %s попыток: %s",
+                        entry_id, job["kind"], attempt, exc, exc_info=True,
+                    )
+                    await _fail(bot, job, on_failure, exc)
+                    break
+                delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+                logger.warning(
+                    "[ANSWER_QUEUE] Задача %s (%s), попытка %s/%s не удалась: %s. Повтор через %s с",
+                    entry_id, job["kind"], attempt, max_attempts, exc, delay,
+                )
+                await asyncio.sleep(delay)
+    finally:
+        heartbeat.cancel()
+    await _finish(entry_id)
+
+
+async def _worker(bot: Bot, consumer: str) -> None:
+    # "0" — сначала свои задачи, не подтверждённые до перезапуска, затем ">" — новые
+    read_id = "0"
+    while True:
+        try:
+            response = await get_redis().xreadgroup(
+                GROUP_NAME, consumer, {STREAM_KEY: read_id}, count=1, block=READ_BLOCK_MS
+            )
+            entries = response[0][1] if response else []
+            if read_id == "0" and not entries:
+                read_id = ">"
+                continue
+            for entry_id, fields in entries:
+                await _run_job(bot, entry_id, fields, consumer)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("[ANSWER_QUEUE] Воркер %s: ошибка чтения очереди: %s", consumer, exc)
+            await asyncio.sleep(RETRY_BASE_DELAY)
+
+
+async def _run_reclaimed(bot: Bot, entry_id: str, fields: Optional[Dict[str, str]], consumer: str) -> None:
+    try:
+        await _run_job(bot, entry_id, fields, consumer)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("[ANSWER_QUEUE] Ошибка повторного выполнения задачи %s: %s", entry_id, exc)
+
+
+async def _monitor(bot: Bot) -> None:
+    """
+    Логирует глубину очереди и забирает задачи, брошенные остановившимися воркерами.
+
+    Забранные задачи выполняются фоновыми задачами, одновременно не больше answer_queue_workers;
+    пока все места заняты, новые брошенные задачи остаются в pending до следующего прохода.
+    """
+    consumer = f"{_consumer_prefix}-reclaim"
+    min_idle_ms = settings.answer_queue_claim_idle * 1000
+    while True:
+        await asyncio.sleep(MONITOR_INTERVAL)
+        try:
+            depth = await queue_depth()
+            if depth["queued"] or depth["in_progress"]:
+                logger.info("[ANSWER_QUEUE] В очереди: %s, в работе: %s", depth["queued"], depth["in_progress"])
+
+            free = max(1, settings.answer_queue_workers) - len(_reclaimed_tasks)
+            if free <= 0:
+                continue
+            claimed = await get_redis().xautoclaim(
+                STREAM_KEY, GROUP_NAME, consumer, min_idle_time=min_idle_ms, count=free
+            )
+            for entry_id, fields in claimed[1]:
+                logger.warning("[ANSWER_QUEUE] Задача %s брошена воркером, выполняем повторно", entry_id)
+                task = asyncio.create_task(_run_reclaimed(bot, entry_id, fields, consumer), name=f"answer-reclaim-{entry_id}")
+                _reclaimed_tasks.add(task)
+                task.add_done_callback(_reclaimed_tasks.discard)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("[ANSWER_QUEUE] Ошибка мониторинга очереди: %s", exc)
+
+
+async def start_answer_workers(bot: Bot) -> None:
+    """Запустить воркеры очереди ответов (при старте бота, после импорта хендлеров)."""
+    await _ensure_group()
+    for index in range(max(1, settings.answer_queue_workers)):
+        consumer = f"{_consumer_prefix}-{index}"
+        _tasks.append(asyncio.create_task(_worker(bot, consumer), name=f"answer-worker-{index}"))
+    _tasks.append(asyncio.create_task(_monitor(bot), name="answer-queue-monitor"))
+    logger.info(
+        "[ANSWER_QUEUE] Запущено воркеров: %s (whisper: %s, qwen: %s одновременно)",
+        settings.answer_queue_workers, _stage_limit("whisper"), _stage_limit("qwen"),
+    )
+
+
+async def stop_answer_workers() -> None:
+    """Остановить воркеры. Незавершённые задачи остаются в pending и доработаются после перезапуска."""
+    tasks = [*_tasks, *_reclaimed_tasks]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _tasks.clear()
+    _reclaimed_tasks.clear()
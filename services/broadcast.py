@@ -0,0 +1,161 @@
+"""
+Потоковая рассылка с ограниченной конкурентностью.
+
+Продюсер читает получателей из БД порциями (keyset-пагинация по User.id) и кладёт
+их в ограниченную очередь, фиксированный пул воркеров отправляет сообщения.
+Как только порция полностью обработана, вызывается on_chunk_done — там фиксируются
+отметки об отправке, так что падение посреди рассылки не теряет уже отправленное.
+Прогресс и скорость периодически пишутся в лог.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RowT = TypeVar("RowT", bound=Sequence[Any])
+ResultT = TypeVar("ResultT")
+
+# (id последнего пользователя предыдущей порции, размер порции) -> строки, отсортированные по id; row[0] — User.id
+FetchChunk = Callable[[int, int], Awaitable[List[RowT]]]
+
+
+class BroadcastStats:
+    """Счётчики рассылки, обновляются по ходу отправки."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.monotonic()
+        self.queued = 0
+        self.processed = 0
+        self.sent = 0
+        self.failed = 0
+        self.chunks_committed = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def rate(self) -> float:
+        """Обработано пользователей в секунду."""
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def log_progress(self, final: bool = False) -> None:
+        logger.info(
+            "[BROADCAST] %s: %s обработано %s (отправлено %s, не отправлено %s), порций зафиксировано %s, "
+            "%.1f польз/с, прошло %.1f с",
+            self.name,
+            "итого" if final else "в процессе,",
+            self.processed,
+            self.sent,
+            self.failed,
+            self.chunks_committed,
+            self.rate,
+            self.elapsed,
+        )
+
+
+class _Chunk(Generic[RowT, ResultT]):
+    """Порция получателей: ждёт, пока все её строки будут обработаны."""
+
+    def __init__(self, size: int):
+        self.remaining = size
+        self.results: List[Tuple[RowT, ResultT]] = []
+
+
+async def run_broadcast(
+    name: str,
+    fetch_chunk: FetchChunk,
+    send: Callable[[RowT], Awaitable[ResultT]],
+    on_chunk_done: Optional[Callable[[List[Tuple[RowT, ResultT]]], Awaitable[None]]] = None,
+    *,
+    concurrency: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> BroadcastStats:
+    """
+    Разослать сообщения всем получателям, которых отдаёт fetch_chunk.
+
+    fetch_chunk и on_chunk_done — корутины (работа с БД через AsyncSessionLocal).
+    send возвращает результат для получателя; «истинный» результат считается успешной
+    отправкой, и только такие строки (с результатом) попадают в on_chunk_done.
+    Исключение из send считается ошибкой и не останавливает рассылку.
+    """
+    concurrency = concurrency or settings.broadcast_concurrency
+    chunk_size = chunk_size or settings.broadcast_chunk_size
+    stats = BroadcastStats(name)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def produce() -> None:
+        last_id = 0
+        while True:
+            rows = await fetch_chunk(last_id, chunk_size)
+            if not rows:
+                break
+            chunk: _Chunk = _Chunk(len(rows))
+            for row in rows:
+                await queue.put((chunk, row))
+                stats.queued += 1
+            last_id = rows[-1][0]
+            if len(rows) < chunk_size:
+                break
+
+    async def finish_chunk(chunk: _Chunk) -> None:
+        if on_chunk_done is not None:
+            try:
+                await on_chunk_done(chunk.results)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error("[BROADCAST] %s: не удалось зафиксировать порцию: %s", name, exc, exc_info=True)
+                return
+        stats.chunks_committed += 1
+
+    async def work() -> None:
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                chunk, row = item
+                try:
+                    result = await send(row)
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.warning("[BROADCAST] %s: ошибка отправки пользователю %s: %s", name, row[0], exc)
+                    result = None
+                stats.processed += 1
+                if result:
+                    stats.sent += 1
+                    chunk.results.append((row, result))
+                else:
+                    stats.failed += 1
+                chunk.remaining -= 1
+                if chunk.remaining == 0:
+                    await finish_chunk(chunk)
+            finally:
+                queue.task_done()
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(settings.broadcast_progress_interval)
+            stats.log_progress()
+
+    workers = [asyncio.create_task(work()) for _ in range(concurrency)]
+    reporter = asyncio.create_task(report())
+    try:
+        await produce()
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers, return_exceptions=True)
+        reporter.cancel()
+
+    if stats.processed:
+        stats.log_progress(final=True)
+    else:
+        logger.debug("[BROADCAST] %s: нет получателей", name)
+    return stats
@@ -1,28 +1,23 @@
 from __future__ import annotations
 
-import asyncio
 import logging
-from datetime import date, datetime, time
-from typing import List, Optional, Tuple
-from zoneinfo import ZoneInfo
+from datetime import datetime, time
+from typing import Iterable, Optional
 
 from pathlib import Path
 
 from aiogram import Bot
-from aiogram.types import FSInputFile
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardMarkup
-from sqlalchemy import Select, func, or_, select, update
-import redis
-import json
+from sqlalchemy import ColumnElement, Update, and_, or_, update
 
 # from core.config import settings
+from core.fsm_storage import get_user_state
 from core.texts import TEXTS
-from database.session import SessionLocal
 from models.touch_content import TouchContent
 from models.user import User
-from repositories.touch_content_repository import TouchContentRepository
-from services.touch_utils import calculate_course_day, fetch_touch_content
+from services.touch_utils import notification_time_expression
+from services.video_cache import send_touch_video
 from core.states import EveningRatingStates
 
 logger = logging.getLogger(__name__)
@@ -32,125 +27,39 @@ ACTIVE_SUBSCRIPTION_TYPES = {"trial", "paid"}
 DEFAULT_EVENING_TIME = time(hour=21, minute=0)
 
 
-def _build_users_query(for_date: date) -> Select[Tuple[int, int, Optional[time]]]:
-    """Сформировать запрос на выборку пользователей для вечернего касания."""
-    return (
-        select(User.id, User.telegram_id, User.evening_notification_time)
-        .where(User.subscription_type.in_(ACTIVE_SUBSCRIPTION_TYPES))
-        .where(
-            or_(
-                User.evening_touch_sent_at.is_(None),
-                func.date(User.evening_touch_sent_at) < for_date,
-            )
-        )
+def _build_due_condition(day_start: datetime, target_time: time) -> ColumnElement[bool]:
+    """Условие: вечернее касание положено пользователю в target_time и сегодня ещё не отправлялось."""
+    return and_(
+        User.subscription_type.in_(ACTIVE_SUBSCRIPTION_TYPES),
+        notification_time_expression(User.evening_notification_time, DEFAULT_EVENING_TIME) == target_time,
+        or_(
+            User.evening_touch_sent_at.is_(None),
+            User.evening_touch_sent_at < day_start,
+        ),
     )
 
 
-def _fetch_users(for_date: date) -> List[Tuple[int, int, Optional[time]]]:
-    with SessionLocal() as session:
-        stmt = _build_users_query(for_date)
-        result = session.execute(stmt)
-        return list(result.all())
-
-
-def _mark_users_sent(user_ids: List[int], sent_at: datetime) -> None:
-    """Отметить пользователей как получивших вечернее касание."""
-    if not user_ids:
-        return
-
-    with SessionLocal() as session:
-        stmt = (
-            update(User)
-            .where(User.id.in_(user_ids))
-            .values(evening_touch_sent_at=sent_at)
-        )
-        session.execute(stmt)
-        session.commit()
-
-
-async def send_evening_touch(bot: Bot) -> None:
-    """Отправить вечернее сообщение всем активным подписчикам."""
-    try:
-        tz = ZoneInfo("Europe/Moscow")
-        now = datetime.now(tz=tz)
-        target_date = now.date()
-        
-        # Получаем bot_id один раз (с обработкой сетевых ошибок)
-        try:
-            bot_info = await bot.get_me()
-            bot_id = bot_info.id
-        except Exception as e:
-            logger.error("Не удалось получить bot_id (сетевые проблемы): %s", e)
-            return
-
-        users = await asyncio.to_thread(_fetch_users, target_date)
-        if not users:
-            logger.info("Вечернее касание: нет пользователей для отправки")
-            return
-
-        logger.info("Вечернее касание: отправляем %s пользователям", len(users))
-
-        target_time = now.time().replace(second=0, microsecond=0)
-
-        # Фильтруем пользователей по времени
-        filtered_users = [
-            (user_id, telegram_id)
-            for user_id, telegram_id, user_time in users
-            if (user_time or DEFAULT_EVENING_TIME) == target_time
-        ]
-
-        if not filtered_users:
-            logger.info("Вечернее касание: нет пользователей для отправки в это время")
-            return
-
-        logger.info("Вечернее касание: отправляем %s пользователям (после фильтрации по времени)", len(filtered_users))
-
-        async def send_to_user(user_id: int, telegram_id: int) -> bool:
-            """Отправить сообщение одному пользователю."""
-            try:
-                content = await asyncio.to_thread(
-                    _get_content_for_user,
-                    user_id,
-                    now.date(),
-                )
-
-                if not content:
-                    logger.warning("Нет контента для вечернего касания (user %s)", user_id)
-                    return False
+def _build_mark_sent_stmt(user_ids: Iterable[int], sent_at: datetime) -> Update:
+    """UPDATE, отмечающий пользователей как получивших вечернее касание."""
+    return (
+        update(User)
+        .where(User.id.in_(list(user_ids)))
+        .values(evening_touch_sent_at=sent_at)
+    )
 
-                # Отправляем видео или описание
-                await _send_evening_content(bot, telegram_id, content)
-                
-                # Отправляем первый вопрос оценки
-                await _send_first_rating_question(bot, telegram_id, bot_id=bot_id, touch_content_id=content.id)
-                
-                return True
-            except Exception as exc:  # pylint: disable=broad-except
-                logger.warning("Не удалось отправить вечернее сообщение %s: %s", telegram_id, exc)
-                return False
 
-        # Создаем задачи для параллельной отправки (limited-aiogram автоматически контролирует лимиты)
-        sent_user_ids: List[int] = []
-        tasks = []
-        
-        for user_id, telegram_id in filtered_users:
-            # Создаем задачу для отправки
-            task = asyncio.create_task(send_to_user(user_id, telegram_id))
-            tasks.append((user_id, task))
+async def deliver_evening_touch(bot: Bot, telegram_id: int, content: Optional[TouchContent], bot_id: int) -> bool:
+    """Стратегия диспетчера: отправить вечернее касание и первый вопрос оценки одному пользователю."""
+    if not content:
+        logger.warning("Нет контента для вечернего касания (telegram_id %s)", telegram_id)
+        return False
 
-        # Ждем завершения всех задач параллельно
-        results = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
-        
-        for (user_id, _), result in zip(tasks, results):
-            if isinstance(result, Exception):
-                logger.warning("Ошибка при отправке пользователю %s: %s", user_id, result)
-            elif result is True:
-                sent_user_ids.append(user_id)
+    # Отправляем видео или описание
+    await _send_evening_content(bot, telegram_id, content)
 
-        await asyncio.to_thread(_mark_users_sent, sent_user_ids, now)
-        logger.info("Вечернее касание: отправлено %s сообщений", len(sent_user_ids))
-    except Exception as exc:
-        logger.error("Критическая ошибка в send_evening_touch: %s", exc, exc_info=True)
+    # Отправляем первый вопрос оценки
+    await _send_first_rating_question(bot, telegram_id, bot_id=bot_id, touch_content_id=content.id)
+    return True
 
 
 async def _send_evening_content(bot: Bot, telegram_id: int, content: TouchContent) -> None:
@@ -162,11 +71,7 @@ async def _send_evening_content(bot: Bot, telegram_id: int, content: TouchConten
     if video_file_path:
         file_path = Path("media") / video_file_path
         if file_path.exists():
-            await bot.send_video(
-                telegram_id,
-                FSInputFile(file_path),
-                caption=caption,
-            )
+            await send_touch_video(bot, telegram_id, content.id, file_path, caption=caption)
             return
         else:
             logger.warning("Файл видео касания не найден: %s", file_path)
@@ -219,25 +124,10 @@ async def _send_first_rating_question(bot: Bot, telegram_id: int, bot_id: int =
     question_text = "По шкале от 1 до 10 оцени свой уровень энергии в течение дня"
     await bot.send_message(telegram_id, question_text, reply_markup=keyboard)
     
-    # Сохраняем состояние в Redis
-    from core.config import settings
-    
-    redis_client = redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        password=settings.redis_password,
-        db=settings.redis_db,
-        decode_responses=True
-    )
-    
-    state_key = f"fsm:{bot_id}:{telegram_id}:state"
-    data_key = f"fsm:{bot_id}:{telegram_id}:data"
-    
-    # Сохраняем состояние
-    redis_client.set(state_key, "EveningRatingStates:rating_energy", ex=3600)  # 1 час
-    
-    # Сохраняем данные (включая touch_content_id для последующей отправки вопросов)
-    redis_data = {
+    # Сохраняем состояние и данные (включая touch_content_id для последующей отправки вопросов)
+    user_state = get_user_state(bot_id, telegram_id)
+    await user_state.set_state(EveningRatingStates.rating_energy)
+    await user_state.set_data({
         "touch_content_id": touch_content_id,
         "rating_energy": None,
         "rating_happiness": None,
@@ -245,17 +135,5 @@ async def _send_first_rating_question(bot: Bot, telegram_id: int, bot_id: int =
         "rating_question_4": None,
         "rating_question_5": None,
         "current_question": 1
-    }
-    redis_client.set(data_key, json.dumps(redis_data), ex=3600)
-
-
-def _get_content_for_user(user_id: int, for_date: date) -> Optional[TouchContent]:
-    with SessionLocal() as session:
-        repo = TouchContentRepository(session)
-        user = session.get(User, user_id)
-        if not user:
-            return repo.get_default("evening")
-        course_day = calculate_course_day(user, for_date)
-        return fetch_touch_content(repo, touch_type="evening", course_day=course_day)
-
+    })
 
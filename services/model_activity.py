@@ -0,0 +1,101 @@
+"""
+Учёт обращений к моделям Cloud.ru (Qwen, Whisper).
+
+Каждый успешный вызов модели проходит через track_model_call(): планировщик
+прогрева (services/warmup_planner.py) видит, когда модель последний раз работала
+и идут ли реальные запросы. По простою перед вызовом запрос считается «холодным»
+(serverless-модель, скорее всего, уже выгружена) или «тёплым». Вызовы прогрева
+выполняются внутри warmup_calls() и в статистику попаданий не входят.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_warmup_call: ContextVar[bool] = ContextVar("warmup_call", default=False)
+
+
+class ModelActivity:
+    """Время последних вызовов модели и счётчики холодных/тёплых попаданий."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.last_call_at: Optional[float] = None  # любой успешный вызов, включая прогрев (monotonic)
+        self.last_real_call_at: Optional[float] = None  # только запросы пользователей
+        self.cold_hits = 0
+        self.warm_hits = 0
+
+    def idle_seconds(self) -> Optional[float]:
+        """Сколько модель простаивает; None — с запуска бота ещё не вызывалась."""
+        if self.last_call_at is None:
+            return None
+        return time.monotonic() - self.last_call_at
+
+    def real_idle_seconds(self) -> Optional[float]:
+        if self.last_real_call_at is None:
+            return None
+        return time.monotonic() - self.last_real_call_at
+
+    def record(self, idle_before: Optional[float], duration: float, warmup: bool) -> None:
+        now = time.monotonic()
+        self.last_call_at = now
+        if warmup:
+            return
+        self.last_real_call_at = now
+        if idle_before is None or idle_before > settings.warmup_cold_after_idle:
+            self.cold_hits += 1
+            idle_text = "с запуска бота" if idle_before is None else f"{idle_before / 60:.0f} мин"
+            logger.warning(
+                "[WARMUP] Холодный вызов %s: простой %s, ответ за %.1f с",
+                self.name, idle_text, duration,
+            )
+        else:
+            self.warm_hits += 1
+
+    def pop_hits(self) -> Tuple[int, int]:
+        """(тёплые, холодные) попадания с прошлого вызова."""
+        hits = (self.warm_hits, self.cold_hits)
+        self.warm_hits = self.cold_hits = 0
+        return hits
+
+
+_models: Dict[str, ModelActivity] = {}
+
+
+def get_model_activity(name: str) -> ModelActivity:
+    activity = _models.get(name)
+    if activity is None:
+        activity = _models[name] = ModelActivity(name)
+    return activity
+
+
+@asynccontextmanager
+async def track_model_call(name: str) -> AsyncIterator[None]:
+    """Отметить вызов модели name; при исключении вызов не учитывается."""
+    activity = get_model_activity(name)
+    idle_before = activity.idle_seconds()
+    started = time.monotonic()
+    yield
+    activity.record(idle_before, time.monotonic() - started, _warmup_call.get())
+
+
+def is_warmup_call() -> bool:
+    """Выполняется ли текущий вызов модели внутри warmup_calls()."""
+    return _warmup_call.get()
+
+
+@contextmanager
+def warmup_calls() -> Iterator[None]:
+    """Вызовы моделей внутри блока — прогрев, а не запросы пользователей."""
+    token = _warmup_call.set(True)
+    try:
+        yield
+    finally:
+        _warmup_call.reset(token)
@@ -0,0 +1,145 @@
+"""
+Приоритетный планировщик вызовов моделей Qwen и Whisper.
+
+Ответы пользователей, фоновые задачи (рубрики вопросов) и прогрев делят одну
+ёмкость модели. Каждый вызов занимает слот планировщика своей модели в одной из
+полос: interactive (пользователь ждёт ответа) > background > keepalive (прогрев).
+Освободившийся слот достаётся первому ожидающему из самой приоритетной полосы;
+у фоновых полос свой предел одновременных вызовов, так что всю ёмкость они не
+занимают. Если интерактивному вызову приходится ждать, стоящие в очереди вызовы
+прогрева снимаются (ModelCallPreempted): модель и так греют реальные запросы.
+
+Полоса берётся из контекста: внутри warmup_calls() — keepalive, внутри
+model_lane(LANE_BACKGROUND) — background, иначе interactive.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from core.config import settings
+from services.model_activity import is_warmup_call
+
+logger = logging.getLogger(__name__)
+
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+LANE_KEEPALIVE = "keepalive"
+LANES = (LANE_INTERACTIVE, LANE_BACKGROUND, LANE_KEEPALIVE)  # по убыванию приоритета
+SLOW_WAIT_LOG_SECONDS = 1.0
+
+_lane: ContextVar[Optional[str]] = ContextVar("model_lane", default=None)
+
+
+class ModelCallPreempted(RuntimeError):
+    """Вызов снят из очереди планировщика ради вызова с более высоким приоритетом."""
+
+
+@contextmanager
+def model_lane(lane: str) -> Iterator[None]:
+    """Вызовы моделей внутри блока идут в полосе lane."""
+    if lane not in LANES:
+        raise ValueError(f"Неизвестная полоса вызовов моделей: {lane}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    """Полоса текущего вызова модели."""
+    if is_warmup_call():
+        return LANE_KEEPALIVE
+    return _lane.get() or LANE_INTERACTIVE
+
+
+def lane_limits() -> Dict[str, int]:
+    """Пределы одновременных вызовов фоновых полос (одинаковые для всех моделей)."""
+    return {
+        LANE_BACKGROUND: settings.model_background_concurrency,
+        LANE_KEEPALIVE: settings.model_keepalive_concurrency,
+    }
+
+
+class PriorityScheduler:
+    """Слоты вызовов одной модели: общий предел capacity и пределы по полосам."""
+
+    def __init__(self, name: str, capacity: int, limits: Optional[Dict[str, int]] = None):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.lane_limits = {lane: self.capacity for lane in LANES}
+        for lane, limit in (limits or {}).items():
+            self.lane_limits[lane] = max(1, min(limit, self.capacity))
+        self._running = 0
+        self._lane_running: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+
+    def _dispatch(self) -> None:
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and self._running < self.capacity and self._lane_running[lane] < self.lane_limits[lane]:
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue  # ожидающий отменён или снят
+                waiter.set_result(None)
+                self._running += 1
+                self._lane_running[lane] += 1
+
+    def _preempt_keepalive(self) -> None:
+        queue = self._queues[LANE_KEEPALIVE]
+        dropped = 0
+        while queue:
+            waiter = queue.popleft()
+            if not waiter.done():
+                waiter.set_exception(ModelCallPreempted(f"{self.name}: прогрев снят ради запроса пользователя"))
+                dropped += 1
+        if dropped:
+            logger.info("[MODEL_SCHED] %s: из очереди снято вызовов прогрева — %s", self.name, dropped)
+
+    def _release(self, lane: str) -> None:
+        self._running -= 1
+        self._lane_running[lane] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: Optional[str] = None) -> AsyncIterator[None]:
+        """Дождаться слота в полосе lane (по умолчанию — из контекста) и занять его на время блока."""
+        lane = lane or current_lane()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[lane].append(waiter)
+        self._dispatch()
+        if not waiter.done() and lane == LANE_INTERACTIVE:
+            self._preempt_keepalive()
+
+        started = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Слот мог быть выдан в момент отмены — тогда его нужно вернуть
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._release(lane)
+            raise
+        waited = time.monotonic() - started
+        if waited >= SLOW_WAIT_LOG_SECONDS:
+            logger.info("[MODEL_SCHED] %s: вызов %s ждал слот %.1f с", self.name, lane, waited)
+
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Выполняющиеся и ожидающие вызовы по полосам."""
+        return {
+            lane: {
+                "running": self._lane_running[lane],
+                "queued": sum(1 for waiter in self._queues[lane] if not waiter.done()),
+            }
+            for lane in LANES
+        }
@@ -2,49 +2,53 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import date, datetime, time
+from datetime import datetime, time
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple
-from zoneinfo import ZoneInfo
+from typing import Iterable, Optional, Set
 
 from aiogram import Bot
-from aiogram.types import FSInputFile
-from sqlalchemy import Select, func, or_, select, update
+from sqlalchemy import ColumnElement, Update, and_, or_, update
 
 # from core.config import settings
+from core.fsm_storage import get_user_state
+from core.states import TouchQuestionStates
 from core.texts import TEXTS
 from database.session import SessionLocal
 from models.touch_content import TouchContent
 from models.user import User
-from repositories.touch_content_repository import TouchContentRepository
-from services.touch_utils import calculate_course_day, fetch_touch_content
+from services.touch_utils import notification_time_expression
+from services.video_cache import send_touch_video
 
 logger = logging.getLogger(__name__)
 
 MORNING_TOUCH_TEXT_KEY = "touch_8_1_morning_prompt"
 ACTIVE_SUBSCRIPTION_TYPES = {"trial", "paid"}
 DEFAULT_MORNING_TIME = time(hour=9, minute=0)
+FIRST_QUESTION_DELAY = 5  # секунды между материалами касания и первым вопросом
 
+# Отложенные отправки первого вопроса: держим ссылки, чтобы задачи не собрал GC
+_pending_first_questions: Set[asyncio.Task] = set()
 
-def _build_users_query(for_date: date) -> Select[Tuple[int, int, Optional[time]]]:
-    """Сформировать запрос на выборку пользователей для утреннего касания."""
-    return (
-        select(User.id, User.telegram_id, User.morning_notification_time)
-        .where(User.subscription_type.in_(ACTIVE_SUBSCRIPTION_TYPES))
-        .where(
-            or_(
-                User.morning_touch_sent_at.is_(None),
-                func.date(User.morning_touch_sent_at) < for_date,
-            )
-        )
+
+def _build_due_condition(day_start: datetime, target_time: time) -> ColumnElement[bool]:
+    """Условие: утреннее касание положено пользователю в target_time и сегодня ещё не отправлялось."""
+    return and_(
+        User.subscription_type.in_(ACTIVE_SUBSCRIPTION_TYPES),
+        notification_time_expression(User.morning_notification_time, DEFAULT_MORNING_TIME) == target_time,
+        or_(
+            User.morning_touch_sent_at.is_(None),
+            User.morning_touch_sent_at < day_start,
+        ),
     )
 
 
-def _fetch_users(for_date: date) -> List[Tuple[int, int, Optional[time]]]:
-    with SessionLocal() as session:
-        stmt = _build_users_query(for_date)
-        result = session.execute(stmt)
-        return list(result.all())
+def _build_mark_sent_stmt(user_ids: Iterable[int], sent_at: datetime) -> Update:
+    """UPDATE, отмечающий пользователей как получивших утреннее касание."""
+    return (
+        update(User)
+        .where(User.id.in_(list(user_ids)))
+        .values(morning_touch_sent_at=sent_at)
+    )
 
 
 def _mark_users_sent(user_ids: Iterable[int], sent_at: datetime) -> None:
@@ -53,101 +57,31 @@ def _mark_users_sent(user_ids: Iterable[int], sent_at: datetime) -> None:
         return
 
     with SessionLocal() as session:
-        stmt = (
-            update(User)
-            .where(User.id.in_(ids))
-            .values(morning_touch_sent_at=sent_at)
-        )
-        session.execute(stmt)
+        session.execute(_build_mark_sent_stmt(ids, sent_at))
         session.commit()
 
 
-async def send_morning_touch(bot: Bot) -> None:
-    """Отправить утреннее сообщение всем активным подписчикам."""
-    try:
-        tz = ZoneInfo("Europe/Moscow")
-        now = datetime.now(tz=tz)
-        target_date = now.date()
-
-        # Получаем bot_id один раз (с обработкой сетевых ошибок)
-        try:
-            bot_info = await bot.get_me()
-            bot_id = bot_info.id
-        except Exception as e:
-            logger.error("Не удалось получить bot_id (сетевые проблемы): %s", e)
-            return
-
-        users = await asyncio.to_thread(_fetch_users, target_date)
-        if not users:
-            logger.info("Утреннее касание: нет пользователей для отправки")
-            return
-
-        logger.info("Утреннее касание: отправляем %s пользователям", len(users))
-
-        target_time = now.time().replace(second=0, microsecond=0)
-
-        # Фильтруем пользователей по времени
-        filtered_users = [
-            (user_id, telegram_id)
-            for user_id, telegram_id, user_time in users
-            if (user_time or DEFAULT_MORNING_TIME) == target_time
-        ]
-
-        if not filtered_users:
-            logger.info("Утреннее касание: нет пользователей для отправки в это время")
-            return
-
-        logger.info("Утреннее касание: отправляем %s пользователям (после фильтрации по времени)", len(filtered_users))
-
-        async def send_to_user(user_id: int, telegram_id: int) -> bool:
-            """Отправить сообщение одному пользователю."""
-            try:
-                content = await asyncio.to_thread(
-                    _get_content_for_user,
-                    user_id,
-                    now.date(),
-                )
-
-                if content:
-                    await _send_touch_content(bot, telegram_id, content, bot_id=bot_id)
-                return True
-            except Exception as exc:  # pylint: disable=broad-except
-                logger.warning(
-                    "Не удалось отправить утреннее сообщение пользователю %s: %s",
-                    telegram_id,
-                    exc,
-                )
-                return False
-
-        # Создаем задачи для параллельной отправки (limited-aiogram автоматически контролирует лимиты)
-        sent_user_ids: List[int] = []
-        tasks = []
-        
-        for user_id, telegram_id in filtered_users:
-            # Создаем задачу для отправки
-            task = asyncio.create_task(send_to_user(user_id, telegram_id))
-            tasks.append((user_id, task))
+async def deliver_morning_touch(bot: Bot, telegram_id: int, content: Optional[TouchContent], bot_id: int) -> bool:
+    """Стратегия диспетчера: отправить утреннее касание одному пользователю."""
+    if content:
+        # Пауза перед первым вопросом не должна занимать слот воркера рассылки
+        await _send_touch_content(bot, telegram_id, content, bot_id=bot_id, defer_first_question=True)
+    return True
 
-        # Ждем завершения всех задач параллельно
-        results = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
-        
-        for (user_id, _), result in zip(tasks, results):
-            if isinstance(result, Exception):
-                logger.warning("Ошибка при отправке пользователю %s: %s", user_id, result)
-            elif result is True:
-                sent_user_ids.append(user_id)
-
-        await asyncio.to_thread(_mark_users_sent, sent_user_ids, now)
-        logger.info("Утреннее касание: отправлено %s сообщений", len(sent_user_ids))
-    except Exception as exc:
-        logger.error("Критическая ошибка в send_morning_touch: %s", exc, exc_info=True)
-
-
-async def _send_touch_content(bot: Bot, telegram_id: int, content: TouchContent, bot_id: int = None) -> None:
-    """Отправить пользователю материалы касания."""
-    import redis
-    import json
-    
+
+async def _send_touch_content(
+    bot: Bot,
+    telegram_id: int,
+    content: TouchContent,
+    bot_id: int = None,
+    defer_first_question: bool = False,
+) -> None:
+    """
+    Отправить пользователю материалы касания.
+
+    defer_first_question=True — первый вопрос отправляется отдельной задачей после паузы,
+    и функция возвращается сразу (рассылка диспетчера); иначе пауза выдерживается здесь.
+    """
     # Получаем bot_id если не передан
     if bot_id is None:
         bot_info = await bot.get_me()
@@ -161,11 +95,7 @@ async def _send_touch_content(bot: Bot, telegram_id: int, content: TouchContent,
     if content.video_file_path:
         file_path = Path("media") / content.video_file_path
         if file_path.exists():
-            await bot.send_video(
-                telegram_id,
-                FSInputFile(file_path),
-                caption=caption,
-            )
+            await send_touch_video(bot, telegram_id, content.id, file_path, caption=caption)
             video_sent = True
         else:
             logger.warning("Файл видео касания не найден: %s", file_path)
@@ -189,7 +119,22 @@ async def _send_touch_content(bot: Bot, telegram_id: int, content: TouchContent,
     
     # Через 5 секунд отправляем первый вопрос из поля "Вопросы"
     if content.questions:
-        await asyncio.sleep(5)
+        if defer_first_question:
+            _schedule_first_question(bot, telegram_id, content, bot_id)
+        else:
+            await _send_first_question(bot, telegram_id, content, bot_id)
+
+
+def _schedule_first_question(bot: Bot, telegram_id: int, content: TouchContent, bot_id: int) -> None:
+    task = asyncio.create_task(_send_first_question(bot, telegram_id, content, bot_id))
+    _pending_first_questions.add(task)
+    task.add_done_callback(_pending_first_questions.discard)
+
+
+async def _send_first_question(bot: Bot, telegram_id: int, content: TouchContent, bot_id: int) -> None:
+    """Отправить первый вопрос касания через FIRST_QUESTION_DELAY секунд после материалов."""
+    try:
+        await asyncio.sleep(FIRST_QUESTION_DELAY)
         
         # Разделяем вопросы по переносу строки
         questions_text = content.questions.strip()
@@ -200,42 +145,16 @@ async def _send_touch_content(bot: Bot, telegram_id: int, content: TouchContent,
             first_question = questions_list[0]
             await bot.send_message(telegram_id, first_question)
             
-            # Сохраняем состояние и данные в Redis для обработки ответов
-            from core.config import settings
-            
-            redis_client = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                password=settings.redis_password,
-                db=settings.redis_db,
-                decode_responses=True
-            )
-            
-            state_key = f"fsm:{bot_id}:{telegram_id}:state"
-            data_key = f"fsm:{bot_id}:{telegram_id}:data"
-            
-            # Сохраняем состояние для обработки вопросов касания
-            redis_client.set(state_key, "TouchQuestionStates:waiting_for_answer", ex=3600)
-            
-            # Сохраняем данные о вопросах
-            redis_data = {
+            # Выставляем состояние ожидания ответа — его прочитает FSMContext хендлера
+            user_state = get_user_state(bot_id, telegram_id)
+            await user_state.set_state(TouchQuestionStates.waiting_for_answer)
+            await user_state.set_data({
                 "touch_content_id": content.id,
                 "questions_list": questions_list,
                 "current_question_index": 0,
                 "answers": []
-            }
-            redis_client.set(data_key, json.dumps(redis_data), ex=3600)
+            })
             
             logger.info(f"[MORNING_TOUCH] Отправлен первый вопрос для пользователя {telegram_id}, всего вопросов: {len(questions_list)}")
-
-
-def _get_content_for_user(user_id: int, for_date: date) -> Optional[TouchContent]:
-    with SessionLocal() as session:
-        repo = TouchContentRepository(session)
-        user = session.get(User, user_id)
-        if not user:
-            return repo.get_default("morning")
-        course_day = calculate_course_day(user, for_date)
-        return fetch_touch_content(repo, touch_type="morning", course_day=course_day)
-
-
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning(f"[MORNING_TOUCH] Не удалось отправить первый вопрос пользователю {telegram_id}: {exc}")
@@ -1,20 +1,21 @@
 """
-Сервис для прогрева моделей Qwen и Whisper, чтобы они всегда были готовы к работе.
-Отправляет периодические запросы для поддержания моделей в активном состоянии.
+Сервис для прогрева моделей Qwen и Whisper, чтобы они были готовы к работе.
+Когда и какую модель прогревать, решает services/warmup_planner.py.
 """
-import asyncio
 import logging
 from io import BytesIO
 from qwen_client import get_qwen_client
+from services.model_scheduler import ModelCallPreempted
 from whisper_client import transcribe_audio
 
 logger = logging.getLogger(__name__)
 
 
-async def warmup_qwen_model() -> None:
+async def warmup_qwen_model() -> bool:
     """
     Прогревает модель Qwen простым запросом.
     Это помогает избежать долгого ожидания при первом реальном запросе.
+    Возвращает True, если модель ответила.
     """
     try:
         logger.info("🔥 Начинаем прогрев модели Qwen...")
@@ -22,42 +23,23 @@ async def warmup_qwen_model() -> None:
         
         # Отправляем простой запрос для прогрева модели
         # Используем короткий промпт, чтобы быстро получить ответ
-        response = await asyncio.to_thread(
-            client.generate_response,
-            "Привет"
-        )
+        response = await client.generate_response("Привет", profile="warmup")
         
         logger.info(f"✓ Модель Qwen прогрета! Ответ: {response[:50]}...")
         return True
+    except ModelCallPreempted:
+        logger.info("Прогрев Qwen пропущен: модель занята запросами пользователей")
+        return False
     except Exception as e:
         logger.warning(f"⚠ Не удалось прогреть модель Qwen: {e}. Это нормально, модель прогреется при первом запросе.")
         return False
 
 
-async def keep_qwen_warm() -> None:
-    """
-    Периодически отправляет легкие запросы к модели, чтобы она не "засыпала".
-    Вызывается через scheduler каждые 5-10 минут.
-    """
-    try:
-        logger.debug("🔄 Отправляем keep-alive запрос к Qwen...")
-        client = get_qwen_client()
-        
-        # Очень короткий запрос, чтобы просто "разбудить" модель
-        response = await asyncio.to_thread(
-            client.generate_response,
-            "ок"
-        )
-        
-        logger.debug(f"✓ Keep-alive успешен: {response[:30]}...")
-    except Exception as e:
-        logger.warning(f"⚠ Keep-alive запрос к Qwen не удался: {e}. Модель может быть недоступна.")
-
-
-async def warmup_whisper_model() -> None:
+async def warmup_whisper_model() -> bool:
     """
     Прогревает модель Whisper простым запросом.
     Это помогает избежать долгого ожидания при первом реальном запросе.
+    Возвращает True, если модель ответила.
     """
     try:
         logger.info("🎤 Начинаем прогрев модели Whisper...")
@@ -83,34 +65,13 @@ async def warmup_whisper_model() -> None:
         test_audio = BytesIO(wav_header)
         
         # Отправляем тестовый запрос
-        response = await transcribe_audio(test_audio, audio_format="wav")
+        response = await transcribe_audio(test_audio, audio_format="wav", trim_silence=False)
         
         logger.info(f"✓ Модель Whisper прогрета! Ответ: {response[:50] if response else 'пусто'}...")
         return True
+    except ModelCallPreempted:
+        logger.info("Прогрев Whisper пропущен: модель занята запросами пользователей")
+        return False
     except Exception as e:
         logger.warning(f"⚠ Не удалось прогреть модель Whisper: {e}. Это нормально, модель прогреется при первом запросе.")
         return False
-
-
-async def keep_whisper_warm() -> None:
-    """
-    Периодически отправляет легкие запросы к Whisper, чтобы модель не "засыпала".
-    Вызывается через scheduler реже, чем Qwen (каждые 15 минут), так как используется реже.
-    """
-    try:
-        logger.debug("🎤 Отправляем keep-alive запрос к Whisper...")
-        
-        # Создаем минимальное тестовое аудио (тишина)
-        wav_header = bytes([
-            0x52, 0x49, 0x46, 0x46, 0x24, 0x00, 0x00, 0x00, 0x57, 0x41, 0x56, 0x45,
-            0x66, 0x6D, 0x74, 0x20, 0x10, 0x00, 0x00, 0x00, 0x01, 0x00, 0x01, 0x00,
-            0x40, 0x3E, 0x00, 0x00, 0x80, 0x7C, 0x00, 0x00, 0x02, 0x00, 0x10, 0x00,
-            0x64, 0x61, 0x74, 0x61, 0x00, 0x00, 0x00, 0x00
-        ])
-        
-        test_audio = BytesIO(wav_header)
-        response = await transcribe_audio(test_audio, audio_format="wav")
-        
-        logger.debug(f"✓ Whisper keep-alive успешен: {response[:30] if response else 'пусто'}...")
-    except Exception as e:
-        logger.warning(f"⚠ Keep-alive запрос к Whisper не удался: {e}. Модель может быть недоступна.")
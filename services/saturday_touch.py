@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import asyncio
 import logging
 from datetime import datetime
 from typing import List, Tuple
@@ -12,8 +11,9 @@ from sqlalchemy import Select, select
 
 from core.config import settings
 from core.texts import get_booking_text
-from database.session import SessionLocal
+from database.session import AsyncSessionLocal
 from models.user import User
+from services.broadcast import run_broadcast
 
 logger = logging.getLogger(__name__)
 
@@ -28,11 +28,16 @@ def _build_users_query() -> Select[Tuple[int, int]]:
     )
 
 
-def _fetch_users() -> List[Tuple[int, int]]:
-    """Получить список активных пользователей."""
-    with SessionLocal() as session:
-        stmt = _build_users_query()
-        result = session.execute(stmt)
+async def _fetch_users_chunk(after_id: int, limit: int) -> List[Tuple[int, int]]:
+    """Получить очередную порцию активных пользователей (по возрастанию id)."""
+    async with AsyncSessionLocal() as session:
+        stmt = (
+            _build_users_query()
+            .where(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
         return list(result.all())
 
 
@@ -45,13 +50,6 @@ async def send_saturday_touch(bot: Bot) -> None:
     if now.weekday() != 5:  # 5 = суббота
         logger.info("Стратсуббота: сегодня не суббота, пропускаем отправку")
         return
-    
-    users = await asyncio.to_thread(_fetch_users)
-    if not users:
-        logger.info("Стратсуббота: нет пользователей для отправки")
-        return
-
-    logger.info("Стратсуббота: отправляем %s пользователям", len(users))
 
     # Получаем текст сообщения
     message_text = get_booking_text("saturday_reflection")
@@ -62,8 +60,9 @@ async def send_saturday_touch(bot: Bot) -> None:
     keyboard_builder.adjust(1)
     keyboard = keyboard_builder.as_markup()
 
-    async def send_to_user(telegram_id: int) -> bool:
+    async def send_to_user(user: Tuple[int, int]) -> bool:
         """Отправить сообщение одному пользователю."""
+        _, telegram_id = user
         try:
             await bot.send_message(telegram_id, message_text, reply_markup=keyboard)
             return True
@@ -75,15 +74,8 @@ async def send_saturday_touch(bot: Bot) -> None:
             )
             return False
 
-    # Создаем задачи для параллельной отправки
-    tasks = []
-    for user_id, telegram_id in users:
-        task = asyncio.create_task(send_to_user(telegram_id))
-        tasks.append((user_id, task))
-
-    # Ждем завершения всех задач параллельно
-    results = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
-    
-    success_count = sum(1 for result in results if result is True and not isinstance(result, Exception))
-    logger.info("Стратсуббота: отправлено %s сообщений", success_count)
-
+    stats = await run_broadcast("Стратсуббота", _fetch_users_chunk, send_to_user)
+    if not stats.processed:
+        logger.info("Стратсуббота: нет пользователей для отправки")
+        return
+    logger.info("Стратсуббота: отправлено %s сообщений", stats.sent)
@@ -10,11 +10,9 @@ from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
 
 from core.config import settings
-from services.morning_touch import send_morning_touch
-from services.day_touch import send_day_touch
-from services.evening_touch import send_evening_touch
+from services.touch_dispatcher import dispatch_touches
 from services.saturday_touch import send_saturday_touch
-from services.qwen_warmup import warmup_whisper_model, keep_whisper_warm
+from services.warmup_planner import plan_warmup, warmup_on_startup
 
 logger = logging.getLogger(__name__)
 
@@ -23,32 +21,13 @@ def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
     """Настроить планировщик фоновых задач."""
     scheduler = AsyncIOScheduler(timezone=settings.timezone)
 
+    # Единый диспетчер касаний утро/день/вечер: один запрос к БД в минуту на все типы
     scheduler.add_job(
-        send_morning_touch,
+        dispatch_touches,
         trigger=CronTrigger(minute="*", second=0),
         kwargs={"bot": bot},
-        name="morning_touch",
-        id="morning_touch",
-        replace_existing=True,
-        max_instances=1,  # Не запускать новый экземпляр, если предыдущий еще выполняется
-    )
-
-    scheduler.add_job(
-        send_day_touch,
-        trigger=CronTrigger(minute="*", second=0),
-        kwargs={"bot": bot},
-        name="day_touch",
-        id="day_touch",
-        replace_existing=True,
-        max_instances=1,  # Не запускать новый экземпляр, если предыдущий еще выполняется
-    )
-
-    scheduler.add_job(
-        send_evening_touch,
-        trigger=CronTrigger(minute="*", second=0),
-        kwargs={"bot": bot},
-        name="evening_touch",
-        id="evening_touch",
+        name="touch_dispatch",
+        id="touch_dispatch",
         replace_existing=True,
         max_instances=1,  # Не запускать новый экземпляр, если предыдущий еще выполняется
     )
@@ -63,31 +42,35 @@ def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
         replace_existing=True,
     )
 
-    # Прогрев модели Whisper при старте (одноразовая задача через 20 секунд)
-    tz = ZoneInfo(settings.timezone)
-    whisper_warmup_time = datetime.now(tz=tz) + timedelta(seconds=20)
-    
-    scheduler.add_job(
-        warmup_whisper_model,
-        trigger=DateTrigger(run_date=whisper_warmup_time),
-        id="whisper_warmup_startup",
-        replace_existing=True,
-        max_instances=1,
-    )
+    # Прогрев Qwen и Whisper перед волнами касаний и пока пользователи отвечают
+    if settings.warmup_enabled:
+        scheduler.add_job(
+            plan_warmup,
+            trigger=CronTrigger(minute="*", second=30),
+            name="model_warmup_planner",
+            id="model_warmup_planner",
+            replace_existing=True,
+            max_instances=1,
+        )
 
-    # Keep-alive для Whisper каждые 15 минут (реже, чем Qwen, так как используется реже)
-    scheduler.add_job(
-        keep_whisper_warm,
-        trigger=CronTrigger(minute="*/15"),  # Каждые 15 минут
-        id="whisper_keep_alive",
-        replace_existing=True,
-    )
+        # Одноразовый прогрев после запуска (через 20 секунд): деплой мог прийтись на время без волн
+        scheduler.add_job(
+            warmup_on_startup,
+            trigger=DateTrigger(run_date=datetime.now(tz=ZoneInfo(settings.timezone)) + timedelta(seconds=20)),
+            name="model_warmup_startup",
+            id="model_warmup_startup",
+            replace_existing=True,
+            max_instances=1,
+        )
 
     scheduler.start()
     logger.info("Планировщик задач запущен (часовой пояс %s)", settings.timezone)
     logger.info("📅 Стратсуббота: отправка сообщения о рефлексии каждую субботу в 12:00 МСК")
-    logger.info("🎤 Запланирован прогрев модели Whisper через 20 секунд после старта")
-    logger.info("🎤 Keep-alive для модели Whisper каждые 15 минут")
+    if settings.warmup_enabled:
+        logger.info(
+            "🔥 Прогрев моделей за %s мин до волн касаний, keep-alive только в активные окна",
+            settings.warmup_lead_minutes,
+        )
     
     return scheduler
 
@@ -0,0 +1,254 @@
+"""
+Единый диспетчер касаний (утро/день/вечер).
+
+Раз в минуту выполняет один запрос к БД на все три типа касаний и раздаёт
+пользователей по стратегиям отправки из services/*_touch.py. Контент подбирается
+один раз за тик на каждый тип касания и общий для всех пользователей одного дня курса.
+Пользователи читаются порциями и рассылаются через services/broadcast.py.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from aiogram import Bot
+from sqlalchemy import ColumnElement, Select, Update, or_, select
+
+from core.config import settings
+from database.session import AsyncSessionLocal, SessionLocal
+from models.touch_content import TouchContent
+from models.user import User
+from repositories.touch_content_repository import AsyncTouchContentRepository, TouchContentRepository
+from services import day_touch, evening_touch, morning_touch
+from services.broadcast import run_broadcast
+from services.touch_utils import (
+    calculate_course_day,
+    calculate_course_days,
+    fetch_touch_content,
+    resolve_touch_contents,
+)
+
+logger = logging.getLogger(__name__)
+
+TouchStrategy = Callable[[Bot, int, Optional[TouchContent], int], Awaitable[bool]]
+
+
+class TouchKind:
+    """Описание типа касания: условие выборки, стратегия отправки и отметка об отправке."""
+
+    def __init__(
+        self,
+        touch_type: str,
+        label: str,
+        due_condition: Callable[[datetime, time], ColumnElement[bool]],
+        deliver: TouchStrategy,
+        mark_sent_stmt: Callable[[List[int], datetime], Update],
+    ):
+        self.touch_type = touch_type
+        self.label = label
+        self.due_condition = due_condition
+        self.deliver = deliver
+        self.mark_sent_stmt = mark_sent_stmt
+
+
+# Порядок важен: если пользователю в одну минуту положено несколько касаний,
+# они отправляются последовательно в этом порядке.
+TOUCH_KINDS: Tuple[TouchKind, ...] = (
+    TouchKind(
+        "morning",
+        "Утреннее касание",
+        morning_touch._build_due_condition,
+        morning_touch.deliver_morning_touch,
+        morning_touch._build_mark_sent_stmt,
+    ),
+    TouchKind(
+        "day",
+        "Дневное касание",
+        day_touch._build_due_condition,
+        day_touch.deliver_day_touch,
+        day_touch._build_mark_sent_stmt,
+    ),
+    TouchKind(
+        "evening",
+        "Вечернее касание",
+        evening_touch._build_due_condition,
+        evening_touch.deliver_evening_touch,
+        evening_touch._build_mark_sent_stmt,
+    ),
+)
+
+# Идентификатор бота не меняется за время жизни процесса — запрашиваем get_me один раз
+_bot_id: Optional[int] = None
+
+
+async def _get_bot_id(bot: Bot) -> int:
+    global _bot_id
+    if _bot_id is None:
+        bot_info = await bot.get_me()
+        _bot_id = bot_info.id
+    return _bot_id
+
+
+def _build_due_users_query(day_start: datetime, target_time: time) -> Select:
+    """Один запрос на все типы касаний: пользователь + флаг «положено» по каждому типу."""
+    conditions = [kind.due_condition(day_start, target_time) for kind in TOUCH_KINDS]
+    return (
+        select(
+            User.id,
+            User.telegram_id,
+            User.subscription_started_at,
+            User.subscription_paid_at,
+            *[condition.label(f"{kind.touch_type}_due") for kind, condition in zip(TOUCH_KINDS, conditions)],
+        )
+        .where(or_(*conditions))
+    )
+
+
+DueUser = Tuple[int, int, Optional[int], List[TouchKind]]
+ContentsByDay = Dict[str, Dict[Optional[int], Optional[TouchContent]]]
+
+
+async def _fetch_due_users_chunk(
+    day_start: datetime,
+    target_time: time,
+    for_date: date,
+    contents: ContentsByDay,
+    after_id: int,
+    limit: int,
+) -> List[DueUser]:
+    """
+    Порция пользователей, которым положены касания: (id, telegram_id, день курса, типы касаний).
+
+    Контент для ещё не встречавшихся в этом тике дней курса догружается в contents,
+    так что на весь тик приходится по одному подбору контента на тип касания и день.
+    """
+    async with AsyncSessionLocal() as session:
+        stmt = (
+            _build_due_users_query(day_start, target_time)
+            .where(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        rows = (await session.execute(stmt)).all()
+        if not rows:
+            return []
+
+        course_days = calculate_course_days(
+            [row.subscription_started_at or row.subscription_paid_at for row in rows],
+            for_date,
+        )
+        users = []
+        for row, course_day in zip(rows, course_days):
+            due_kinds = [kind for kind in TOUCH_KINDS if getattr(row, f"{kind.touch_type}_due")]
+            users.append((row.id, row.telegram_id, course_day, due_kinds))
+
+        await _resolve_missing_contents(AsyncTouchContentRepository(session), users, contents)
+    return users
+
+
+async def _resolve_missing_contents(
+    repo: AsyncTouchContentRepository,
+    users: List[DueUser],
+    contents: ContentsByDay,
+) -> None:
+    """Догрузить в contents контент для дней курса, которых там ещё нет."""
+    missing: Dict[str, set] = {kind.touch_type: set() for kind in TOUCH_KINDS}
+    for _, _, course_day, due_kinds in users:
+        for kind in due_kinds:
+            if course_day not in contents.setdefault(kind.touch_type, {}):
+                missing[kind.touch_type].add(course_day)
+
+    for touch_type, days in missing.items():
+        if days:
+            contents[touch_type].update(
+                await resolve_touch_contents(repo, touch_type=touch_type, course_days=days)
+            )
+
+
+async def _mark_chunk_sent(results: List[Tuple[DueUser, List[str]]], sent_at: datetime) -> None:
+    """Зафиксировать отправку касаний порции: UPDATE на каждый тип касания в одной транзакции."""
+    if not results:
+        return
+    async with AsyncSessionLocal() as session:
+        for kind in TOUCH_KINDS:
+            ids = [user[0] for user, sent_types in results if kind.touch_type in sent_types]
+            if ids:
+                await session.execute(kind.mark_sent_stmt(ids, sent_at))
+        await session.commit()
+
+
+def _get_content_for_user(user_id: int, touch_type: str, for_date: date) -> Optional[TouchContent]:
+    """Контент касания для одного пользователя (тестовая отправка из админки)."""
+    with SessionLocal() as session:
+        repo = TouchContentRepository(session)
+        user = session.get(User, user_id)
+        if not user:
+            return repo.get_default(touch_type)
+        course_day = calculate_course_day(user, for_date)
+        return fetch_touch_content(repo, touch_type=touch_type, course_day=course_day)
+
+
+async def dispatch_touches(bot: Bot) -> None:
+    """Отправить все касания, положенные пользователям в текущую минуту."""
+    try:
+        tz = ZoneInfo(settings.timezone)
+        now = datetime.now(tz=tz)
+        target_time = now.time().replace(second=0, microsecond=0)
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        try:
+            bot_id = await _get_bot_id(bot)
+        except Exception as e:
+            logger.error("Не удалось получить bot_id (сетевые проблемы): %s", e)
+            return
+
+        contents: ContentsByDay = {}
+        sent_counts: Dict[str, int] = {kind.touch_type: 0 for kind in TOUCH_KINDS}
+
+        async def fetch_chunk(after_id: int, limit: int) -> List[DueUser]:
+            return await _fetch_due_users_chunk(day_start, target_time, now.date(), contents, after_id, limit)
+
+        async def send_to_user(user: DueUser) -> List[str]:
+            """Отправить пользователю все положенные касания по очереди; вернуть отправленные типы."""
+            _, telegram_id, course_day, due_kinds = user
+            sent_types = []
+            for kind in due_kinds:
+                try:
+                    content = contents[kind.touch_type].get(course_day)
+                    if await kind.deliver(bot, telegram_id, content, bot_id):
+                        sent_types.append(kind.touch_type)
+                        sent_counts[kind.touch_type] += 1
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.warning(
+                        "%s: не удалось отправить пользователю %s: %s",
+                        kind.label,
+                        telegram_id,
+                        exc,
+                    )
+            return sent_types
+
+        async def mark_chunk(results: List[Tuple[DueUser, List[str]]]) -> None:
+            await _mark_chunk_sent(results, now)
+
+        stats = await run_broadcast(
+            f"Касания {target_time:%H:%M}",
+            fetch_chunk,
+            send_to_user,
+            mark_chunk,
+        )
+        if not stats.processed:
+            logger.info("Касания %s: нет пользователей для отправки", f"{target_time:%H:%M}")
+        else:
+            logger.info(
+                "Касания %s: обработано пользователей %s, получили касания %s",
+                f"{target_time:%H:%M}",
+                stats.processed,
+                stats.sent,
+            )
+        for kind in TOUCH_KINDS:
+            if sent_counts[kind.touch_type]:
+                logger.info("%s: отправлено %s сообщений", kind.label, sent_counts[kind.touch_type])
+    except Exception as exc:
+        logger.error("Критическая ошибка в dispatch_touches: %s", exc, exc_info=True)
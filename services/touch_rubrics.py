@@ -0,0 +1,161 @@
+"""
+Рубрики для проверки ответов на вопросы касаний.
+
+Вопросы касания (TouchContent.questions) в этот день одни и те же у всех
+пользователей, поэтому критерии хорошего ответа на каждый вопрос Qwen составляет
+один раз, а не заново при проверке каждого ответа. Рубрика хранится в Redis под
+ключом touch_rubric:{id контента}:{хэш вопроса}; правка текста вопроса меняет хэш,
+и устаревшая рубрика больше не находится.
+
+Рубрики считают фоновые задачи очереди ответов (services/answer_queue.py). Задачу
+на контент ставит админка при сохранении вопросов, а также проверка первого ответа
+на вопрос без рубрики; сам такой ответ проверяется по полному промпту. Задача на
+контент только раскладывает его на задачи по вопросам: каждая из них — один вызов
+Qwen, так что воркер очереди не занят надолго и ответы пользователей не ждут за
+расчётом рубрик целого контента.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+
+from core.redis_pool import get_redis
+from database.session import AsyncSessionLocal
+from qwen_client import EMPTY_RESPONSE_TEXT, generate_qwen_response
+from repositories.touch_content_repository import AsyncTouchContentRepository
+from services.answer_queue import answer_job, enqueue_answer_job, job_stage
+from services.model_scheduler import LANE_BACKGROUND, model_lane
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "touch_rubric"
+SCHEDULED_KEY_PREFIX = "touch_rubric_scheduled"
+RUBRIC_JOB_KIND = "touch_rubrics"
+QUESTION_RUBRIC_JOB_KIND = "touch_rubric"
+# Рубрика нужна, пока контент используется; TTL — чтобы не копить ключи удалённого контента
+RUBRIC_TTL_SECONDS = 90 * 24 * 3600
+# Пока расчёт рубрик контента в очереди, ответы на его вопросы не ставят его повторно
+SCHEDULE_DEDUP_SECONDS = 15 * 60
+SUMMARY_CONTEXT_CHARS = 1000
+
+
+def split_questions(questions_text: Optional[str]) -> List[str]:
+    """Вопросы касания по строкам — так же, как их получает пользователь."""
+    return [line.strip() for line in (questions_text or "").strip().split("\n") if line.strip()]
+
+
+def _rubric_key(content_id: int, question: str) -> str:
+    digest = hashlib.sha256(" ".join(question.split()).encode("utf-8")).hexdigest()[:16]
+    return f"{CACHE_KEY_PREFIX}:{content_id}:{digest}"
+
+
+def _rubric_prompt(question: str, summary: Optional[str]) -> str:
+    context = ""
+    if summary and summary.strip():
+        context = f"Тема касания: {summary.strip()[:SUMMARY_CONTEXT_CHARS]}\n\n"
+    return (
+        f"{context}"
+        f"Вопрос участнику курса: {question}\n\n"
+        "Составь краткую рубрику для проверки ответов на этот вопрос: 3-4 пункта по одной строке — "
+        "что должно быть в хорошем ответе и какие пробелы или ошибки встречаются чаще всего. "
+        "Без вступления и заключения, только пункты."
+    )
+
+
+async def get_question_rubric(content_id: Optional[int], question: str) -> Optional[str]:
+    """
+    Готовая рубрика вопроса или None.
+
+    При промахе ставит расчёт рубрик всего контента в очередь и не ждёт его:
+    ответ пользователя проверяется по полному промпту.
+    """
+    if not content_id:
+        return None
+    try:
+        rubric = await get_redis().get(_rubric_key(content_id, question))
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("[TOUCH_RUBRIC] Не удалось прочитать рубрику контента %s: %s", content_id, exc)
+        return None
+    if rubric is None:
+        await schedule_rubric_precompute(content_id)
+    return rubric
+
+
+async def schedule_rubric_precompute(content_id: int, overwrite: bool = False) -> None:
+    """
+    Поставить расчёт рубрик контента в очередь ответов.
+
+    overwrite=True (вопросы или описание изменены в админке) — пересчитать и уже
+    готовые рубрики; без него повторная постановка в течение SCHEDULE_DEDUP_SECONDS пропускается.
+    """
+    redis_client = get_redis()
+    scheduled_key = f"{SCHEDULED_KEY_PREFIX}:{content_id}"
+    try:
+        if overwrite:
+            await redis_client.set(scheduled_key, 1, ex=SCHEDULE_DEDUP_SECONDS)
+        elif not await redis_client.set(scheduled_key, 1, nx=True, ex=SCHEDULE_DEDUP_SECONDS):
+            return
+        await enqueue_answer_job(RUBRIC_JOB_KIND, touch_content_id=content_id, overwrite=overwrite)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("[TOUCH_RUBRIC] Не удалось поставить расчёт рубрик контента %s: %s", content_id, exc)
+
+
+async def precompute_touch_rubrics(content_id: int, overwrite: bool = False) -> int:
+    """Поставить в очередь расчёт рубрик вопросов контента. Возвращает число поставленных задач."""
+    async with AsyncSessionLocal() as session:
+        content = await AsyncTouchContentRepository(session).get_by_id(content_id)
+    if content is None:
+        logger.warning("[TOUCH_RUBRIC] Контент %s не найден, рубрики не считаем", content_id)
+        return 0
+
+    redis_client = get_redis()
+    summary = (content.summary or "").strip()[:SUMMARY_CONTEXT_CHARS]
+    queued = 0
+    for question in split_questions(content.questions):
+        if not overwrite and await redis_client.exists(_rubric_key(content_id, question)):
+            continue
+        await enqueue_answer_job(
+            QUESTION_RUBRIC_JOB_KIND,
+            touch_content_id=content_id,
+            question=question,
+            summary=summary,
+            overwrite=overwrite,
+        )
+        queued += 1
+    logger.info("[TOUCH_RUBRIC] Контент %s: поставлено рубрик в очередь — %s", content_id, queued)
+    return queued
+
+
+async def compute_question_rubric(content_id: int, question: str, summary: Optional[str], overwrite: bool = False) -> bool:
+    """Составить и сохранить рубрику одного вопроса. Возвращает True, если рубрика сохранена."""
+    redis_client = get_redis()
+    key = _rubric_key(content_id, question)
+    if not overwrite and await redis_client.exists(key):
+        return False
+    # Рубрики не срочные: слоты Qwen в первую очередь — проверке ответов пользователей
+    with model_lane(LANE_BACKGROUND):
+        async with job_stage("qwen"):
+            # Без кэша ответов: рубрика и так хранится, а пересчёт должен дать свежий ответ
+            rubric = (await generate_qwen_response(
+                _rubric_prompt(question, summary), profile="rubric", use_cache=False
+            )).strip()
+    if not rubric or rubric == EMPTY_RESPONSE_TEXT:
+        logger.warning("[TOUCH_RUBRIC] Пустая рубрика для вопроса «%s» контента %s", question[:50], content_id)
+        return False
+    await redis_client.set(key, rubric, ex=RUBRIC_TTL_SECONDS)
+    return True
+
+
+@answer_job(RUBRIC_JOB_KIND)
+async def _run_rubric_job(bot: Bot, job: Dict[str, Any]) -> None:
+    await precompute_touch_rubrics(job["touch_content_id"], overwrite=job.get("overwrite", False))
+
+
+@answer_job(QUESTION_RUBRIC_JOB_KIND)
+async def _run_question_rubric_job(bot: Bot, job: Dict[str, Any]) -> None:
+    await compute_question_rubric(
+        job["touch_content_id"], job["question"], job.get("summary"), overwrite=job.get("overwrite", False)
+    )
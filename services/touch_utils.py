@@ -1,10 +1,17 @@
 from __future__ import annotations
 
-from datetime import date, datetime, timedelta
-from typing import Optional
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
 
+import numpy as np
+from sqlalchemy import Time, cast, func, literal_column
+
+from models.touch_content import TouchContent
 from models.user import User
-from repositories.touch_content_repository import TouchContentRepository
+from repositories.touch_content_repository import AsyncTouchContentRepository, TouchContentRepository
+
+logger = logging.getLogger(__name__)
 
 
 def calculate_course_day(user: User, for_date: date) -> Optional[int]:
@@ -14,7 +21,15 @@ def calculate_course_day(user: User, for_date: date) -> Optional[int]:
     Начало отсчёта — subscription_started_at или subscription_paid_at.
     Включаются только будние дни (понедельник-пятница).
     """
-    start_dt: Optional[datetime] = user.subscription_started_at or user.subscription_paid_at
+    return course_day_from_start(user.subscription_started_at or user.subscription_paid_at, for_date)
+
+
+def course_day_from_start(start_dt: Optional[datetime], for_date: date) -> Optional[int]:
+    """
+    Номер дня курса по дате начала подписки (без загрузки модели User).
+
+    Считается за O(1): полные недели дают по 5 будних дней, остаток (< 7 дней) — по календарю.
+    """
     if not start_dt:
         return None
 
@@ -22,13 +37,42 @@ def calculate_course_day(user: User, for_date: date) -> Optional[int]:
     if for_date < start_date:
         return None
 
-    day_counter = 0
-    current = start_date
-    while current <= for_date:
-        if current.weekday() < 5:  # 0..4 — будни
-            day_counter += 1
-        current += timedelta(days=1)
-    return day_counter
+    full_weeks, rest_days = divmod((for_date - start_date).days + 1, 7)
+    start_weekday = start_date.weekday()
+    rest_weekdays = sum(1 for offset in range(rest_days) if (start_weekday + offset) % 7 < 5)
+    return full_weeks * 5 + rest_weekdays
+
+
+def calculate_course_days(start_dates: Sequence[Optional[datetime]], for_date: date) -> List[Optional[int]]:
+    """
+    Номера дней курса сразу для массива дат начала подписки (одним вызовом numpy.busday_count).
+
+    Результат совпадает с course_day_from_start для каждого элемента: None, если даты
+    начала нет или она позже for_date.
+    """
+    if not start_dates:
+        return []
+
+    end = np.datetime64(for_date + timedelta(days=1), "D")
+    has_start = np.array([start_dt is not None for start_dt in start_dates], dtype=bool)
+    starts = np.array(
+        [start_dt.date() if start_dt is not None else for_date for start_dt in start_dates],
+        dtype="datetime64[D]",
+    )
+    # busday_count считает будни в полуинтервале [start, end) — end = for_date + 1 день
+    counts = np.busday_count(starts, end)
+    valid = has_start & (starts < end)
+    return [int(count) if is_valid else None for count, is_valid in zip(counts.tolist(), valid.tolist())]
+
+
+def notification_time_expression(column, default_time: time):
+    """
+    Время уведомления пользователя с подстановкой времени по умолчанию.
+
+    Значение по умолчанию встраивается литералом, а не параметром: только так выражение
+    совпадает с выражением частичных индексов ix_users_*_touch_due (миграция 0005).
+    """
+    return func.coalesce(column, cast(literal_column(f"'{default_time.isoformat()}'"), Time))
 
 
 def fetch_touch_content(
@@ -66,3 +110,36 @@ def fetch_touch_content(
     return any_content
 
 
+async def resolve_touch_contents(
+    repo: AsyncTouchContentRepository,
+    *,
+    touch_type: str,
+    course_days: Iterable[Optional[int]],
+) -> Dict[Optional[int], Optional[TouchContent]]:
+    """
+    Подобрать контент касания сразу для набора дней курса (день курса -> контент).
+
+    Та же логика выбора, что и в fetch_touch_content, но один запрос на все дни
+    и не больше двух запросов на запасной контент, общий для всех дней без своего.
+    """
+    days = set(course_days)
+    resolved: Dict[Optional[int], Optional[TouchContent]] = dict(
+        await repo.get_for_days(touch_type, [day for day in days if day])
+    )
+
+    missing = [day for day in days if day not in resolved]
+    if missing:
+        fallback = await repo.get_default(touch_type) or await repo.get_any_active(touch_type)
+        if fallback:
+            logger.info(
+                "[TOUCH_UTILS] Для %s дней %s используем запасной контент id=%s",
+                touch_type,
+                sorted(day for day in missing if day is not None),
+                fallback.id,
+            )
+        else:
+            logger.warning("[TOUCH_UTILS] Активный контент не найден для %s", touch_type)
+        for day in missing:
+            resolved[day] = fallback
+
+    return resolved
@@ -0,0 +1,85 @@
+"""
+Кэш расшифровок голосовых сообщений.
+
+Одно и то же голосовое расшифровывается несколько раз: при получении, при
+подтверждении кнопкой «Фиксируем», при повторе после ошибки. Текст сохраняется
+в Redis под ключом transcription:{модель}:{file_unique_id} — file_unique_id у
+файла в Telegram постоянный, — и повторный запрос не обращается ни к Telegram,
+ни к Whisper. Смена модели меняет ключ, поэтому старые расшифровки не подмешиваются.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from io import BytesIO
+from typing import Dict, Optional
+
+from aiogram import Bot
+
+from core.config import settings
+from core.redis_pool import get_redis
+from whisper_client import MODEL_NAME, transcribe_audio
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "transcription"
+
+# Пока голосовое расшифровывается, повторные запросы ждут результат, а не запускают Whisper второй раз
+_transcribe_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _cache_key(file_unique_id: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:{MODEL_NAME or 'default'}:{file_unique_id}"
+
+
+async def _get_cached(key: str) -> Optional[str]:
+    try:
+        return await get_redis().get(key)
+    except Exception as exc:  # pylint: disable=broad-except
+        # Без Redis просто расшифровываем заново
+        logger.warning("[TRANSCRIPTION_CACHE] Не удалось прочитать кэш %s: %s", key, exc)
+        return None
+
+
+async def _store(key: str, text: str) -> None:
+    try:
+        await get_redis().set(key, text, ex=settings.whisper_transcription_cache_ttl)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("[TRANSCRIPTION_CACHE] Не удалось сохранить расшифровку %s: %s", key, exc)
+
+
+async def transcribe_voice(bot: Bot, file_id: str, file_unique_id: Optional[str] = None) -> str:
+    """
+    Расшифровать голосовое сообщение Telegram, используя кэш по file_unique_id.
+
+    Без file_unique_id (или с нулевым TTL в настройках) кэш не используется.
+    Пустая расшифровка не кэшируется: пользователь может переслать то же голосовое.
+    """
+    if not file_unique_id or settings.whisper_transcription_cache_ttl <= 0:
+        return await _download_and_transcribe(bot, file_id)
+
+    key = _cache_key(file_unique_id)
+    cached = await _get_cached(key)
+    if cached is not None:
+        logger.info("[TRANSCRIPTION_CACHE] Расшифровка %s взята из кэша", file_unique_id)
+        return cached
+
+    lock = _transcribe_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        try:
+            cached = await _get_cached(key)
+            if cached is not None:
+                return cached
+            text = await _download_and_transcribe(bot, file_id)
+            if text and text.strip():
+                await _store(key, text)
+            return text
+        finally:
+            _transcribe_locks.pop(key, None)
+
+
+async def _download_and_transcribe(bot: Bot, file_id: str) -> str:
+    file = await bot.get_file(file_id)
+    audio_data = BytesIO()
+    await bot.download_file(file.file_path, destination=audio_data)
+    return await transcribe_audio(audio_data)
@@ -0,0 +1,124 @@
+"""
+Кэш Telegram file_id для видео касаний.
+
+Видео загружается в Telegram один раз: после первой успешной отправки file_id
+сохраняется в Redis под ключом touch_video:{id контента}:{sha256 файла}, и все
+следующие отправки используют его. Замена файла меняет хэш, поэтому старый
+file_id автоматически перестаёт находиться; при сохранении в админке ключи
+контента дополнительно удаляются через invalidate_touch_video.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+
+from core.redis_pool import get_redis
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "touch_video"
+# file_id в Telegram бессрочный, TTL нужен только чтобы не копить ключи удалённого контента
+FILE_ID_TTL_SECONDS = 90 * 24 * 3600
+_HASH_CHUNK_SIZE = 1024 * 1024
+# Фрагменты текста ошибок Telegram, после которых закэшированный file_id нужно выбросить
+FILE_ID_ERROR_MARKERS = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "file reference expired",
+    "file_reference_expired",
+)
+
+# путь -> (размер, mtime_ns, sha256): не перечитываем многомегабайтный файл на каждую отправку
+_file_hashes: Dict[str, Tuple[int, int, str]] = {}
+# Пока идёт первая загрузка видео, остальные получатели ждут её file_id, а не грузят файл параллельно
+_upload_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _is_file_id_error(exc: TelegramBadRequest) -> bool:
+    """Telegram отклонил именно file_id (неверный идентификатор, устаревшая ссылка на файл)."""
+    text = str(exc).lower()
+    return any(marker in text for marker in FILE_ID_ERROR_MARKERS)
+
+
+def _cache_key(content_id: int, file_hash: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:{content_id}:{file_hash}"
+
+
+def file_sha256(file_path: Path) -> str:
+    """SHA-256 содержимого файла (с запоминанием по размеру и времени изменения)."""
+    stat = file_path.stat()
+    cache_key = str(file_path.resolve())
+    cached = _file_hashes.get(cache_key)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with file_path.open("rb") as file:
+        for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    file_hash = digest.hexdigest()
+    _file_hashes[cache_key] = (stat.st_size, stat.st_mtime_ns, file_hash)
+    return file_hash
+
+
+async def send_touch_video(
+    bot: Bot,
+    telegram_id: int,
+    content_id: int,
+    file_path: Path,
+    *,
+    caption: Optional[str] = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    Отправить видео касания, используя file_id из кэша, если файл уже загружался.
+
+    Возвращает результат bot.send_video (Message или None, если отправка не удалась в SafeBot).
+    """
+    file_hash = await asyncio.to_thread(file_sha256, file_path)
+    key = _cache_key(content_id, file_hash)
+    redis_client = get_redis()
+
+    file_id = await redis_client.get(key)
+    if file_id is None:
+        lock = _upload_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            file_id = await redis_client.get(key)
+            if file_id is None:
+                try:
+                    message = await bot.send_video(telegram_id, FSInputFile(file_path), caption=caption, **kwargs)
+                    video = getattr(message, "video", None)
+                    if video:
+                        await redis_client.set(key, video.file_id, ex=FILE_ID_TTL_SECONDS)
+                        logger.info("[VIDEO_CACHE] Видео касания %s загружено, file_id сохранён", content_id)
+                finally:
+                    _upload_locks.pop(key, None)
+                return message
+
+    try:
+        return await bot.send_video(telegram_id, file_id, caption=caption, **kwargs)
+    except TelegramBadRequest as exc:
+        # Ошибки получателя (чат не найден, бот заблокирован) к file_id отношения не имеют
+        if not _is_file_id_error(exc):
+            raise
+        # file_id больше не принимается Telegram — сбрасываем кэш и загружаем файл заново
+        logger.warning("[VIDEO_CACHE] file_id для касания %s отклонён (%s), загружаем файл заново", content_id, exc)
+        await redis_client.delete(key)
+        return await send_touch_video(bot, telegram_id, content_id, file_path, caption=caption, **kwargs)
+
+
+async def invalidate_touch_video(content_id: int) -> int:
+    """Удалить все закэшированные file_id видео контента. Возвращает число удалённых ключей."""
+    redis_client = get_redis()
+    keys = [key async for key in redis_client.scan_iter(match=f"{CACHE_KEY_PREFIX}:{content_id}:*")]
+    if keys:
+        await redis_client.delete(*keys)
+        logger.info("[VIDEO_CACHE] Сброшен кэш видео касания %s (%s ключей)", content_id, len(keys))
+    return len(keys)
@@ -0,0 +1,185 @@
+"""
+Планировщик прогрева моделей Qwen и Whisper по расписанию касаний.
+
+Нагрузка на модели приходит волнами: ответы на утренние/дневные/вечерние касания
+в выбранное пользователями время и на стратсубботу в 12:00. Раз в минуту
+планировщик смотрит, сколько касаний уходит в ближайшие WARMUP_LEAD_MINUTES,
+и за это время до волны прогревает модели. Пока волна активна (WARMUP_ACTIVE_WINDOW_MINUTES
+после её начала) или пользователи продолжают отвечать, простаивающая модель получает
+keep-alive раз в WARMUP_KEEPALIVE_INTERVAL; в остальное время (ночью) запросов нет.
+Раз в час в лог пишется число холодных и тёплых попаданий (services/model_activity.py).
+Кроме того, модели один раз прогреваются вскоре после запуска бота (warmup_on_startup).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, time, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+
+from core.config import settings
+from database.session import AsyncSessionLocal
+from models.user import User
+from services.day_touch import DEFAULT_DAY_TIME
+from services.evening_touch import DEFAULT_EVENING_TIME
+from services.model_activity import get_model_activity, warmup_calls
+from services.morning_touch import ACTIVE_SUBSCRIPTION_TYPES, DEFAULT_MORNING_TIME
+from services.qwen_warmup import warmup_qwen_model, warmup_whisper_model
+from services.touch_utils import notification_time_expression
+
+logger = logging.getLogger(__name__)
+
+SATURDAY_WAVE_TIME = time(hour=12, minute=0)
+SCHEDULE_REFRESH_INTERVAL = timedelta(minutes=10)  # время касаний пользователи меняют нечасто
+SUMMARY_INTERVAL = timedelta(hours=1)
+
+NOTIFICATION_COLUMNS = (
+    (User.morning_notification_time, DEFAULT_MORNING_TIME),
+    (User.day_notification_time, DEFAULT_DAY_TIME),
+    (User.evening_notification_time, DEFAULT_EVENING_TIME),
+)
+
+WARMUPS: Dict[str, Callable[[], Awaitable[bool]]] = {
+    "qwen": warmup_qwen_model,
+    "whisper": warmup_whisper_model,
+}
+
+
+async def _load_touch_schedule(for_saturday: bool) -> Dict[time, int]:
+    """Число касаний, уходящих в каждую минуту суток (все типы касаний вместе)."""
+    schedule: Dict[time, int] = {}
+    active = User.subscription_type.in_(ACTIVE_SUBSCRIPTION_TYPES)
+    async with AsyncSessionLocal() as session:
+        for column, default_time in NOTIFICATION_COLUMNS:
+            notify_at = notification_time_expression(column, default_time)
+            rows = await session.execute(select(notify_at, func.count()).where(active).group_by(notify_at))
+            for notify_time, count in rows.all():
+                minute = notify_time.replace(second=0, microsecond=0)
+                schedule[minute] = schedule.get(minute, 0) + count
+        if for_saturday:
+            subscribers = await session.scalar(select(func.count()).select_from(User).where(active))
+            schedule[SATURDAY_WAVE_TIME] = schedule.get(SATURDAY_WAVE_TIME, 0) + (subscribers or 0)
+    return schedule
+
+
+class WarmupPlanner:
+    """Состояние планировщика между тиками: расписание волн и окно активности."""
+
+    def __init__(self):
+        self._schedule: Dict[time, int] = {}
+        self._schedule_loaded_at: Optional[datetime] = None
+        self._schedule_date = None
+        self._active_until: Optional[datetime] = None
+        self._announced_waves: set = set()
+        self._warming: Dict[str, asyncio.Task] = {}
+        self._last_summary_at: Optional[datetime] = None
+
+    async def _refresh_schedule(self, now: datetime) -> None:
+        if (
+            self._schedule_loaded_at is not None
+            and self._schedule_date == now.date()
+            and now - self._schedule_loaded_at < SCHEDULE_REFRESH_INTERVAL
+        ):
+            return
+        self._schedule = await _load_touch_schedule(for_saturday=now.weekday() == 5)
+        self._schedule_loaded_at = now
+        self._schedule_date = now.date()
+
+    def _waves_near(self, now: datetime) -> List[Tuple[datetime, int]]:
+        """Волны, которые начнутся в ближайшие lead минут или начались не раньше окна активности."""
+        lead = timedelta(minutes=settings.warmup_lead_minutes)
+        window = timedelta(minutes=settings.warmup_active_window_minutes)
+        waves = []
+        for notify_time, users in self._schedule.items():
+            if users < settings.warmup_min_wave_users:
+                continue
+            wave_at = datetime.combine(now.date(), notify_time, tzinfo=now.tzinfo)
+            # Ранние утренние волны завтрашнего дня попадают в lead уже сегодня около полуночи
+            for candidate in (wave_at, wave_at + timedelta(days=1)):
+                if now - window < candidate <= now + lead:
+                    waves.append((candidate, users))
+        return sorted(waves)
+
+    def _answers_flowing(self) -> bool:
+        window = settings.warmup_active_window_minutes * 60
+        for name in WARMUPS:
+            idle = get_model_activity(name).real_idle_seconds()
+            if idle is not None and idle < window:
+                return True
+        return False
+
+    def _start_warmup(self, name: str, reason: str) -> None:
+        task = self._warming.get(name)
+        if task is not None and not task.done():
+            return  # прогрев ещё идёт: serverless-модель стартует до нескольких минут
+        logger.info("[WARMUP] Прогрев %s: %s", name, reason)
+
+        async def run() -> None:
+            with warmup_calls():
+                await WARMUPS[name]()
+
+        self._warming[name] = asyncio.create_task(run(), name=f"warmup-{name}")
+
+    def _log_summary(self, now: datetime) -> None:
+        if self._last_summary_at is None:
+            self._last_summary_at = now
+            return
+        if now - self._last_summary_at < SUMMARY_INTERVAL:
+            return
+        self._last_summary_at = now
+        parts = []
+        for name in WARMUPS:
+            warm, cold = get_model_activity(name).pop_hits()
+            if warm or cold:
+                parts.append(f"{name}: тёплых {warm}, холодных {cold}")
+        if parts:
+            logger.info("[WARMUP] Вызовы моделей за час — %s", "; ".join(parts))
+
+    async def tick(self) -> None:
+        now = datetime.now(tz=ZoneInfo(settings.timezone))
+        self._log_summary(now)
+        await self._refresh_schedule(now)
+
+        window = timedelta(minutes=settings.warmup_active_window_minutes)
+        self._announced_waves = {wave_at for wave_at in self._announced_waves if wave_at > now - window}
+        for wave_at, users in self._waves_near(now):
+            if self._active_until is None or self._active_until < wave_at + window:
+                self._active_until = wave_at + window
+            if wave_at not in self._announced_waves:
+                self._announced_waves.add(wave_at)
+                logger.info("[WARMUP] Волна касаний в %s: %s пользователей", wave_at.strftime("%H:%M"), users)
+
+        in_wave = self._active_until is not None and now < self._active_until
+        if not in_wave and not self._answers_flowing():
+            return
+
+        for name in WARMUPS:
+            idle = get_model_activity(name).idle_seconds()
+            if idle is None or idle >= settings.warmup_keepalive_interval:
+                reason = "волна касаний" if in_wave else "пользователи продолжают отвечать"
+                if idle is not None:
+                    reason += f", простой {idle / 60:.0f} мин"
+                self._start_warmup(name, reason)
+
+
+_planner = WarmupPlanner()
+
+
+async def warmup_on_startup() -> None:
+    """
+    Одноразовый прогрев после запуска бота: после деплоя вне волны и активного окна
+    первый запрос пользователя иначе попал бы на холодную модель.
+    """
+    for name in WARMUPS:
+        _planner._start_warmup(name, "запуск бота")
+
+
+async def plan_warmup() -> None:
+    """Задача планировщика (раз в минуту): прогреть модели, если скоро или сейчас идёт нагрузка."""
+    try:
+        await _planner.tick()
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("[WARMUP] Ошибка планировщика прогрева: %s", exc, exc_info=True)
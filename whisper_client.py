@@ -2,15 +2,22 @@
 Клиент для работы с Whisper API на Cloud.ru.
 Обрабатывает авторизацию и транскрипцию аудио.
 """
+import asyncio
 import base64
 import glob
+import json
 import logging
 import os
 import shutil
 import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
-import requests
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+import numpy as np
 # Подавляем предупреждение pydub о ffmpeg при импорте (проверим позже в optimize_audio)
 warnings.filterwarnings("ignore", message=".*ffmpeg.*", category=RuntimeWarning)
 
@@ -141,14 +148,16 @@ except Exception as e:
     PYDUB_AVAILABLE = False
     _PYDUB_ERROR = f"Ошибка импорта pydub: {e}"
 
+from cloudru_auth import get_token_provider
 from core.config import settings
+from services.model_activity import track_model_call
+from services.model_scheduler import ModelCallPreempted, PriorityScheduler, lane_limits
 
 # Используем переменные окружения для Cloud.ru API (Whisper)
 CLOUDRU_IAM_KEY = settings.cloudru_iam_key
 CLOUDRU_IAM_SECRET = settings.cloudru_iam_secret
 MODEL_URL = settings.whisper_model_url
 MODEL_NAME = settings.whisper_model_name
-IAM_TOKEN_URL = settings.cloud_iam_token_url
 
 # Проверяем наличие обязательных переменных для работы с API
 if not all([CLOUDRU_IAM_KEY, CLOUDRU_IAM_SECRET, MODEL_URL]):
@@ -160,40 +169,13 @@ if not all([CLOUDRU_IAM_KEY, CLOUDRU_IAM_SECRET, MODEL_URL]):
 
 async def get_bearer_token() -> str:
     """
-    Получает Bearer токен через OAuth2 client_credentials flow для Cloud.ru API.
-    Согласно документации Cloud.ru, нужно сначала получить токен, затем использовать его.
+    Возвращает Bearer токен Cloud.ru (OAuth2 client_credentials) из общего кэша.
+    Обращение к IAM происходит только при истечении токена или фоновом обновлении.
     
     Returns:
         Bearer токен для авторизации запросов
     """
-    try:
-        # Параметры для OAuth2 client_credentials flow
-        data = {
-            'grant_type': 'client_credentials',
-            'client_id': CLOUDRU_IAM_KEY,
-            'client_secret': CLOUDRU_IAM_SECRET
-        }
-        
-        response = requests.post(
-            IAM_TOKEN_URL,
-            data=data,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            access_token = result.get('access_token')
-            if access_token:
-                logger.info("Успешно получен Bearer токен")
-                return access_token
-            else:
-                raise ValueError(f"Токен не найден в ответе: {result}")
-        else:
-            raise Exception(f"Ошибка при получении токена: {response.status_code} - {response.text}")
-            
-    except Exception as e:
-        logger.error(f"Ошибка при получении Bearer токена: {e}", exc_info=True)
-        raise
+    return await get_token_provider().get_token()
 
 
 async def get_auth_headers(url: str = "", method: str = "POST") -> dict:
@@ -230,29 +212,150 @@ async def get_auth_headers(url: str = "", method: str = "POST") -> dict:
 # Флаг для однократного логирования статуса pydub
 _PYDUB_STATUS_LOGGED = False
 
-def optimize_audio(audio_data: bytes, input_format: str = "ogg") -> bytes:
+# Целевые кодировки для загрузки в Whisper: формат pydub/ffmpeg -> параметры экспорта
+AUDIO_ENCODINGS = {
+    "opus": {"format": "ogg", "codec": "libopus", "bitrate": "24k"},
+    "flac": {"format": "flac"},
+    "wav": {"format": "wav"},
+}
+AUDIO_MIME_TYPES = {"ogg": "audio/ogg", "flac": "audio/flac", "wav": "audio/wav", "mp3": "audio/mpeg"}
+# Если endpoint не принял кодировку — следующая по размеру
+ENCODING_FALLBACK = {"opus": "flac", "flac": "wav"}
+# HTTP 400 считается отказом от кодировки, только если тело ответа говорит о формате
+FORMAT_ERROR_MARKERS = ("unsupported", "codec", "audio format", "file format", "decod", "mime", "content-type")
+# Переход на следующую кодировку запоминается для процесса только после стольких отказов подряд
+ENCODING_DOWNGRADE_AFTER = 3
+# Запомненный переход действует столько секунд, потом снова пробуется настроенная кодировка
+ENCODING_REPROBE_SECONDS = 3600
+# Голосовые Telegram уже в OGG/Opus — для кодировки opus их не нужно перекодировать
+OPUS_CONTAINER_FORMATS = {"ogg", "oga", "opus"}
+
+# VAD: длина кадра, запас вокруг речи и минимальный выигрыш, ради которого стоит перекодировать Opus
+VAD_FRAME_MS = 30
+VAD_PADDING_MS = 210
+VAD_MIN_GAIN_SECONDS = 1.0
+# Уровень шума учитывается, только если громкие кадры заметно выше тихих: без пауз в записи
+# 10-й перцентиль — это уже речь, и порог «шум + 10 dB» отнёс бы к тишине весь клип
+VAD_MIN_DYNAMIC_RANGE_DB = 15.0
+
+
+def _vad_trim(samples: np.ndarray, rate: int) -> Tuple[np.ndarray, float]:
+    """
+    Энергетический VAD по кадрам 30 мс: обрезает тишину в начале и конце и сжимает
+    длинные паузы до settings.whisper_vad_max_pause_ms.
+    
+    Порог — максимум из абсолютного (whisper_vad_threshold_db) и «уровень шума + 10 dB»,
+    где уровень шума — 10-й перцентиль громкости кадров. Уровень шума учитывается, только
+    если 90-й перцентиль выше него хотя бы на VAD_MIN_DYNAMIC_RANGE_DB (в записи есть паузы);
+    иначе порог только абсолютный.
+    
+    Returns:
+        (оставленные сэмплы, длительность речи в секундах)
+    """
+    frame = rate * VAD_FRAME_MS // 1000
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return samples, 0.0
+    
+    frames = samples[:n_frames * frame].reshape(n_frames, frame).astype(np.float32)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    level_db = 20 * np.log10(rms / 32768.0 + 1e-10)
+    noise_floor_db, loud_db = (float(value) for value in np.percentile(level_db, [10, 90]))
+    threshold_db = settings.whisper_vad_threshold_db
+    if loud_db - noise_floor_db >= VAD_MIN_DYNAMIC_RANGE_DB:
+        threshold_db = max(threshold_db, noise_floor_db + 10)
+    speech = level_db > threshold_db
+    speech_seconds = float(speech.sum()) * VAD_FRAME_MS / 1000
+    if not speech.any():
+        return samples[:0], 0.0
+    
+    # Расширяем речь на VAD_PADDING_MS в обе стороны, чтобы не срезать края слов
+    pad = VAD_PADDING_MS // VAD_FRAME_MS
+    keep = np.convolve(speech.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode="same") > 0
+    
+    # Длинные паузы внутри речи укорачиваем до max_pause кадров
+    max_pause = max(1, settings.whisper_vad_max_pause_ms // VAD_FRAME_MS)
+    speech_idx = np.flatnonzero(keep)
+    first, last = speech_idx[0], speech_idx[-1]
+    gap_starts = np.flatnonzero(~keep[first:last + 1] & np.r_[True, keep[first:last]]) + first
+    for start in gap_starts:
+        end = start
+        while not keep[end]:
+            end += 1
+        if end - start > max_pause:
+            keep[start:start + max_pause] = True
+        else:
+            keep[start:end] = True
+    
+    kept = samples[:n_frames * frame].reshape(n_frames, frame)[keep].reshape(-1)
+    return kept, speech_seconds
+
+
+def _split_points(samples: np.ndarray, rate: int, max_chunk_seconds: int) -> List[int]:
+    """
+    Точки разреза длинной записи на куски не длиннее max_chunk_seconds.
+    Режем в самом тихом кадре последних 40% каждого окна — то есть в паузе, а не посреди слова.
+    """
+    max_len = max_chunk_seconds * rate
+    frame = rate * VAD_FRAME_MS // 1000
+    points: List[int] = []
+    start = 0
+    while len(samples) - start > max_len:
+        window_start = start + int(max_len * 0.6)
+        window = samples[window_start:start + max_len]
+        n_frames = len(window) // frame
+        energy = np.mean(window[:n_frames * frame].reshape(n_frames, frame).astype(np.float32) ** 2, axis=1)
+        cut = window_start + int(np.argmin(energy)) * frame + frame // 2
+        points.append(cut)
+        start = cut
+    return points
+
+
+def optimize_audio(
+    audio_data: bytes,
+    input_format: str = "ogg",
+    encoding: Optional[str] = None,
+    trim_silence: bool = False,
+    max_chunk_seconds: int = 0,
+) -> Tuple[List[bytes], str, float]:
     """
-    Оптимизирует аудио для Whisper API:
-    - Конвертирует в 16 kHz sample rate (оптимально для Whisper)
-    - Конвертирует в WAV формат
-    - Делает моно (если stereo)
+    Готовит аудио для Whisper API в кодировке encoding (по умолчанию settings.whisper_audio_encoding):
+    - opus: OGG/Opus отправляется как есть (самый компактный вариант), прочие форматы перекодируются в Opus
+    - flac / wav: моно, 16 kHz, 16-bit (без потерь)
+    
+    С trim_silence тишина вырезается VAD'ом (_vad_trim); если VAD нашёл слишком мало речи,
+    клип отправляется без обрезки — Whisper разберётся сам. Запись длиннее max_chunk_seconds
+    режется в паузах на куски, которые можно распознавать параллельно.
     
     Args:
         audio_data: Байты исходного аудио
         input_format: Формат исходного аудио (ogg, mp3, wav и т.д.)
+        encoding: Целевая кодировка (opus, flac, wav)
+        trim_silence: Вырезать тишину перед отправкой
+        max_chunk_seconds: Максимальная длина куска (0 — не резать)
     
     Returns:
-        Оптимизированные байты аудио в формате WAV
+        (куски аудио по порядку, формат контейнера для имени файла и MIME type, секунд тишины вырезано)
     """
     global _PYDUB_STATUS_LOGGED
     
+    encoding = encoding or settings.whisper_audio_encoding
+    if encoding not in AUDIO_ENCODINGS:
+        logger.warning(f"Неизвестная кодировка аудио {encoding!r}, используем opus")
+        encoding = "opus"
+    passthrough = encoding == "opus" and input_format in OPUS_CONTAINER_FORMATS
+    
+    if passthrough and not trim_silence and not max_chunk_seconds:
+        logger.info(f"Аудио уже в OGG/Opus ({len(audio_data)} байт), отправляем без перекодирования")
+        return [audio_data], "ogg", 0.0
+    
     if not PYDUB_AVAILABLE or _AUDIO_SEGMENT is None:
         # Если pydub не доступен, возвращаем исходные данные
         if not _PYDUB_STATUS_LOGGED:
             error_msg = _PYDUB_ERROR or "неизвестная причина"
             logger.warning(f"pydub недоступен ({error_msg}), используем исходное аудио без оптимизации")
             _PYDUB_STATUS_LOGGED = True
-        return audio_data
+        return [audio_data], input_format, 0.0
     
     # Логируем статус только один раз
     if not _PYDUB_STATUS_LOGGED:
@@ -260,40 +363,50 @@ def optimize_audio(audio_data: bytes, input_format: str = "ogg") -> bytes:
         _PYDUB_STATUS_LOGGED = True
     
     try:
-        logger.info(f"Начинаем оптимизацию аудио (формат: {input_format})...")
         # Загружаем аудио из байтов
         audio = _AUDIO_SEGMENT.from_file(BytesIO(audio_data), format=input_format)
         logger.info(f"Аудио загружено: {audio.frame_rate} Hz, {audio.channels} канал(ов), длительность: {len(audio)}ms")
         
-        # Оптимизируем:
-        # 1. Конвертируем в моно (если stereo)
-        original_channels = audio.channels
+        # Whisper работает с моно 16 kHz: лишние каналы и частота только увеличивают размер
         if audio.channels > 1:
             audio = audio.set_channels(1)
-            logger.info(f"Конвертировано в моно (было {original_channels} каналов)")
-        
-        # 2. Устанавливаем sample rate 16 kHz (оптимально для Whisper)
-        original_rate = audio.frame_rate
         if audio.frame_rate != 16000:
             audio = audio.set_frame_rate(16000)
-            logger.info(f"Sample rate изменен: {original_rate} -> 16000 Hz")
-        
-        # 3. Нормализуем битрейт (16-bit для WAV)
         audio = audio.set_sample_width(2)  # 16-bit = 2 bytes
-        logger.info("Битрейт установлен: 16-bit")
+        rate = audio.frame_rate
+        samples = np.frombuffer(audio.raw_data, dtype=np.int16)
+        
+        removed_seconds = 0.0
+        if trim_silence:
+            kept, speech_seconds = _vad_trim(samples, rate)
+            if speech_seconds * 1000 < settings.whisper_vad_min_speech_ms:
+                # Не выбрасываем клип: ошибка VAD стоила бы пользователю распознанного сообщения
+                logger.info(f"VAD: речи {speech_seconds:.2f}s из {len(audio) / 1000:.2f}s — отправляем без обрезки")
+            else:
+                removed_seconds = (len(samples) - len(kept)) / rate
+                logger.info(f"VAD: вырезано {removed_seconds:.2f}s тишины из {len(audio) / 1000:.2f}s")
+                samples = kept
         
-        # 4. Экспортируем в WAV формат
-        logger.info("Экспортируем в WAV формат...")
-        output = BytesIO()
-        audio.export(output, format="wav")
-        output.seek(0)
-        optimized_data = output.read()
+        points = _split_points(samples, rate, max_chunk_seconds) if max_chunk_seconds else []
+        if passthrough and not points and removed_seconds < VAD_MIN_GAIN_SECONDS:
+            # Выигрыш меньше, чем стоит перекодирование — отправляем оригинал
+            return [audio_data], "ogg", 0.0
         
-        logger.info(f"✓ Аудио оптимизировано: {len(audio_data)} -> {len(optimized_data)} байт "
-                   f"(уменьшение: {((1 - len(optimized_data)/len(audio_data)) * 100):.1f}%), "
-                   f"sample rate: {audio.frame_rate} Hz, channels: {audio.channels}")
+        logger.info(f"Начинаем перекодирование аудио: {input_format} -> {encoding}, кусков: {len(points) + 1}...")
+        export_params = dict(AUDIO_ENCODINGS[encoding])
+        output_format = export_params.pop("format")
+        chunks = []
+        for piece in np.split(samples, points):
+            output = BytesIO()
+            audio._spawn(piece.tobytes()).export(output, format=output_format, **export_params)
+            chunks.append(output.getvalue())
+        encoded_size = sum(len(chunk) for chunk in chunks)
         
-        return optimized_data
+        logger.info(f"✓ Аудио перекодировано в {encoding}: {len(audio_data)} -> {encoded_size} байт "
+                   f"({encoded_size / len(audio_data):.2f}× от исходного), "
+                   f"sample rate: {rate} Hz, channels: {audio.channels}")
+        
+        return chunks, output_format, removed_seconds
         
     except Exception as e:
         error_msg = str(e).lower()
@@ -301,17 +414,373 @@ def optimize_audio(audio_data: bytes, input_format: str = "ogg") -> bytes:
             logger.warning(f"ffmpeg не найден. Для оптимизации аудио установите ffmpeg. Используем исходные данные.")
         else:
             logger.warning(f"Не удалось оптимизировать аудио: {e}. Используем исходные данные.")
-        return audio_data
+        return [audio_data], input_format, 0.0
+
+
+_audio_executor: Optional[ProcessPoolExecutor] = None
+_upload_encoding: Optional[str] = None  # кодировка после повторных отказов endpoint'а от настроенной
+_upload_encoding_until = 0.0  # time.monotonic(), после которого настроенная кодировка пробуется снова
+_encoding_format_errors: Dict[str, int] = {}  # отказы подряд по кодировкам
+# Голосовые пользователей получают процесс пула и загрузку в Whisper раньше прогрева (services/model_scheduler.py)
+_audio_scheduler = PriorityScheduler("whisper-audio", max(1, settings.whisper_audio_workers), lane_limits())
+_upload_scheduler = PriorityScheduler("whisper", settings.whisper_max_concurrency, lane_limits())
+
+
+def _get_audio_executor() -> Optional[ProcessPoolExecutor]:
+    """Пул процессов для декодирования/перекодирования аудио (None — пул отключён настройкой)."""
+    global _audio_executor
+    if settings.whisper_audio_workers <= 0:
+        return None
+    if _audio_executor is None:
+        _audio_executor = ProcessPoolExecutor(max_workers=settings.whisper_audio_workers)
+        logger.info(f"Пул обработки аудио запущен: {settings.whisper_audio_workers} процесс(ов)")
+    return _audio_executor
+
+
+def _shutdown_audio_executor() -> None:
+    global _audio_executor
+    if _audio_executor is not None:
+        _audio_executor.shutdown(wait=False, cancel_futures=True)
+        _audio_executor = None
+
+
+async def preprocess_audio(
+    audio_data: bytes,
+    input_format: str = "ogg",
+    encoding: Optional[str] = None,
+    trim_silence: bool = False,
+    max_chunk_seconds: int = 0,
+) -> Tuple[List[bytes], str, float]:
+    """
+    Подготовить аудио к отправке (optimize_audio) вне event loop.
+    
+    ffmpeg-декодирование идёт в пуле процессов, поэтому голосовые сообщения разных
+    пользователей конвертируются параллельно и не задерживают остальные апдейты.
+    """
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    executor = _get_audio_executor()
+    args = (audio_data, input_format, encoding, trim_silence, max_chunk_seconds)
+    try:
+        async with _audio_scheduler.slot():
+            if executor is None:
+                chunks, output_format, removed = await asyncio.to_thread(optimize_audio, *args)
+            else:
+                chunks, output_format, removed = await loop.run_in_executor(executor, optimize_audio, *args)
+    except BrokenProcessPool:
+        # Процесс пула упал (например, OOM на ffmpeg) — пересоздадим пул при следующем вызове
+        logger.error("Пул обработки аудио сломан, пересоздаём; текущее аудио отправим без оптимизации")
+        _shutdown_audio_executor()
+        chunks, output_format, removed = [audio_data], input_format, 0.0
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    logger.info(f"Подготовка аудио заняла {elapsed_ms:.0f} мс ({len(audio_data)} -> {sum(len(c) for c in chunks)} байт, "
+                f"{output_format}, кусков: {len(chunks)}, вырезано тишины {removed:.2f}s)")
+    return chunks, output_format, removed
+
+
+# Кандидаты endpoint'а транскрипции относительно MODEL_URL (в порядке проверки)
+ENDPOINT_CANDIDATES = [
+    "/v1/audio/transcriptions",  # OpenAI формат
+    "/predict",  # Cloud.ru формат
+    "/inference",  # Альтернативный формат
+    "",  # Прямой базовый URL
+]
+# Где искать текст в JSON-ответе: сначала на верхнем уровне, затем во вложенных структурах
+RESPONSE_TEXT_PATHS = [
+    ("text",),
+    ("transcription",),
+    *((outer, inner) for outer in ("result", "data", "content") for inner in ("text", "transcription")),
+    ("result",),
+    ("data",),
+    ("content",),
+]
+WHISPER_TIMEOUT = 600  # 10 минут: serverless-модель может долго стартовать
+WHISPER_MAX_RETRIES = 2
+WHISPER_RETRY_DELAY = 5
+WHISPER_TIMEOUT_RETRY_DELAY = 10
+WHISPER_CHUNK_RETRIES = 2  # повторов для отдельного куска длинной записи
+
+
+class _EndpointCache:
+    """Найденный рабочий endpoint Whisper и путь к тексту в его ответе."""
 
+    def __init__(self):
+        self.url: Optional[str] = None
+        self.text_path: Optional[Tuple[str, ...]] = None
+        self.discovered_at: float = 0.0
 
-async def transcribe_via_direct_http(audio_data: bytes, audio_format: str = "ogg") -> str:
+    def get(self) -> Optional[str]:
+        interval = settings.whisper_endpoint_rediscover_interval
+        if self.url and interval and time.monotonic() - self.discovered_at > interval:
+            logger.info(f"Прошло больше {interval}s с обнаружения endpoint Whisper, проверим заново")
+            self.invalidate()
+        return self.url
+
+    def remember(self, url: str, text_path: Optional[Tuple[str, ...]]) -> None:
+        if url != self.url:
+            logger.info(f"Endpoint Whisper запомнен: {url}")
+            self.url = url
+            self.discovered_at = time.monotonic()
+        if text_path and text_path != self.text_path:
+            logger.info(f"Текст в ответе Whisper: {'.'.join(text_path)}")
+            self.text_path = text_path
+
+    def invalidate(self) -> None:
+        self.url = None
+        self.text_path = None
+
+
+_endpoint_cache = _EndpointCache()
+_discovery_lock: Optional[asyncio.Lock] = None
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """Общая HTTP-сессия с keep-alive пулом (пересоздаётся при смене event loop)."""
+    global _session, _session_loop, _discovery_lock
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(keepalive_timeout=60))
+        _session_loop = loop
+        _discovery_lock = asyncio.Lock()
+    return _session
+
+
+async def close_whisper_client() -> None:
+    """Закрыть HTTP-сессию Whisper и пул обработки аудио (при остановке бота)."""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+    _shutdown_audio_executor()
+
+
+def _extract_text(result: Any) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    """Достаёт текст транскрипции из ответа; сначала по запомненному пути."""
+    if not isinstance(result, dict):
+        return "", None
+    paths = RESPONSE_TEXT_PATHS
+    if _endpoint_cache.text_path:
+        paths = [_endpoint_cache.text_path, *paths]
+    for path in paths:
+        value: Any = result
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, str) and value:
+            return value, path
+    return "", None
+
+
+async def _post_audio(url: str, audio: bytes, file_name: str, mime_type: str) -> Tuple[int, str]:
+    """Одна загрузка аудио на endpoint с ретраями по таймауту и сетевым ошибкам (каждая попытка — в слоте планировщика)."""
+    session = _get_session()
+    for attempt in range(WHISPER_MAX_RETRIES + 1):
+        # FormData одноразовая — собираем заново на каждую попытку
+        form = aiohttp.FormData()
+        form.add_field("file", audio, filename=file_name, content_type=mime_type)
+        form.add_field("model", MODEL_NAME)  # Имя развернутой модели на Cloud.ru
+        form.add_field("language", "ru")  # Язык транскрипции (можно убрать для автоопределения)
+        form.add_field("response_format", "json")
+        try:
+            auth_headers = await get_auth_headers(url, "POST")
+            async with _upload_scheduler.slot():
+                async with session.post(url, data=form, headers=auth_headers, timeout=aiohttp.ClientTimeout(total=WHISPER_TIMEOUT)) as response:
+                    return response.status, await response.text()
+        except asyncio.TimeoutError:
+            if attempt == WHISPER_MAX_RETRIES:
+                raise
+            delay = WHISPER_TIMEOUT_RETRY_DELAY
+            logger.warning(f"Таймаут при запросе к Whisper API (попытка {attempt + 1}/{WHISPER_MAX_RETRIES + 1})...")
+        except aiohttp.ClientError as e:
+            if attempt == WHISPER_MAX_RETRIES:
+                raise
+            delay = WHISPER_RETRY_DELAY
+            logger.warning(f"Ошибка при запросе к {url}: {e}")
+        logger.info(f"Повторная попытка {attempt + 1}/{WHISPER_MAX_RETRIES} через {delay} секунд...")
+        await asyncio.sleep(delay)
+    raise RuntimeError("Whisper API: попытки исчерпаны")
+
+
+async def _discover_and_post(audio: bytes, file_name: str, mime_type: str) -> Tuple[str, int, str]:
+    """
+    Перебирает кандидатов endpoint'а, пока один не ответит не-404.
+    Выполняется под блокировкой: параллельные запросы ждут результата и используют найденный endpoint.
+    """
+    async with _discovery_lock:
+        cached_url = _endpoint_cache.get()
+        if cached_url:
+            status, body = await _post_audio(cached_url, audio, file_name, mime_type)
+            if status != 404:
+                return cached_url, status, body
+            _endpoint_cache.invalidate()
+
+        base_url = MODEL_URL.rstrip("/")
+        last_error: Optional[Exception] = None
+        for idx, suffix in enumerate(ENDPOINT_CANDIDATES):
+            url = base_url + suffix
+            logger.info(f"Пробуем endpoint {idx + 1}/{len(ENDPOINT_CANDIDATES)}: {url}")
+            try:
+                status, body = await _post_audio(url, audio, file_name, mime_type)
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                logger.warning(f"Endpoint {url} недоступен ({e!r}), пробуем следующий...")
+                last_error = e
+                continue
+            if status == 404:
+                logger.warning(f"Endpoint {url} вернул 404, пробуем следующий...")
+                continue
+            # Не 404 — endpoint правильный (даже если сама транскрипция не удалась)
+            _endpoint_cache.remember(url, None)
+            return url, status, body
+
+        if last_error:
+            raise last_error
+        raise ValueError("Не удалось получить ответ ни от одного endpoint. Проверьте URL модели и доступность сервиса.")
+
+
+async def _post_to_endpoint(audio: bytes, file_name: str, mime_type: str) -> Tuple[str, int, str]:
+    """Загрузить аудио на запомненный endpoint, при его отсутствии или 404 — найти заново."""
+    _get_session()
+    url = _endpoint_cache.get()
+    if url:
+        status, body = await _post_audio(url, audio, file_name, mime_type)
+        if status != 404:
+            return url, status, body
+        logger.warning(f"Запомненный endpoint {url} вернул 404, ищем заново")
+        _endpoint_cache.invalidate()
+    return await _discover_and_post(audio, file_name, mime_type)
+
+
+class _UnsupportedEncoding(Exception):
+    """Endpoint не принял аудио в этой кодировке (HTTP 415 или 400 с ошибкой формата)."""
+
+
+def _is_format_error(status: int, body: str) -> bool:
+    """Ответ — отказ от формата аудио, а не другая ошибка запроса."""
+    if status == 415:
+        return True
+    if status != 400:
+        return False
+    body = body.lower()
+    return any(marker in body for marker in FORMAT_ERROR_MARKERS)
+
+
+def _current_upload_encoding() -> str:
+    """Кодировка загрузки: запомненный переход, пока не истёк, иначе настроенная."""
+    global _upload_encoding
+    if _upload_encoding and time.monotonic() >= _upload_encoding_until:
+        logger.info(f"Снова пробуем кодировку {settings.whisper_audio_encoding} вместо {_upload_encoding}")
+        _upload_encoding = None
+    return _upload_encoding or settings.whisper_audio_encoding
+
+
+def _note_format_error(encoding: str, fallback: str) -> None:
+    """Учесть отказ от кодировки; после ENCODING_DOWNGRADE_AFTER отказов подряд запомнить переход."""
+    global _upload_encoding, _upload_encoding_until
+    errors = _encoding_format_errors.get(encoding, 0) + 1
+    _encoding_format_errors[encoding] = errors
+    if errors >= ENCODING_DOWNGRADE_AFTER:
+        _upload_encoding = fallback
+        _upload_encoding_until = time.monotonic() + ENCODING_REPROBE_SECONDS
+        logger.warning(
+            f"Whisper {errors} раз(а) подряд не принял {encoding}, "
+            f"следующие {ENCODING_REPROBE_SECONDS} секунд отправляем в {fallback}"
+        )
+
+
+async def _transcribe_chunk(audio: bytes, upload_format: str, encoding: str) -> str:
+    """Одна загрузка аудио в Whisper и разбор ответа."""
+    file_name = f'audio.{upload_format}'
+    mime_type = AUDIO_MIME_TYPES.get(upload_format, f'audio/{upload_format}')
+    try:
+        transcription_url, status, body = await _post_to_endpoint(audio, file_name, mime_type)
+    except asyncio.TimeoutError:
+        logger.error("Таймаут при запросе к Whisper API (после всех ретраев)")
+        raise TimeoutError("Превышено время ожидания ответа от сервера транскрипции. Попробуйте позже или отправьте более короткое сообщение.") from None
+    
+    logger.info(f"Получен ответ со статусом {status} от {transcription_url}")
+    
+    if encoding in ENCODING_FALLBACK and _is_format_error(status, body):
+        raise _UnsupportedEncoding(f"HTTP {status}: {body[:200]}")
+    
+    if status == 200:
+        try:
+            result = json.loads(body)
+        except ValueError as e:
+            logger.error(f"Ошибка при парсинге JSON ответа: {e}")
+            logger.error(f"Сырой ответ (первые 500 символов): {body[:500]}")
+            raise
+        logger.info(f"Ответ от Whisper API (JSON): {result}")
+        
+        text, text_path = _extract_text(result)
+        _endpoint_cache.remember(transcription_url, text_path)
+        logger.info(f"Извлеченный текст из ответа: '{text}' (длина: {len(text)})")
+        
+        if text:
+            logger.info("Успешно получена транскрипция")
+            return text
+        logger.warning(f"API вернул пустой текст в ответе. Полный ответ: {result}")
+        return ""
+    elif status == 504 or status == 408:
+        logger.error(f"Таймаут на стороне сервера (статус {status})")
+        raise TimeoutError("Сервер обрабатывает запрос слишком долго. Попробуйте позже.")
+    else:
+        # Логируем детали ошибки для отладки
+        logger.error(f"Ошибка API (status {status}): {body[:1000]}")
+        raise ValueError(f"Ошибка API: статус {status}")
+
+
+async def _transcribe_chunks(chunks: List[bytes], upload_format: str, encoding: str) -> str:
+    """
+    Распознать куски длинной записи параллельно (не больше WHISPER_CHUNK_CONCURRENCY
+    одновременно) и склеить текст по порядку. Неудачный кусок повторяется отдельно.
+    """
+    if len(chunks) == 1:
+        return await _transcribe_chunk(chunks[0], upload_format, encoding)
+    
+    semaphore = asyncio.Semaphore(settings.whisper_chunk_concurrency)
+    
+    async def transcribe_one(index: int, chunk: bytes) -> str:
+        for attempt in range(WHISPER_CHUNK_RETRIES + 1):
+            try:
+                async with semaphore:
+                    return await _transcribe_chunk(chunk, upload_format, encoding)
+            except _UnsupportedEncoding:
+                raise
+            except Exception as e:
+                if attempt == WHISPER_CHUNK_RETRIES:
+                    raise
+                logger.warning(f"Кусок {index + 1}/{len(chunks)} не распознан ({e}), повторяем через {WHISPER_RETRY_DELAY} секунд...")
+                await asyncio.sleep(WHISPER_RETRY_DELAY)
+        return ""
+    
+    t0 = time.perf_counter()
+    tasks = [asyncio.create_task(transcribe_one(index, chunk)) for index, chunk in enumerate(chunks)]
+    try:
+        texts = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    logger.info(f"Распознано {len(chunks)} кусков за {time.perf_counter() - t0:.1f}s")
+    return " ".join(text.strip() for text in texts if text and text.strip())
+
+
+async def transcribe_via_direct_http(audio_data: bytes, audio_format: str = "ogg", trim_silence: bool = True) -> str:
     """
     Прямой HTTP запрос к Whisper API через endpoint.
     Использует OAuth2 Bearer токен для авторизации согласно документации Cloud.ru.
     
+    Рабочий endpoint ищется один раз (при прогреве или первом запросе) и запоминается,
+    так что обычная транскрипция — ровно одна загрузка аудио. Повторный поиск — после
+    404 или по истечении WHISPER_ENDPOINT_REDISCOVER_INTERVAL. Записи длиннее
+    WHISPER_CHUNK_SECONDS режутся в паузах и распознаются по кускам параллельно.
+    
     Args:
         audio_data: Байты аудио файла
         audio_format: Формат исходного аудио (ogg, mp3, wav и т.д.)
+        trim_silence: Вырезать тишину перед отправкой (прогрев модели отправляет тишину намеренно)
         
     Returns:
         Транскрибированный текст
@@ -322,193 +791,42 @@ async def transcribe_via_direct_http(audio_data: bytes, audio_format: str = "ogg
         
         # Оптимизируем аудио перед отправкой (уменьшаем размер и ускоряем обработку)
         logger.info(f"Оптимизируем аудио (исходный размер: {len(audio_data)} байт)...")
-        optimized_audio = optimize_audio(audio_data, input_format=audio_format)
-        
-        # Пробуем разные варианты endpoint для Cloud.ru
-        # Вариант 1: стандартный OpenAI endpoint
-        # Вариант 2: прямой endpoint модели (без /v1/audio/transcriptions)
-        # Вариант 3: endpoint /predict или /inference
-        possible_endpoints = [
-            f"{MODEL_URL.rstrip('/')}/v1/audio/transcriptions",  # OpenAI формат
-            f"{MODEL_URL.rstrip('/')}/predict",  # Cloud.ru формат
-            f"{MODEL_URL.rstrip('/')}/inference",  # Альтернативный формат
-            MODEL_URL.rstrip('/'),  # Прямой базовый URL
-        ]
-        
-        transcription_url = possible_endpoints[0]  # Начинаем с первого варианта
-        
-        # Определяем формат и MIME type для оптимизированного аудио
-        if PYDUB_AVAILABLE and optimized_audio != audio_data:
-            # Если аудио было оптимизировано, оно в формате WAV
-            file_name = 'audio.wav'
-            mime_type = 'audio/wav'
-        else:
-            # Используем исходный формат
-            file_name = f'audio.{audio_format}'
-            mime_type = f'audio/{audio_format}'
-        
-        # Подготовка данных для multipart/form-data
-        files = {
-            'file': (file_name, optimized_audio, mime_type)
-        }
-        data = {
-            'model': MODEL_NAME,  # Имя развернутой модели на Cloud.ru
-            'language': 'ru',  # Язык транскрипции (можно убрать для автоопределения)
-            'response_format': 'json'
-        }
-        
-        # Пробуем разные endpoint'ы, если один не работает
-        response = None
-        last_error = None
-        
-        for endpoint_idx, transcription_url in enumerate(possible_endpoints):
+        encoding = _current_upload_encoding()
+        while True:
+            chunks, upload_format, _ = await preprocess_audio(
+                audio_data,
+                input_format=audio_format,
+                encoding=encoding,
+                trim_silence=trim_silence and settings.whisper_vad_enabled,
+                max_chunk_seconds=settings.whisper_chunk_seconds,
+            )
             try:
-                # Получаем заголовки авторизации с Bearer токеном
-                auth_headers = await get_auth_headers(transcription_url, 'POST')
-                
-                # Отправляем запрос с правильными заголовками
-                logger.info(f"Пробуем endpoint {endpoint_idx + 1}/{len(possible_endpoints)}: {transcription_url}")
-                logger.debug(f"Заголовки: {auth_headers}")
-                logger.info("Внимание: Whisper может долго обрабатывать аудио (до 5-10 минут), это нормально")
-                
-                # Пробуем несколько раз с ретраями (serverless модель может долго стартовать после 5 минут простоя)
-                max_retries = 2  # Меньше попыток для каждого endpoint, так как пробуем несколько
-                retry_delay = 5
-                timeout_retry_delay = 10
-                timeout = 600  # 10 минут
-                
-                last_exception = None
-                for attempt in range(max_retries + 1):
-                    try:
-                        if attempt > 0:
-                            delay = timeout_retry_delay if isinstance(last_exception, requests.exceptions.Timeout) else retry_delay
-                            logger.info(f"Повторная попытка {attempt}/{max_retries} через {delay} секунд...")
-                            time.sleep(delay)
-                        
-                        response = requests.post(
-                            transcription_url,
-                            files=files,
-                            data=data,
-                            headers=auth_headers,
-                            timeout=timeout
-                        )
-                        
-                        # Если получили успешный ответ или ошибку не 404, выходим из цикла endpoint'ов
-                        if response.status_code == 200:
-                            break
-                        elif response.status_code != 404:
-                            # Если это не 404, значит endpoint правильный, но есть другая ошибка
-                            break
-                        else:
-                            # 404 - пробуем следующий endpoint
-                            logger.warning(f"Endpoint {transcription_url} вернул 404, пробуем следующий...")
-                            response = None
-                            break
-                            
-                    except requests.exceptions.Timeout:
-                        last_exception = requests.exceptions.Timeout()
-                        if attempt < max_retries:
-                            logger.warning(f"Таймаут при запросе к Whisper API (попытка {attempt + 1}/{max_retries + 1})...")
-                            continue
-                        else:
-                            # Таймаут - возможно endpoint правильный, но модель долго стартует
-                            # Пробуем следующий endpoint
-                            logger.warning(f"Таймаут на endpoint {transcription_url}, пробуем следующий...")
-                            break
-                    except Exception as e:
-                        last_exception = e
-                        logger.warning(f"Ошибка при запросе к {transcription_url}: {e}")
-                        if attempt < max_retries:
-                            continue
-                        else:
-                            # Ошибка - пробуем следующий endpoint
-                            break
-                
-                # Если получили успешный ответ, выходим из цикла по endpoint'ам
-                if response and response.status_code == 200:
-                    break
-                elif response and response.status_code != 404:
-                    # Если это не 404, значит endpoint правильный, но есть другая ошибка - не пробуем дальше
-                    break
-                    
-            except Exception as e:
-                logger.warning(f"Ошибка при попытке использовать endpoint {transcription_url}: {e}")
-                last_error = e
-                continue
-        
-        if not response:
-            if last_error:
-                raise last_error
-            else:
-                raise ValueError("Не удалось получить ответ ни от одного endpoint. Проверьте URL модели и доступность сервиса.")
-        
-        logger.info(f"Получен ответ со статусом {response.status_code} от {transcription_url}")
-        
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                logger.info(f"Ответ от Whisper API (JSON): {result}")
-                
-                # Проверяем разные возможные форматы ответа
-                text = result.get('text', '')
-                if not text:
-                    # Может быть другой формат
-                    text = result.get('transcription', '')
-                if not text:
-                    # Может быть вложенная структура
-                    if isinstance(result, dict):
-                        for key in ['result', 'data', 'content']:
-                            if key in result:
-                                nested = result[key]
-                                if isinstance(nested, dict):
-                                    text = nested.get('text', '') or nested.get('transcription', '')
-                                elif isinstance(nested, str):
-                                    text = nested
-                                if text:
-                                    break
-                
-                logger.info(f"Извлеченный текст из ответа: '{text}' (длина: {len(text)})")
-                
-                if text:
-                    logger.info("Успешно получена транскрипция")
-                    return text
-                else:
-                    logger.warning(f"API вернул пустой текст в ответе. Полный ответ: {result}")
-                    return ""
-            except Exception as e:
-                logger.error(f"Ошибка при парсинге JSON ответа: {e}")
-                logger.error(f"Сырой ответ (первые 500 символов): {response.text[:500]}")
-                raise
-        elif response.status_code == 504 or response.status_code == 408:
-            logger.error(f"Таймаут на стороне сервера (статус {response.status_code})")
-            raise TimeoutError("Сервер обрабатывает запрос слишком долго. Попробуйте позже.")
-        else:
-            # Логируем детали ошибки для отладки
-            try:
-                error_detail = response.json()
-                logger.error(f"Ошибка API (status {response.status_code}): {error_detail}")
-            except:
-                logger.error(f"Ошибка API (status {response.status_code}): {response.text}")
-            raise ValueError(f"Ошибка API: статус {response.status_code}")
-
+                async with track_model_call("whisper"):
+                    text = await _transcribe_chunks(chunks, upload_format, encoding)
+                _encoding_format_errors.pop(encoding, None)
+                return text
+            except _UnsupportedEncoding as e:
+                # Endpoint не принял формат — этот запрос повторяем в следующей по размеру кодировке
+                fallback = ENCODING_FALLBACK[encoding]
+                logger.warning(f"Whisper не принял аудио в {encoding} ({e}), повторяем в {fallback}")
+                _note_format_error(encoding, fallback)
+                encoding = fallback
             
-    except requests.exceptions.Timeout as e:
-        # Это должно быть обработано внутри цикла ретраев, но на всякий случай оставляем
-        logger.error(f"Таймаут при запросе к Whisper API (после всех ретраев): {e}")
-        raise TimeoutError("Превышено время ожидания ответа от сервера транскрипции. Попробуйте позже или отправьте более короткое сообщение.")
+    except ModelCallPreempted:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при прямом HTTP запросе: {e}", exc_info=True)
         raise
 
 
-
-async def transcribe_audio(audio_file: BytesIO, audio_format: str = "ogg") -> str:
+async def transcribe_audio(audio_file: BytesIO, audio_format: str = "ogg", trim_silence: bool = True) -> str:
     """
     Отправляет аудио файл на Whisper API для транскрипции.
     
     Args:
         audio_file: BytesIO объект с аудио данными
         audio_format: Формат аудио (ogg, mp3, wav и т.д.)
+        trim_silence: Вырезать тишину перед отправкой
         
     Returns:
         Транскрибированный текст
@@ -518,7 +836,7 @@ async def transcribe_audio(audio_file: BytesIO, audio_format: str = "ogg") -> st
         audio_data = audio_file.read()
         
         # Используем прямой HTTP запрос к правильному endpoint
-        return await transcribe_via_direct_http(audio_data, audio_format=audio_format)
+        return await transcribe_via_direct_http(audio_data, audio_format=audio_format, trim_silence=trim_silence)
             
     except Exception as e:
         logger.error(f"Ошибка при транскрипции: {e}", exc_info=True)